@@ -0,0 +1,258 @@
+"""
+Mouse and keyboard input for the Vortex Auto Downloader.
+
+Every click and key press goes through an InputActuator instead of calling
+pyautogui directly, so the timing of the input can be tuned in one place
+(a TimingProfile) and the download steps can run against a recording fake
+on a headless machine.
+
+- PyAutoGuiActuator drives the real mouse and keyboard.
+- RecordingActuator only logs the actions and advances a FakeClock by the
+  time they would have taken, pyautogui's per-call pause included, so the
+  input overhead of a download can be measured without a desktop.
+"""
+
+import logging
+from collections import defaultdict
+
+import config
+from scheduling import FakeClock, SystemClock
+
+logger = logging.getLogger(__name__)
+
+
+class TimingProfile:
+    """Pauses around mouse and keyboard input (seconds)."""
+
+    def __init__(self, name: str, move_duration: float, hover: float, press_hold: float, key_gap: float,
+                 after_keys: float, focus_delay: float, restore_delay: float, call_pause: float):
+        """
+        Args:
+            name: Profile name
+            move_duration: Mouse travel time to a button (0 jumps there)
+            hover: Wait on the button before pressing (hover effects, window focus)
+            press_hold: Time between mouse down and mouse up
+            key_gap: Wait after each key down/press in a shortcut
+            after_keys: Wait after a shortcut (e.g. for the tab to close)
+            focus_delay: Wait after bringing a window to the front
+            restore_delay: Wait after bringing Vortex back to the front
+            call_pause: pyautogui.PAUSE, added after every pyautogui call
+        """
+        self.name = name
+        self.move_duration = move_duration
+        self.hover = hover
+        self.press_hold = press_hold
+        self.key_gap = key_gap
+        self.after_keys = after_keys
+        self.focus_delay = focus_delay
+        self.restore_delay = restore_delay
+        self.call_pause = call_pause
+
+    def __repr__(self):
+        return f"TimingProfile({self.name})"
+
+
+def timing_profiles() -> dict:
+    """
+    Returns the built-in profiles by name:
+
+    - "safe": the original timings (smooth moves, generous pauses, PYAUTOGUI_PAUSE after every call)
+    - "fast": instant moves and the shortest pauses that still let windows react
+    """
+    return {
+        "safe": TimingProfile("safe", move_duration=0.3, hover=0.3, press_hold=0.1, key_gap=0.1,
+                              after_keys=0.5, focus_delay=0.3, restore_delay=0.2,
+                              call_pause=config.PYAUTOGUI_PAUSE),
+        "fast": TimingProfile("fast", move_duration=0.0, hover=0.05, press_hold=0.03, key_gap=0.03,
+                              after_keys=0.15, focus_delay=0.1, restore_delay=0.05, call_pause=0.0),
+    }
+
+
+def timing_profile(name: str = None) -> TimingProfile:
+    """Returns a built-in profile (default: ACTUATOR_PROFILE)."""
+    name = name or config.ACTUATOR_PROFILE
+    profiles = timing_profiles()
+    if name not in profiles:
+        raise ValueError(f"Unknown actuator profile '{name}' (expected one of: {', '.join(profiles)})")
+    return profiles[name]
+
+
+class InputActuator:
+    """
+    Interface for mouse and keyboard input.
+
+    Backends implement the primitives (_move, _mouse_down, ...); the
+    actions built from them (click, shortcut, wait) apply the timing profile
+    and record how long each action took.
+    """
+
+    def __init__(self, profile=None, clock=None):
+        """
+        Args:
+            profile: TimingProfile or profile name (default: ACTUATOR_PROFILE)
+            clock: Clock with now() and sleep(); defaults to SystemClock
+        """
+        self.profile = profile if isinstance(profile, TimingProfile) else timing_profile(profile)
+        self.clock = clock or SystemClock()
+        self.counts = defaultdict(int)     # Action -> times performed
+        self.seconds = defaultdict(float)  # Action -> total time spent
+
+    # Primitives, one input call each
+
+    def _move(self, x: int, y: int, duration: float):
+        raise NotImplementedError
+
+    def _mouse_down(self):
+        raise NotImplementedError
+
+    def _mouse_up(self):
+        raise NotImplementedError
+
+    def _key_down(self, key: str):
+        raise NotImplementedError
+
+    def _key_up(self, key: str):
+        raise NotImplementedError
+
+    def _press(self, key: str):
+        raise NotImplementedError
+
+    def screen_size(self) -> tuple:
+        """Returns the (width, height) of the primary screen."""
+        raise NotImplementedError
+
+    # Actions
+
+    def _record(self, action: str, start: float):
+        self.counts[action] += 1
+        self.seconds[action] += self.clock.now() - start
+
+    def click(self, x: int, y: int):
+        """
+        Moves to (x, y), hovers, and clicks the left button.
+        """
+        start = self.clock.now()
+        p = self.profile
+        self._move(x, y, p.move_duration)
+        self.clock.sleep(p.hover)
+        self._mouse_down()
+        self.clock.sleep(p.press_hold)
+        self._mouse_up()
+        self._record("click", start)
+
+    def shortcut(self, modifier: str, key: str, times: int = 1):
+        """
+        Holds a modifier and presses a key one or more times (e.g. Ctrl+W per tab).
+        """
+        start = self.clock.now()
+        p = self.profile
+        self._key_down(modifier)
+        self.clock.sleep(p.key_gap)
+        for _ in range(times):
+            self._press(key)
+            self.clock.sleep(p.key_gap)
+        self._key_up(modifier)
+        self.clock.sleep(p.after_keys)
+        self._record("shortcut", start)
+
+    def wait(self, seconds: float, reason: str = "wait"):
+        """
+        Pauses for the page or window to react, recorded under reason.
+        """
+        start = self.clock.now()
+        self.clock.sleep(seconds)
+        self._record(reason, start)
+
+    def stats(self) -> dict:
+        """
+        Returns per action: how often it ran and the total and mean time spent (seconds).
+        """
+        return {action: {"count": count, "seconds": self.seconds[action],
+                         "mean": self.seconds[action] / count}
+                for action, count in self.counts.items()}
+
+    def total_seconds(self) -> float:
+        """Time spent in all actions (seconds)."""
+        return sum(self.seconds.values())
+
+
+class PyAutoGuiActuator(InputActuator):
+    """
+    Drives the real mouse and keyboard with pyautogui.
+    """
+
+    def __init__(self, profile=None, failsafe: bool = None):
+        """
+        Args:
+            profile: TimingProfile or profile name (default: ACTUATOR_PROFILE)
+            failsafe: Stop when the mouse hits the top-left corner (default: PYAUTOGUI_FAILSAFE)
+        """
+        super().__init__(profile)
+        import pyautogui
+        self.pyautogui = pyautogui
+        pyautogui.FAILSAFE = config.PYAUTOGUI_FAILSAFE if failsafe is None else failsafe
+        pyautogui.PAUSE = self.profile.call_pause
+
+    def _move(self, x: int, y: int, duration: float):
+        self.pyautogui.moveTo(x, y, duration=duration)
+
+    def _mouse_down(self):
+        self.pyautogui.mouseDown(button='left')
+
+    def _mouse_up(self):
+        self.pyautogui.mouseUp(button='left')
+
+    def _key_down(self, key: str):
+        self.pyautogui.keyDown(key)
+
+    def _key_up(self, key: str):
+        self.pyautogui.keyUp(key)
+
+    def _press(self, key: str):
+        self.pyautogui.press(key)
+
+    def screen_size(self) -> tuple:
+        return tuple(self.pyautogui.size())
+
+
+class RecordingActuator(InputActuator):
+    """
+    Fake backend: logs every input call and advances a FakeClock by the
+    time it would take (its duration plus the profile's per-call pause).
+    """
+
+    def __init__(self, profile=None, clock: FakeClock = None, screen_size: tuple = (1920, 1080)):
+        """
+        Args:
+            profile: TimingProfile or profile name (default: ACTUATOR_PROFILE)
+            clock: FakeClock to advance; a new one by default
+            screen_size: (width, height) reported by screen_size()
+        """
+        super().__init__(profile, clock or FakeClock())
+        self._screen_size = screen_size
+        self.events = []  # (simulated time, call, args)
+
+    def _call(self, name: str, *args, duration: float = 0.0):
+        self.events.append((self.clock.now(), name, args))
+        self.clock.advance(duration + self.profile.call_pause)
+
+    def _move(self, x: int, y: int, duration: float):
+        self._call("moveTo", x, y, duration=duration)
+
+    def _mouse_down(self):
+        self._call("mouseDown")
+
+    def _mouse_up(self):
+        self._call("mouseUp")
+
+    def _key_down(self, key: str):
+        self._call("keyDown", key)
+
+    def _key_up(self, key: str):
+        self._call("keyUp", key)
+
+    def _press(self, key: str):
+        self._call("press", key)
+
+    def screen_size(self) -> tuple:
+        return self._screen_size
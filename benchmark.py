@@ -0,0 +1,512 @@
+#!/usr/bin/env python3
+"""
+Detector latency benchmarks.
+
+Runs every detector against replayed frames at 1080p, 1440p and 4K (or a
+three-monitor 3x4K desktop) and reports p50/p95/p99 latency and frames per
+second. Frames come from a directory or archive of recorded PNGs (see
+capture.ReplayBackend); without one, synthetic Vortex/Nexus screens are
+generated so the suite runs on a headless box.
+
+Usage:
+    python benchmark.py
+    python benchmark.py --frames recorded_frames.zip --iterations 200
+    python benchmark.py --save-json baseline.json
+    python benchmark.py --baseline baseline.json --max-regression 0.2
+    python benchmark.py --downscale 2 4
+    python benchmark.py --actuator
+    python benchmark.py --resolutions 3x4k
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+import config
+import detection
+from actuation import RecordingActuator, timing_profiles
+from button_detector import ButtonDetector
+from capture import Frame, ReplayBackend
+from color_classes import classifier_for
+from gating import DialogCascade, ResultCache
+from strategies import DetectionRace
+from templates import TemplateMatcher, capture_template
+from tracking import LocationTracker
+
+RESOLUTIONS = {
+    "1080p": (1920, 1080),
+    "1440p": (2560, 1440),
+    "4k": (3840, 2160),
+    "3x4k": (11520, 2160),  # Three 4K monitors side by side, grabbed as one virtual desktop
+}
+DEFAULT_RESOLUTIONS = ["1080p", "1440p", "4k"]
+
+# Colors (RGB) taken from the calibration notes in detection.py
+BACKGROUND = (32, 33, 36)
+BUTTON_GRAY = (73, 73, 76)
+PREMIUM_PURPLE = (150, 60, 220)
+TEXT_WHITE = (235, 235, 235)
+
+
+def _rect(frame: np.ndarray, x_pct: float, y_pct: float, w: int, h: int, color: tuple, label: str = None):
+    """
+    Draws a filled w x h rectangle centered at the given screen percentages,
+    optionally with a white label inside.
+    """
+    height, width, _ = frame.shape
+    cx, cy = int(width * x_pct), int(height * y_pct)
+    cv2.rectangle(frame, (cx - w // 2, cy - h // 2), (cx + w // 2, cy + h // 2), color, -1)
+    if label:
+        font_scale = h / 80
+        (text_w, text_h), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, font_scale, 1)
+        cv2.putText(frame, label, (cx - text_w // 2, cy + text_h // 2), cv2.FONT_HERSHEY_SIMPLEX,
+                    font_scale, TEXT_WHITE, max(1, h // 30), cv2.LINE_AA)
+
+
+def make_synthetic_frame(width: int, height: int, scene: str, scale: float = None,
+                         labels: bool = False) -> np.ndarray:
+    """
+    Builds a synthetic RGB screen.
+
+    Args:
+        width, height: Screen size in pixels
+        scene: One of "vortex_dialog", "browser_page", "download_started", "idle"
+        scale: UI scale versus 1080p (default: height / 1080)
+        labels: Draw the button labels
+
+    Returns:
+        RGB image as a NumPy array
+    """
+    frame = np.full((height, width, 3), BACKGROUND, dtype=np.uint8)
+    scale = height / 1080 if scale is None else scale
+
+    if scene == "vortex_dialog":
+        _rect(frame, 0.35, 0.45, int(1100 * scale), int(420 * scale), (45, 45, 50))
+        _rect(frame, 0.167, 0.413, int(200 * scale), int(48 * scale), BUTTON_GRAY,
+              "Download manually" if labels else None)
+        _rect(frame, 0.45, 0.45, int(420 * scale), int(300 * scale), PREMIUM_PURPLE)
+    elif scene == "browser_page":
+        _rect(frame, 0.30, 0.50, int(220 * scale), int(56 * scale), BUTTON_GRAY,
+              "Slow download" if labels else None)
+        _rect(frame, 0.60, 0.50, int(500 * scale), int(320 * scale), PREMIUM_PURPLE)
+    elif scene == "download_started":
+        _rect(frame, 0.50, 0.22, int(1000 * scale), int(90 * scale), (140, 140, 145))
+        _rect(frame, 0.50, 0.38, int(1200 * scale), int(120 * scale), TEXT_WHITE)
+    elif scene != "idle":
+        raise ValueError(f"Unknown scene '{scene}'")
+
+    return frame
+
+
+def synthetic_frames(width: int, height: int) -> list:
+    """
+    Returns one frame of every synthetic scene at the given resolution.
+    """
+    scenes = ["vortex_dialog", "browser_page", "download_started", "idle"]
+    return [make_synthetic_frame(width, height, scene) for scene in scenes]
+
+
+def jittered_frames(width: int, height: int, count: int, seed: int = 0) -> list:
+    """
+    Returns labelled button scenes with random UI scales (0.8-1.3x the 1080p
+    sizes, so the buttons stay within the size filters) and random offsets
+    of up to 40 pixels, for accuracy checks.
+    """
+    rng = np.random.default_rng(seed)
+    frames = []
+    for i in range(count):
+        scene = ("vortex_dialog", "browser_page")[i % 2]
+        frame = make_synthetic_frame(width, height, scene, scale=rng.uniform(0.8, 1.3), labels=True)
+        frames.append(np.roll(frame, tuple(rng.integers(-40, 41, size=2)), axis=(0, 1)))
+    return frames
+
+
+def recorded_frames(source: str, width: int, height: int) -> list:
+    """
+    Loads recorded frames and rescales them to the given resolution.
+    """
+    backend = ReplayBackend(source)
+    frames = []
+    for _ in range(len(backend)):
+        frame = np.array(backend.grab())
+        if frame.shape[1] != width or frame.shape[0] != height:
+            frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+        frames.append(frame)
+    return frames
+
+
+def shared_frame_cycle(frame: Frame):
+    """
+    Runs every page detector on one shared frame, as a monitoring cycle does.
+    """
+    detection.detect_manual_button(frame)
+    detection.detect_slow_download_button(frame)
+    detection.detect_download_started(frame)
+
+
+def color_masks_hsv(frame: Frame) -> list:
+    """
+    Color masks of the 'Slow download' region the old way: HSV conversion
+    and one inRange per range.
+    """
+    spec = detection.button_specs()["slow_download"]
+    hsv = frame.roi(frame.bbox_from_percent(*spec.region), "hsv")
+    return [cv2.inRange(hsv, lower, upper) for ranges in spec.color_classes().values() for lower, upper in ranges]
+
+
+def color_masks_lut(frame: Frame) -> list:
+    """
+    The same masks from the precomputed color lookup table.
+    """
+    spec = detection.button_specs()["slow_download"]
+    classes = spec.color_classes()
+    classifier = classifier_for(classes, config.COLOR_LUT_BITS)
+    labels = classifier.classify(frame.roi(frame.bbox_from_percent(*spec.region)))
+    return [classifier.mask(labels, name) for name in classes]
+
+
+def synthetic_matcher() -> TemplateMatcher:
+    """
+    Returns a TemplateMatcher whose "Download manually" template is cut from
+    the synthetic 1080p dialog. Its pyramids are built per resolution during
+    the warm-up calls.
+    """
+    matcher = TemplateMatcher(directory=tempfile.mkdtemp(prefix="vortex_templates_"))
+    capture_template(matcher, "manual_button", Frame(make_synthetic_frame(1920, 1080, "vortex_dialog")))
+    return matcher
+
+
+def template_detector():
+    """Returns a find_text_on_screen equivalent."""
+    matcher = synthetic_matcher()
+    return lambda frame: matcher.match(frame, "manual_button")
+
+
+def race_detector():
+    """
+    Returns the 'Download manually' detection race (last known position,
+    color blobs and template) as the downloader runs it.
+    """
+    tracker = LocationTracker()
+    race = DetectionRace("manual_button", detection.button_strategies("manual_button", tracker, synthetic_matcher()))
+
+    def run(frame):
+        winner = race.run(frame)
+        if winner is not None and winner.strategy != "prior":
+            tracker.confirm("manual_button", frame, winner)
+        return winner
+    return run
+
+
+def tracked(detector):
+    """
+    Returns the detector with its own LocationTracker, as the downloader runs
+    it: after the first hit, frames are searched around the last position first.
+    """
+    tracker = LocationTracker()
+    return lambda frame: detector(frame, tracker)
+
+
+def tiled(name: str):
+    """
+    Returns the best-candidate search for a button with one tile worker per
+    CPU core (regions under DETECTION_TILE_MIN_PIXELS still run in one piece).
+    """
+    detector = ButtonDetector(detection.button_specs()[name], workers=os.cpu_count() or 4)
+    return detector.best
+
+
+def cached(name: str, detector):
+    """
+    Returns the detector behind a ResultCache keyed on its search region, as
+    the downloader runs it. The benchmark cycles through a few frames, so
+    after the warm-up every call is a cache hit: this measures the hashing.
+    """
+    cache = ResultCache()
+    region = detection.search_regions()[name]
+    return lambda frame: cache.lookup(name, frame, frame.bbox_from_percent(*region), lambda: detector(frame))
+
+
+def cascaded():
+    """
+    Returns the 'Download manually' detector behind a DialogCascade, as the
+    downloader runs it: frames without a dialog stop at the cheap stages.
+    """
+    cascade = DialogCascade()
+    return lambda frame: cascade.run(frame, lambda: detection.detect_manual_button(frame))
+
+
+def default_detectors() -> dict:
+    """
+    Returns the detectors to benchmark as name -> callable(frame).
+
+    Each callable gets a fresh Frame per timed call, so cached conversions
+    never leak from one measurement into the next.
+    """
+    return {
+        "detect_button_on_screen": detection.detect_manual_button,
+        "detect_button_on_screen (race)": race_detector(),
+        "detect_button_on_screen (cascade)": cascaded(),
+        "click_slow_download": detection.detect_slow_download_button,
+        "click_slow_download (tracked)": tracked(detection.detect_slow_download_button),
+        "click_slow_download (tiled)": tiled("slow_download"),
+        "check_download_started": detection.detect_download_started,
+        "check_download_started (cached)": cached("download_started", detection.detect_download_started),
+        "find_button_by_color": lambda frame: detection.find_button_by_color(
+            frame, [((125, 50, 50), (155, 255, 255))]),
+        "find_text_on_screen": template_detector(),
+        "cycle (shared frame)": shared_frame_cycle,
+        "color masks (cvtColor+inRange)": color_masks_hsv,
+        "color masks (LUT)": color_masks_lut,
+    }
+
+
+def measure(func, frames: list, iterations: int, warmup: int = 3) -> dict:
+    """
+    Times func over the frames (RGB arrays), cycling through them.
+
+    Returns:
+        Dict with p50/p95/p99/mean latency in milliseconds and frames/sec
+    """
+    for i in range(warmup):
+        func(Frame(frames[i % len(frames)]))
+
+    samples = np.empty(iterations)
+    for i in range(iterations):
+        pixels = frames[i % len(frames)]
+        start = time.perf_counter()
+        func(Frame(pixels))
+        samples[i] = (time.perf_counter() - start) * 1000
+
+    mean_ms = float(samples.mean())
+    return {
+        "p50_ms": float(np.percentile(samples, 50)),
+        "p95_ms": float(np.percentile(samples, 95)),
+        "p99_ms": float(np.percentile(samples, 99)),
+        "mean_ms": mean_ms,
+        "fps": 1000 / mean_ms if mean_ms > 0 else float("inf"),
+    }
+
+
+def run_benchmark(detectors: dict, resolutions: list, iterations: int, frames_source: str = None) -> dict:
+    """
+    Benchmarks every detector at every resolution.
+
+    Returns:
+        Nested dict: results[resolution][detector] -> stats from measure()
+    """
+    results = {}
+    for resolution in resolutions:
+        width, height = RESOLUTIONS[resolution]
+        if frames_source:
+            frames = recorded_frames(frames_source, width, height)
+        else:
+            frames = synthetic_frames(width, height)
+
+        results[resolution] = {}
+        for name, func in detectors.items():
+            results[resolution][name] = measure(func, frames, iterations)
+    return results
+
+
+def compare_downscale(resolutions: list, factors: list, count: int = 40, iterations: int = 5) -> dict:
+    """
+    Runs the button detectors natively and at each downscale factor on
+    jittered_frames(), and compares the results.
+
+    A downscaled result agrees when it is the same candidate the native path
+    returns (or both return nothing).
+
+    Returns:
+        results[resolution][factor] -> {"p50_ms", "p95_ms", "agreement", "missed", "max_offset_px"};
+        factor 1 is the native path
+    """
+    specs = detection.button_specs()
+    names = ("manual_button", "slow_download")
+    results = {}
+    for resolution in resolutions:
+        frames = jittered_frames(*RESOLUTIONS[resolution], count)
+        results[resolution] = {}
+        native = []
+        for factor in [1] + [f for f in factors if f != 1]:
+            detectors = [ButtonDetector(specs[name], downscale=factor) for name in names]
+            found, samples = [], []
+            for i, pixels in enumerate(frames):
+                detector = detectors[i % 2]
+                for _ in range(iterations):
+                    frame = Frame(pixels)
+                    start = time.perf_counter()
+                    best = detector.best(frame)
+                    samples.append((time.perf_counter() - start) * 1000)
+                found.append(best)
+            if factor == 1:
+                native = found
+
+            agree = sum((a.as_tuple() if a else None) == (b.as_tuple() if b else None)
+                        for a, b in zip(native, found))
+            offsets = [max(abs(a.x - b.x), abs(a.y - b.y)) for a, b in zip(native, found) if a and b]
+            results[resolution][factor] = {
+                "p50_ms": float(np.percentile(samples, 50)),
+                "p95_ms": float(np.percentile(samples, 95)),
+                "agreement": agree / len(frames),
+                "missed": sum(1 for a, b in zip(native, found) if a and not b),
+                "max_offset_px": max(offsets, default=0),
+            }
+    return results
+
+
+def print_downscale_report(results: dict):
+    """Prints the compare_downscale() results as a table."""
+    header = (f"{'resolution':<10} {'scale':<8} {'p50 ms':>9} {'p95 ms':>9} "
+              f"{'agree':>9} {'missed':>9} {'max px':>9}")
+    print(header)
+    print("-" * len(header))
+    for resolution, factors in results.items():
+        for factor, stats in factors.items():
+            label = "native" if factor == 1 else f"1/{factor}"
+            print(f"{resolution:<10} {label:<8} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} "
+                  f"{stats['agreement']:>9.1%} {stats['missed']:>9} {stats['max_offset_px']:>9}")
+
+
+def simulate_download_input(actuator):
+    """
+    Replays the mouse and keyboard input of one download, as the downloader
+    sends it: both button clicks, then closing the tab and restoring Vortex.
+    """
+    actuator.click(320, 446)  # 'Download manually'
+    actuator.wait(config.BUTTON_CLICK_DELAY, "after_click")
+    actuator.click(576, 540)  # 'Slow download'
+    actuator.wait(actuator.profile.focus_delay, "focus")  # Browser to the front
+    actuator.shortcut("ctrl", "w")
+    actuator.wait(actuator.profile.restore_delay, "focus")  # Vortex back to the front
+
+
+def compare_actuator_profiles(downloads: int = 10) -> dict:
+    """
+    Simulates the input of several downloads with every timing profile on a
+    RecordingActuator.
+
+    Returns:
+        profile -> {"per_download": seconds, "input_per_download": seconds without the
+        fixed BUTTON_CLICK_DELAY, "calls": pyautogui calls per download, "actions": stats()}
+    """
+    results = {}
+    for name, profile in timing_profiles().items():
+        actuator = RecordingActuator(profile)
+        for _ in range(downloads):
+            simulate_download_input(actuator)
+        stats = actuator.stats()
+        total = actuator.total_seconds()
+        results[name] = {
+            "per_download": total / downloads,
+            "input_per_download": (total - stats["after_click"]["seconds"]) / downloads,
+            "calls": len(actuator.events) / downloads,
+            "actions": stats,
+        }
+    return results
+
+
+def print_actuator_report(results: dict):
+    """Prints the compare_actuator_profiles() results as a table."""
+    header = f"{'profile':<10} {'calls':>7} {'input s':>9} {'total s':>9}  per action (mean ms)"
+    print(header)
+    print("-" * len(header))
+    for name, stats in results.items():
+        actions = ", ".join(f"{action} {a['mean'] * 1000:.0f}" for action, a in stats["actions"].items())
+        print(f"{name:<10} {stats['calls']:>7.0f} {stats['input_per_download']:>9.2f} "
+              f"{stats['per_download']:>9.2f}  {actions}")
+
+
+def print_report(results: dict):
+    """Prints the results as a table."""
+    header = f"{'resolution':<10} {'detector':<32} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'fps':>9}"
+    print(header)
+    print("-" * len(header))
+    for resolution, detectors in results.items():
+        for name, stats in detectors.items():
+            print(f"{resolution:<10} {name:<32} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} "
+                  f"{stats['p99_ms']:>9.2f} {stats['fps']:>9.1f}")
+
+
+def find_regressions(results: dict, baseline: dict, max_regression: float) -> list:
+    """
+    Compares p95 latency against a saved baseline.
+
+    Returns:
+        List of human-readable regression descriptions (empty if none)
+    """
+    regressions = []
+    for resolution, detectors in results.items():
+        for name, stats in detectors.items():
+            previous = baseline.get(resolution, {}).get(name)
+            if not previous:
+                continue
+            limit = previous["p95_ms"] * (1 + max_regression)
+            if stats["p95_ms"] > limit:
+                regressions.append(
+                    f"{resolution} {name}: p95 {stats['p95_ms']:.2f} ms "
+                    f"(baseline {previous['p95_ms']:.2f} ms, limit {limit:.2f} ms)")
+    return regressions
+
+
+def main(argv: list = None, detectors: dict = None) -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Benchmark the screen detectors.")
+    parser.add_argument("--frames", help="Directory or archive of recorded PNG frames (default: synthetic)")
+    parser.add_argument("--iterations", type=int, default=50, help="Timed runs per detector and resolution")
+    parser.add_argument("--resolutions", default=",".join(DEFAULT_RESOLUTIONS),
+                        help="Comma-separated subset of: " + ", ".join(RESOLUTIONS))
+    parser.add_argument("--save-json", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="Allowed p95 slowdown versus the baseline (0.2 = 20%%)")
+    parser.add_argument("--downscale", type=int, nargs="+", metavar="FACTOR",
+                        help="Instead: compare coarse-to-fine button detection at these factors (2, 4) "
+                             "against the native path, on jittered synthetic screens")
+    parser.add_argument("--actuator", action="store_true",
+                        help="Instead: simulate the mouse and keyboard input of a download with each "
+                             "timing profile and report the time spent per download")
+    args = parser.parse_args(argv)
+
+    resolutions = [r.strip().lower() for r in args.resolutions.split(",") if r.strip()]
+    unknown = [r for r in resolutions if r not in RESOLUTIONS]
+    if unknown:
+        parser.error(f"Unknown resolution(s): {', '.join(unknown)}")
+
+    if args.actuator:
+        print_actuator_report(compare_actuator_profiles())
+        return 0
+
+    if args.downscale:
+        print_downscale_report(compare_downscale(resolutions, args.downscale))
+        return 0
+
+    results = run_benchmark(detectors or default_detectors(), resolutions, args.iterations, args.frames)
+    print_report(results)
+
+    if args.save_json:
+        with open(args.save_json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = find_regressions(results, baseline, args.max_regression)
+        if regressions:
+            print("\nRegressions:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("\nNo regressions against baseline.")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
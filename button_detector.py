@@ -0,0 +1,575 @@
+"""
+One detection engine for every button, configured by declarative specs.
+
+A ButtonSpec says where a button is searched (region), which colors make
+up its body (color bands), which colors must not be inside it (exclusions),
+which sizes and proportions are plausible, and how candidates are scored.
+ButtonDetector runs the same pipeline for any spec:
+
+    region (HSV) -> band mask -> external contours (one pass)
+                 -> size/aspect filter -> exclusion check -> scored, ranked candidates
+
+On large screens the blobs can be found on the region shrunk by 2 or 4
+(cv2.INTER_AREA) instead: the size filters are scaled down with it, and
+every blob that passes is then confirmed, measured and scored at full
+resolution in a small crop around it.
+
+Very large regions (a capture spanning several monitors) can also be split
+into overlapping tiles searched in parallel by a thread pool; OpenCV
+releases the GIL, so the tiles really run on separate cores. The overlap
+is wider than the largest button, so every candidate lies whole in some
+tile and the result is the same as searching the region in one piece.
+
+Everything a candidate is scored on (excluded colors, border contrast, text
+pixels) is read from summed-area tables built once per region, so checking
+a candidate costs a few lookups no matter how large it is or how many
+candidates a busy page produces.
+
+Adding a new button means adding a spec (see detection.button_specs()),
+not another copy of the contour loop.
+"""
+
+import logging
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+import config
+from capture import Frame
+from color_classes import ColorClassifier, classifier_for
+
+logger = logging.getLogger(__name__)
+
+
+class SummedAreaTable:
+    """
+    Integral image over one or more stacked planes (masks, brightness):
+    the sum of every plane over any rectangle in four lookups.
+    """
+
+    def __init__(self, planes: dict, scales: dict = None):
+        """
+        Args:
+            planes: Name -> single-channel uint8 image, all the same size
+            scales: Name -> factor applied to that plane's sums
+                    (1/255 turns a 0/255 mask into a pixel count); default 1
+        """
+        scales = scales or {}
+        self.names = list(planes)
+        image = cv2.merge(list(planes.values())) if len(planes) > 1 else planes[self.names[0]]
+        self.height, self.width = image.shape[:2]
+        # 32-bit sums are faster and enough unless the region could overflow them
+        depth = cv2.CV_32S if self.height * self.width * 255 < 2 ** 31 else cv2.CV_64F
+        self.table = cv2.integral(image, sdepth=depth).reshape(self.height + 1, self.width + 1, -1)
+        self.scales = np.array([scales.get(name, 1.0) for name in self.names])
+
+    def sums(self, x: int, y: int, w: int, h: int) -> dict:
+        """Returns name -> sum of that plane over the w x h rectangle at (x, y), clipped to the image."""
+        x1, y1 = max(x, 0), max(y, 0)
+        x2, y2 = min(x + w, self.width), min(y + h, self.height)
+        if x2 <= x1 or y2 <= y1:
+            return dict.fromkeys(self.names, 0.0)
+        t = self.table
+        values = (t[y2, x2] - t[y1, x2] - t[y2, x1] + t[y1, x1]) * self.scales
+        return dict(zip(self.names, values.tolist()))
+
+
+class ButtonSpec:
+    """
+    Declarative description of a button.
+    """
+
+    def __init__(self, name: str, region: tuple, bands: list, min_size: tuple, max_size: tuple,
+                 aspect: tuple = (2, 8), exclusions: dict = None, max_exclusion: float = 0.1,
+                 target_aspect: float = None, weights: dict = None, border: int = 4,
+                 text_value: int = 150, text_target: float = 0.05):
+        """
+        Args:
+            name: Button name for logging
+            region: (left, top, right, bottom) search region as fractions of the screen
+            bands: List of (lower_hsv, upper_hsv) ranges that make up the button body
+            min_size: (width, height) the bounding box must exceed (pixels)
+            max_size: (width, height) the bounding box must stay under (pixels)
+            aspect: (min, max) width/height ratio, exclusive
+            exclusions: Name -> (lower_hsv, upper_hsv) of colors that must not fill the button
+            max_exclusion: Largest fraction of the box an exclusion color may cover
+            target_aspect: Ideal width/height ratio for scoring (default: geometric middle of the aspect range)
+            weights: Feature name -> weight in the confidence score (see ButtonDetector.score)
+            border: Width of the ring around a candidate used for border contrast (pixels)
+            text_value: HSV value (brightness) from which a pixel counts as label text
+            text_target: Text pixel fraction at which the text feature scores 1
+        """
+        self.name = name
+        self.region = region
+        self.bands = [(np.array(lower, dtype=np.uint8), np.array(upper, dtype=np.uint8)) for lower, upper in bands]
+        self.min_size = min_size
+        self.max_size = max_size
+        self.aspect = aspect
+        self.exclusions = {key: (np.array(lower, dtype=np.uint8), np.array(upper, dtype=np.uint8))
+                           for key, (lower, upper) in (exclusions or {}).items()}
+        self.max_exclusion = max_exclusion
+        self.target_aspect = target_aspect or (aspect[0] * aspect[1]) ** 0.5
+        self.weights = weights or {"fill": 1.0, "aspect": 1.0, "exclusion": 1.0, "contrast": 0.5, "text": 0.5}
+        self.border = border
+        self.text_value = text_value
+        self.text_target = text_target
+
+    def color_classes(self) -> dict:
+        """
+        Returns every color the detector reads, as class name -> list of HSV ranges:
+        "band" (the button body), "text" (label pixels) and each exclusion.
+        """
+        classes = {"band": self.bands, "text": [((0, 0, self.text_value), (180, 255, 255))]}
+        for key, (lower, upper) in self.exclusions.items():
+            classes[key] = [(lower, upper)]
+        return classes
+
+
+class RegionColors:
+    """
+    The color class masks of one search region, computed on first use.
+
+    With a ColorClassifier the masks come from one lookup-table pass over
+    the RGB pixels; without one, from the HSV conversion and one inRange
+    per range. Both give the same masks.
+    """
+
+    def __init__(self, pixels: np.ndarray, classes: dict, classifier: ColorClassifier = None, hsv=None):
+        """
+        Args:
+            pixels: RGB pixels of the region
+            classes: Class name -> list of (lower_hsv, upper_hsv)
+            classifier: Lookup table covering these classes, or None for the HSV path
+            hsv: HSV pixels of the region (HSV path; converted from pixels if not given)
+        """
+        self.pixels = pixels
+        self.classes = classes
+        self.classifier = classifier
+        self._hsv = hsv
+        self._labels = None
+        self._masks = {}
+
+    def mask(self, name: str) -> np.ndarray:
+        """Returns the 0/255 mask of one class."""
+        mask = self._masks.get(name)
+        if mask is None:
+            if self.classifier is not None:
+                if self._labels is None:
+                    self._labels = self.classifier.classify(self.pixels)
+                mask = self.classifier.mask(self._labels, name)
+            else:
+                if self._hsv is None:
+                    self._hsv = cv2.cvtColor(self.pixels, cv2.COLOR_RGB2HSV)
+                for lower, upper in self.classes[name]:
+                    band = cv2.inRange(self._hsv, lower, upper)
+                    mask = band if mask is None else cv2.bitwise_or(mask, band)
+            self._masks[name] = mask
+        return mask
+
+    def value(self) -> np.ndarray:
+        """Returns the brightness (HSV value, i.e. max(R, G, B)) of every pixel."""
+        if self._hsv is not None:
+            return cv2.extractChannel(self._hsv, 2)
+        r, g, b = cv2.split(self.pixels)
+        return cv2.max(cv2.max(r, g), b)
+
+
+class Candidate:
+    """A button candidate found by ButtonDetector, in screen coordinates."""
+
+    def __init__(self, x: int, y: int, width: int, height: int, bbox: tuple, confidence: float, features: dict):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.bbox = bbox  # (left, top, right, bottom) on screen
+        self.area = width * height
+        self.aspect = width / height if height > 0 else 0
+        self.confidence = confidence
+        self.features = features
+
+    def as_tuple(self) -> tuple:
+        """Returns (x, y, area, aspect_ratio), the format the detectors always returned."""
+        return (self.x, self.y, self.area, self.aspect)
+
+    def __repr__(self):
+        return (f"Candidate(({self.x}, {self.y}), {self.width}x{self.height}, "
+                f"confidence {self.confidence:.2f})")
+
+
+class ButtonDetector:
+    """
+    Finds the buttons described by a ButtonSpec in a Frame.
+    """
+
+    def __init__(self, spec: ButtonSpec, use_lut: bool = None, lut_bits: int = None, downscale: int = None,
+                 workers: int = None):
+        """
+        Args:
+            spec: The button to find
+            use_lut: Classify colors with a lookup table instead of HSV + inRange
+                     (default: COLOR_LUT_ENABLED)
+            lut_bits: Bits per RGB channel of the lookup table (default: COLOR_LUT_BITS)
+            downscale: Find blobs on the region shrunk by this factor (1 = native, 2 or 4),
+                       0 to pick one from the screen height (default: DETECTION_DOWNSCALE)
+            workers: Threads searching tiles of large regions in parallel; 0 or 1 searches
+                     the region in one piece (default: DETECTION_WORKERS)
+        """
+        self.spec = spec
+        self.use_lut = config.COLOR_LUT_ENABLED if use_lut is None else use_lut
+        self.lut_bits = config.COLOR_LUT_BITS if lut_bits is None else lut_bits
+        self.downscale = config.DETECTION_DOWNSCALE if downscale is None else downscale
+        self.workers = config.DETECTION_WORKERS if workers is None else workers
+
+    def downscale_for(self, frame: Frame) -> int:
+        """
+        Returns the downscale factor to use on this frame. In automatic mode
+        (0) the factor doubles for every DETECTION_DOWNSCALE_HEIGHT multiple
+        of the screen height, as long as the smallest button stays at least
+        DETECTION_MIN_COARSE_SIZE pixels tall once shrunk.
+        """
+        if self.downscale:
+            return self.downscale
+        factor = 1
+        smallest = min(self.spec.min_size)
+        while (factor < 4 and frame.screen_size[1] >= config.DETECTION_DOWNSCALE_HEIGHT * factor * 2
+               and smallest / (factor * 2) >= config.DETECTION_MIN_COARSE_SIZE):
+            factor *= 2
+        return factor
+
+    def region_colors(self, frame: Frame, search_box: tuple) -> RegionColors:
+        """
+        Returns the color masks of the search region. The lookup table is
+        looked up by the spec's ranges, so it is rebuilt when they change.
+        """
+        hsv = None if self.use_lut else frame.roi(search_box, "hsv")
+        return self.colors_of(frame.roi(search_box), hsv)
+
+    def colors_of(self, pixels: np.ndarray, hsv: np.ndarray = None) -> RegionColors:
+        """Returns the color masks of any RGB pixels (e.g. a downscaled region)."""
+        classes = self.spec.color_classes()
+        if self.use_lut:
+            return RegionColors(pixels, classes, classifier_for(classes, self.lut_bits))
+        return RegionColors(pixels, classes, hsv=hsv)
+
+    def search_box(self, frame: Frame) -> tuple:
+        """Returns the spec's search region in frame pixels."""
+        return frame.bbox_from_percent(*self.spec.region)
+
+    def detect(self, frame: Frame, limit: int = None, search_box: tuple = None) -> list:
+        """
+        Returns the candidates in the spec's region, best first.
+
+        Args:
+            frame: Captured screen
+            limit: Return at most this many candidates (default: all)
+            search_box: (left, top, right, bottom) in frame pixels to search
+                        instead of the spec's region (e.g. a tracked window)
+
+        Returns:
+            List of Candidates ranked by confidence (ties: larger first, then top-left first)
+        """
+        search_box = search_box or self.search_box(frame)
+        if frame.roi(search_box).size == 0:
+            return []
+
+        factor = self.downscale_for(frame)
+        tiles = self.tiles(search_box, factor)
+        if len(tiles) > 1:
+            candidates = self.detect_tiled(frame, search_box, tiles, factor)
+        else:
+            candidates = self.detect_box(frame, search_box, factor)
+        if not candidates:
+            logger.debug(f"[{self.spec.name}] No candidates in search region.")
+
+        candidates.sort(key=lambda c: (-c.confidence, -c.area, c.bbox[1], c.bbox[0]))
+        return candidates[:limit] if limit else candidates
+
+    def detect_box(self, frame: Frame, search_box: tuple, factor: int) -> list:
+        """Returns the unsorted candidates in one box, natively or coarse-to-fine."""
+        if factor > 1:
+            return self.confirm(frame, search_box, self.coarse_boxes(frame, search_box, factor))
+        return self.find_candidates(frame, search_box)
+
+    def tiles(self, search_box: tuple, factor: int = 1) -> list:
+        """
+        Splits a search region into overlapping tiles, about one per worker.
+
+        Neighbouring tiles overlap by the largest button size plus its
+        border ring on both sides, so any candidate lies (with its ring) whole
+        inside at least one tile. Tiles start on multiples of the downscale
+        factor, so their coarse pixels line up with the undivided region's.
+
+        Returns:
+            List of (left, top, right, bottom) tiles in frame pixels;
+            just [search_box] when tiling is off or the region is small
+        """
+        left, top, right, bottom = search_box
+        width, height = right - left, bottom - top
+        if self.workers <= 1 or width * height < config.DETECTION_TILE_MIN_PIXELS:
+            return [search_box]
+
+        (max_w, max_h), margin = self.spec.max_size, self.spec.border + 1
+        overlap_x = max_w + 2 * margin + 2 * factor
+        overlap_y = max_h + 2 * margin + 2 * factor
+        # Tiles about as wide as tall, and each clearly larger than the overlap
+        columns = max(1, round(math.sqrt(self.workers * width / height)))
+        rows = max(1, math.ceil(self.workers / columns))
+        columns = max(1, min(columns, width // (2 * overlap_x)))
+        rows = max(1, min(rows, height // (2 * overlap_y)))
+        step_x = math.ceil(width / columns / factor) * factor
+        step_y = math.ceil(height / rows / factor) * factor
+
+        return [(left + col * step_x, top + row * step_y,
+                 min(left + (col + 1) * step_x + overlap_x, right),
+                 min(top + (row + 1) * step_y + overlap_y, bottom))
+                for row in range(rows) for col in range(columns)]
+
+    def detect_tiled(self, frame: Frame, search_box: tuple, tiles: list, factor: int) -> list:
+        """
+        Searches the tiles in the thread pool and merges their candidates.
+
+        A candidate within its border ring (plus one pixel) of a tile edge
+        inside the region may be cut off, or measured against a clipped ring,
+        and is left to the neighbouring tile that holds it whole. Candidates
+        found whole in two overlapping tiles are the same box and are kept once.
+
+        Returns:
+            Unsorted list of Candidates, the same as detect_box() on the whole region
+        """
+        if self.use_lut:
+            classes = self.spec.color_classes()
+            classifier_for(classes, self.lut_bits)  # Build the table once, not in every thread
+        results = thread_pool(self.workers).map(lambda tile: self.detect_box(frame, tile, factor), tiles)
+
+        margin = self.spec.border + 1
+        found = {}
+        for tile, candidates in zip(tiles, results):
+            x1, y1 = frame.to_screen(tile[0], tile[1])
+            x2, y2 = frame.to_screen(tile[2], tile[3])
+            open_left, open_top = tile[0] > search_box[0], tile[1] > search_box[1]
+            open_right, open_bottom = tile[2] < search_box[2], tile[3] < search_box[3]
+            for candidate in candidates:
+                c_left, c_top, c_right, c_bottom = candidate.bbox
+                if ((open_left and c_left - margin < x1) or (open_top and c_top - margin < y1)
+                        or (open_right and c_right + margin > x2) or (open_bottom and c_bottom + margin > y2)):
+                    continue
+                found.setdefault(candidate.bbox, candidate)
+        logger.debug(f"[{self.spec.name}] Searched {len(tiles)} tiles with {self.workers} workers")
+        return list(found.values())
+
+    def find_candidates(self, frame: Frame, search_box: tuple) -> list:
+        """
+        Runs the full-resolution pipeline on one box of the frame.
+
+        Returns:
+            Unsorted list of the Candidates in the box
+        """
+        spec = self.spec
+        left, top = search_box[:2]
+        colors = self.region_colors(frame, search_box)
+        mask = colors.mask("band")
+        table = None  # Built when the first candidate passes the shape filters
+
+        # Outer contours only: one bounding box per blob. (connectedComponentsWithStats
+        # labels every pixel and is many times slower on these sparse masks.)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        (min_w, min_h), (max_w, max_h) = spec.min_size, spec.max_size
+
+        candidates = []
+        for contour in contours:
+            x_c, y_c, w_c, h_c = cv2.boundingRect(contour)
+            if not (min_w < w_c < max_w and min_h < h_c < max_h):
+                continue
+            aspect = w_c / h_c
+            if not (spec.aspect[0] < aspect < spec.aspect[1]):
+                continue
+
+            if table is None:
+                table = self.scoring_table(colors)
+            box_area = w_c * h_c
+            sums = table.sums(x_c, y_c, w_c, h_c)
+            exclusion = 0.0
+            for key in spec.exclusions:
+                ratio = sums[key] / box_area
+                if ratio > spec.max_exclusion:
+                    logger.debug(f"[{spec.name}] Skipping gray area at ({x_c}, {y_c}) - {key} detected ({ratio:.2%})")
+                    break
+                exclusion = max(exclusion, ratio)
+            else:
+                features = {"fill": sums["band"] / box_area, "aspect": aspect, "exclusion": exclusion,
+                            **self.box_features(table, sums, x_c, y_c, w_c, h_c)}
+                screen_x, screen_y = frame.to_screen(left + x_c + w_c // 2, top + y_c + h_c // 2)
+                x1, y1 = frame.to_screen(left + x_c, top + y_c)
+                candidate = Candidate(screen_x, screen_y, w_c, h_c, (x1, y1, x1 + w_c, y1 + h_c),
+                                      self.score(features), features)
+                candidates.append(candidate)
+                logger.debug(f"[{spec.name}] Found candidate at ({screen_x}, {screen_y}), size: {w_c}x{h_c}, "
+                             f"aspect: {aspect:.2f}, confidence: {candidate.confidence:.2f}")
+        return candidates
+
+    def coarse_boxes(self, frame: Frame, search_box: tuple, factor: int) -> list:
+        """
+        Finds button-sized blobs on the search region shrunk by factor.
+
+        The size limits are divided by the factor, with one coarse pixel of
+        slack per side for the edges INTER_AREA blends with the background.
+        The aspect ratio is left to the full-resolution check.
+
+        Returns:
+            List of (left, top, right, bottom) crops in frame pixels, each
+            holding one blob plus room for its border ring
+        """
+        spec = self.spec
+        left, top, right, bottom = search_box
+        pixels = frame.roi(search_box)
+        height, width = pixels.shape[:2]
+        height, width = height - height % factor, width - width % factor  # Whole coarse pixels only
+        if not height or not width:
+            return []
+        small = cv2.resize(pixels[:height, :width], (width // factor, height // factor),
+                           interpolation=cv2.INTER_AREA)
+
+        mask = self.colors_of(small).mask("band")
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        (min_w, min_h), (max_w, max_h) = spec.min_size, spec.max_size
+        pad = 2 * factor + spec.border
+
+        boxes = []
+        for contour in contours:
+            x_c, y_c, w_c, h_c = cv2.boundingRect(contour)
+            if not (min_w / factor - 2 < w_c < max_w / factor + 2 and min_h / factor - 2 < h_c < max_h / factor + 2):
+                continue
+            boxes.append((max(left + x_c * factor - pad, left), max(top + y_c * factor - pad, top),
+                          min(left + (x_c + w_c) * factor + pad, right),
+                          min(top + (y_c + h_c) * factor + pad, bottom)))
+        logger.debug(f"[{spec.name}] {len(boxes)} of {len(contours)} blobs kept at 1/{factor} scale")
+        return boxes
+
+    def confirm(self, frame: Frame, search_box: tuple, boxes: list) -> list:
+        """
+        Runs the full-resolution pipeline in each crop from coarse_boxes().
+
+        A candidate touching a crop edge (other than an edge of the search
+        region) is part of a larger blob cut by the crop and is dropped; the
+        full-resolution scan would have seen the whole blob.
+
+        Returns:
+            Unsorted list of the confirmed Candidates, without duplicates
+        """
+        found = {}
+        for crop in boxes:
+            x1, y1 = frame.to_screen(crop[0], crop[1])
+            x2, y2 = frame.to_screen(crop[2], crop[3])
+            open_left, open_top = crop[0] > search_box[0], crop[1] > search_box[1]
+            open_right, open_bottom = crop[2] < search_box[2], crop[3] < search_box[3]
+            for candidate in self.find_candidates(frame, crop):
+                c_left, c_top, c_right, c_bottom = candidate.bbox
+                if ((open_left and c_left <= x1) or (open_top and c_top <= y1)
+                        or (open_right and c_right >= x2) or (open_bottom and c_bottom >= y2)):
+                    continue
+                found[candidate.bbox] = candidate
+        return list(found.values())
+
+    def scoring_table(self, colors: RegionColors) -> SummedAreaTable:
+        """
+        Builds the summed-area table candidates are scored from, once per region.
+        Its planes are the button color mask ("band"), the label text mask
+        ("text"), the brightness ("value", the V channel) and one mask per
+        exclusion color; the mask planes sum to pixel counts.
+        """
+        planes = {"band": colors.mask("band"), "text": colors.mask("text"), "value": colors.value()}
+        for key in self.spec.exclusions:
+            planes[key] = colors.mask(key)
+        return SummedAreaTable(planes, {key: 1 / 255 for key in planes if key != "value"})
+
+    def box_features(self, table: SummedAreaTable, sums: dict, x: int, y: int, w: int, h: int) -> dict:
+        """
+        Returns the table-based features of a candidate box, given its plane sums.
+
+        - contrast: brightness difference between the box and the ring of
+          spec.border pixels around it (0-1); buttons stand out from their panel
+        - text: fraction of bright (label text) pixels inside the box
+        """
+        b = self.spec.border
+        box_area = w * h
+        outer_w = min(x + w + b, table.width) - max(x - b, 0)
+        outer_h = min(y + h + b, table.height) - max(y - b, 0)
+        ring_area = outer_w * outer_h - box_area
+        if ring_area > 0:
+            ring = table.sums(x - b, y - b, w + 2 * b, h + 2 * b)["value"] - sums["value"]
+            contrast = abs(sums["value"] / box_area - ring / ring_area) / 255
+        else:
+            contrast = 0.0
+        return {"contrast": contrast, "text": sums["text"] / box_area}
+
+    def best(self, frame: Frame, search_box: tuple = None) -> Candidate | None:
+        """Returns the highest ranked candidate (in search_box, if given), or None."""
+        candidates = self.detect(frame, limit=1, search_box=search_box)
+        return candidates[0] if candidates else None
+
+    def score(self, features: dict) -> float:
+        """
+        Combines a candidate's features into a confidence between 0 and 1.
+
+        - fill: fraction of the bounding box that has the button color
+          (solid buttons ~1, thin outlines and text low)
+        - aspect: 1 at the target aspect ratio, 0 at the edge of the allowed range
+        - exclusion: 1 with no excluded color, 0 at max_exclusion
+        - contrast: brightness step at the box border (see box_features)
+        - text: 1 once the label text covers spec.text_target of the box
+
+        Features without a weight in the spec are ignored.
+        """
+        spec = self.spec
+        low, high = np.log(spec.aspect[0]), np.log(spec.aspect[1])
+        target = np.log(spec.target_aspect)
+        distance = abs(np.log(features["aspect"]) - target) / max(target - low, high - target)
+        values = {
+            "fill": features["fill"],
+            "aspect": 1.0 - min(distance, 1.0),
+            "exclusion": 1.0 - features["exclusion"] / spec.max_exclusion if spec.max_exclusion else 1.0,
+            "contrast": features.get("contrast", 0.0),
+            "text": min(features.get("text", 0.0) / spec.text_target, 1.0) if spec.text_target else 0.0,
+        }
+        for key, value in features.items():
+            values.setdefault(key, value)
+
+        total = sum(spec.weights.values())
+        if not total:
+            return 0.0
+        return float(sum(values.get(key, 0.0) * weight for key, weight in spec.weights.items()) / total)
+
+
+_pools = {}  # Shared detection ThreadPoolExecutors by worker count
+_pool_lock = threading.Lock()
+
+
+def thread_pool(workers: int) -> ThreadPoolExecutor:
+    """
+    Returns the shared detection thread pool with this many workers, created
+    on first use. Detectors asking for the same count share one pool;
+    shutdown_thread_pool() closes them all.
+    """
+    with _pool_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = _pools[workers] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"detect{workers}")
+        return pool
+
+
+def shutdown_thread_pool(wait: bool = True):
+    """
+    Shuts the shared detection thread pools down (a later search starts a new one).
+
+    Args:
+        wait: Wait for searches already running to finish
+    """
+    with _pool_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=wait, cancel_futures=True)
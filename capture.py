@@ -0,0 +1,416 @@
+"""
+Screen capture backends for the Vortex Auto Downloader.
+
+Every detector gets its pixels through a CaptureBackend instead of calling
+PIL.ImageGrab directly, so detection can run against a live desktop or
+against recorded frames on a headless machine.
+"""
+
+import io
+import logging
+import tarfile
+import time
+import zipfile
+from pathlib import Path
+
+import cv2
+import numpy as np
+from PIL import Image, ImageGrab
+
+logger = logging.getLogger(__name__)
+
+
+def percent_to_bbox(region: tuple, screen_size: tuple) -> tuple:
+    """
+    Converts a (left, top, right, bottom) region in screen fractions to pixels.
+
+    Returns:
+        (x1, y1, x2, y2) in screen pixels
+    """
+    width, height = screen_size
+    left, top, right, bottom = region
+    return (int(width * left), int(height * top), int(width * right), int(height * bottom))
+
+
+# cv2 conversion codes for the color spaces a Frame can serve
+CONVERSIONS = {
+    "gray": cv2.COLOR_RGB2GRAY,
+    "hsv": cv2.COLOR_RGB2HSV,
+    "bgr": cv2.COLOR_RGB2BGR,
+}
+
+
+class Frame:
+    """
+    One screenshot, shared by every detector that looks at it.
+
+    The RGB pixels are converted to gray, HSV or BGR only when a detector asks
+    for them, and each conversion is cached so it happens at most once per
+    frame. ROI crops are NumPy views into the cached arrays, not copies.
+    """
+
+    def __init__(self, pixels, origin: tuple = (0, 0), timestamp: float = None, screen_size: tuple = None):
+        """
+        Args:
+            pixels: RGB PIL image or RGB NumPy array (height, width, 3)
+            origin: Screen position (x, y) of the frame's top-left pixel
+            timestamp: Capture time (time.time()); defaults to now
+            screen_size: (width, height) of the whole screen, when the frame
+                         only covers part of it; defaults to the frame size
+        """
+        if isinstance(pixels, Image.Image):
+            self._image = pixels
+            self.rgb = np.asarray(pixels)
+        else:
+            self._image = None
+            self.rgb = pixels
+        self.origin = origin
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.height, self.width = self.rgb.shape[:2]
+        self.screen_size = screen_size or (self.width, self.height)
+        self._views = {}      # color space -> full-frame array
+        self._roi_views = {}  # (color space, bbox) -> converted ROI
+        self.conversions = 0  # cvtColor calls actually run
+        self.reused = 0       # conversions served from the cache
+        self.decisions = {}   # What detectors concluded from this frame (for debugging)
+
+    @property
+    def size(self) -> tuple:
+        """(width, height) of the frame."""
+        return (self.width, self.height)
+
+    @property
+    def image(self) -> Image.Image:
+        """The frame as a PIL image (for saving)."""
+        if self._image is None:
+            self._image = Image.fromarray(self.rgb)
+        return self._image
+
+    def view(self, space: str = "rgb") -> np.ndarray:
+        """
+        Returns the whole frame in the given color space ("rgb", "gray", "hsv", "bgr").
+        """
+        if space == "rgb":
+            return self.rgb
+        if space in self._views:
+            self.reused += 1
+            return self._views[space]
+        self._views[space] = cv2.cvtColor(self.rgb, CONVERSIONS[space])
+        self.conversions += 1
+        return self._views[space]
+
+    @property
+    def gray(self) -> np.ndarray:
+        return self.view("gray")
+
+    @property
+    def hsv(self) -> np.ndarray:
+        return self.view("hsv")
+
+    @property
+    def bgr(self) -> np.ndarray:
+        return self.view("bgr")
+
+    def bbox_from_percent(self, left: float, top: float, right: float, bottom: float) -> tuple:
+        """
+        Turns a region given as fractions of the screen size into pixels.
+
+        The fractions are always relative to the whole screen, so detectors
+        find the same pixels whether the frame is a full-screen or a
+        region-of-interest capture. The result is clipped to the frame.
+
+        Returns:
+            (x1, y1, x2, y2) in frame coordinates
+        """
+        x1, y1, x2, y2 = percent_to_bbox((left, top, right, bottom), self.screen_size)
+        ox, oy = self.origin
+        return (min(max(x1 - ox, 0), self.width), min(max(y1 - oy, 0), self.height),
+                min(max(x2 - ox, 0), self.width), min(max(y2 - oy, 0), self.height))
+
+    def roi(self, bbox: tuple, space: str = "rgb") -> np.ndarray:
+        """
+        Returns a region of the frame in the given color space.
+
+        RGB crops, and crops of a color space already converted for the whole
+        frame, are zero-copy views. Otherwise only the region is converted,
+        and the result is cached for the next detector asking for it.
+
+        Args:
+            bbox: (x1, y1, x2, y2) in frame coordinates
+            space: "rgb", "gray", "hsv" or "bgr"
+        """
+        x1, y1, x2, y2 = bbox
+        if space == "rgb":
+            return self.rgb[y1:y2, x1:x2]
+        if space in self._views:
+            self.reused += 1
+            return self._views[space][y1:y2, x1:x2]
+        key = (space, bbox)
+        if key in self._roi_views:
+            self.reused += 1
+            return self._roi_views[key]
+        converted = cv2.cvtColor(self.rgb[y1:y2, x1:x2], CONVERSIONS[space])
+        self._roi_views[key] = converted
+        self.conversions += 1
+        return converted
+
+    def to_screen(self, x: int, y: int) -> tuple:
+        """
+        Converts frame coordinates to screen coordinates.
+        """
+        return (x + self.origin[0], y + self.origin[1])
+
+    def pixels_only(self) -> "Frame":
+        """
+        Returns a Frame with the same RGB pixels (not copied) and decisions,
+        but without the cached conversions and PIL image, for keeping frames
+        around: the caches can be several times the size of the pixels.
+        """
+        frame = Frame(self.rgb, self.origin, self.timestamp, self.screen_size)
+        frame.decisions = self.decisions  # Shared: decisions recorded later still show up
+        return frame
+
+
+class CaptureBackend:
+    """
+    Interface for anything that can produce screenshots.
+
+    Backends return RGB PIL images, the same thing ImageGrab.grab() returns,
+    so existing detector code only has to swap the call site.
+    """
+
+    def grab(self, bbox: tuple = None) -> Image.Image:
+        """
+        Captures a screenshot.
+
+        Args:
+            bbox: Optional (left, top, right, bottom) region in screen pixels.
+                  If None, the whole screen is captured.
+
+        Returns:
+            RGB PIL image of the requested region
+        """
+        raise NotImplementedError
+
+    def grab_frame(self, bbox: tuple = None, screen_size: tuple = None) -> Frame:
+        """
+        Captures a screenshot wrapped in a Frame.
+
+        Args:
+            bbox: Optional (left, top, right, bottom) region in screen pixels
+            screen_size: Full screen (width, height), needed when bbox is set
+        """
+        origin = (bbox[0], bbox[1]) if bbox else (0, 0)
+        return Frame(self.grab(bbox=bbox), origin=origin, screen_size=screen_size)
+
+    def size(self) -> tuple:
+        """
+        Returns the (width, height) of a full-screen capture.
+        """
+        return self.grab().size
+
+    def close(self):
+        """Releases any resources held by the backend."""
+
+
+class ImageGrabBackend(CaptureBackend):
+    """
+    Captures the live desktop with PIL.ImageGrab (the original behavior).
+    """
+
+    # GetSystemMetrics indices of the (width, height) of the primary monitor and of the virtual desktop
+    SCREEN_METRICS = {False: (0, 1), True: (78, 79)}
+
+    def __init__(self, all_screens: bool = False, size_ttl: float = 30.0):
+        """
+        Args:
+            all_screens: Capture the whole virtual desktop instead of the primary monitor
+            size_ttl: Seconds to trust the last measured screen size before
+                      asking the system for it again
+        """
+        self.all_screens = all_screens
+        self.size_ttl = size_ttl
+        self._size = None
+        self._size_time = 0.0
+        self._metrics = self._system_metrics()
+
+    @staticmethod
+    def _system_metrics():
+        """
+        Returns win32api.GetSystemMetrics, or None where pywin32 is missing
+        (the size then comes from a full grab). pyautogui makes the process
+        DPI aware when it is imported, so the metrics are physical pixels,
+        the same as ImageGrab's.
+        """
+        try:
+            import win32api
+        except ImportError:
+            return None
+        return win32api.GetSystemMetrics
+
+    def grab(self, bbox: tuple = None) -> Image.Image:
+        screenshot = ImageGrab.grab(bbox=bbox, all_screens=self.all_screens)
+        if screenshot.mode != "RGB":
+            screenshot = screenshot.convert("RGB")
+        if bbox is None:
+            self._size = screenshot.size
+            self._size_time = time.time()
+        return screenshot
+
+    def size(self) -> tuple:
+        """
+        Returns the screen size: the size of the last full capture or the
+        system metrics, refreshed every size_ttl seconds without grabbing
+        the whole screen (unless the metrics are unavailable).
+        """
+        if self._size is None or time.time() - self._size_time > self.size_ttl:
+            if self._metrics is None:
+                self.grab()
+            else:
+                width, height = self.SCREEN_METRICS[self.all_screens]
+                self._size = (self._metrics(width), self._metrics(height))
+                self._size_time = time.time()
+        return self._size
+
+
+class CapturePlanner:
+    """
+    Turns the search regions detectors declare into the bbox to capture.
+
+    Regions are (left, top, right, bottom) fractions of the screen. The
+    planner converts them to pixels once per screen resolution and captures
+    only the union of the regions that are active, instead of the whole
+    desktop.
+    """
+
+    def __init__(self, regions: dict):
+        """
+        Args:
+            regions: Mapping of region name -> (left, top, right, bottom) fractions
+        """
+        self.regions = dict(regions)
+        self._cache = {}  # (screen_size, names, fractions) -> bbox
+
+    def bbox(self, names, screen_size: tuple) -> tuple:
+        """
+        Returns the pixel bbox covering all the named regions.
+
+        Args:
+            names: Region name or iterable of region names
+            screen_size: (width, height) of the screen
+
+        Returns:
+            (x1, y1, x2, y2) in screen pixels
+        """
+        if isinstance(names, str):
+            names = (names,)
+        names = tuple(sorted(names))
+        fractions = tuple(self.regions[name] for name in names)
+        key = (tuple(screen_size), names, fractions)
+        if key not in self._cache:
+            boxes = [percent_to_bbox(region, screen_size) for region in fractions]
+            self._cache[key] = (min(b[0] for b in boxes), min(b[1] for b in boxes),
+                                max(b[2] for b in boxes), max(b[3] for b in boxes))
+            logger.debug(f"Capture plan for {', '.join(names)} at {screen_size[0]}x{screen_size[1]}: {self._cache[key]}")
+        return self._cache[key]
+
+    def update_regions(self, regions: dict):
+        """Replaces the declared regions and drops the cached plans."""
+        self.regions = dict(regions)
+        self._cache.clear()
+
+
+class ReplayBackend(CaptureBackend):
+    """
+    Serves recorded frames from a directory or archive of PNG files.
+
+    Frames are decoded once when the backend is created and then returned in
+    filename order, so replaying does not add decode time to measurements.
+    Supported sources are a directory, a .zip file and a .tar/.tar.gz file.
+    """
+
+    def __init__(self, source, loop: bool = True):
+        """
+        Args:
+            source: Path to a directory, .zip or .tar(.gz) of PNG frames
+            loop: If True, start over after the last frame; otherwise keep
+                  returning the last frame
+        """
+        self.source = Path(source)
+        self.loop = loop
+        self.frames = self._load_frames(self.source)
+        if not self.frames:
+            raise ValueError(f"No PNG frames found in '{self.source}'")
+        self.index = 0
+        logger.info(f"Loaded {len(self.frames)} replay frames from '{self.source}'")
+
+    @classmethod
+    def from_images(cls, images: list, loop: bool = True) -> "ReplayBackend":
+        """
+        Builds a replay backend from already-loaded PIL images.
+        """
+        backend = cls.__new__(cls)
+        backend.source = None
+        backend.loop = loop
+        backend.frames = [image.convert("RGB") for image in images]
+        if not backend.frames:
+            raise ValueError("No frames given")
+        backend.index = 0
+        return backend
+
+    @staticmethod
+    def _load_frames(source: Path) -> list:
+        """
+        Decodes every PNG in the source, sorted by name.
+        """
+        blobs = []
+        if source.is_dir():
+            for path in sorted(source.glob("*.png")):
+                blobs.append(path.read_bytes())
+        elif zipfile.is_zipfile(source):
+            with zipfile.ZipFile(source) as archive:
+                for name in sorted(archive.namelist()):
+                    if name.lower().endswith(".png"):
+                        blobs.append(archive.read(name))
+        elif tarfile.is_tarfile(source):
+            with tarfile.open(source) as archive:
+                members = [m for m in archive.getmembers()
+                           if m.isfile() and m.name.lower().endswith(".png")]
+                for member in sorted(members, key=lambda m: m.name):
+                    blobs.append(archive.extractfile(member).read())
+        else:
+            raise ValueError(f"Unsupported replay source '{source}'")
+
+        frames = []
+        for blob in blobs:
+            image = Image.open(io.BytesIO(blob))
+            image.load()
+            frames.append(image.convert("RGB"))
+        return frames
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def rewind(self):
+        """Starts serving from the first frame again."""
+        self.index = 0
+
+    def next_frame(self) -> Image.Image:
+        """
+        Returns the next full frame and advances the replay position.
+        """
+        frame = self.frames[self.index]
+        if self.index + 1 < len(self.frames):
+            self.index += 1
+        elif self.loop:
+            self.index = 0
+        return frame
+
+    def grab(self, bbox: tuple = None) -> Image.Image:
+        frame = self.next_frame()
+        if bbox is not None:
+            return frame.crop(bbox)
+        return frame
+
+    def size(self) -> tuple:
+        return self.frames[self.index].size
@@ -0,0 +1,133 @@
+"""
+Per-pixel color classes from a precomputed lookup table.
+
+The detectors describe colors as HSV ranges (button gray, purple, label
+text). Instead of converting every region to HSV and running one inRange
+per range, ColorClassifier evaluates the ranges once for every possible
+RGB color and stores the result in a table. Classifying a region is then
+one table lookup per pixel: the RGBA pixels are read as 32-bit integers
+and used directly as table indices.
+
+Each class is one bit of the label byte, so a pixel can belong to several
+classes; 0 is background. With 8 bits per channel the table holds every
+24-bit color (16 MB) and gives exactly the same masks as cvtColor +
+inRange. Fewer bits give a smaller table that classifies each color by the
+center of its bin, which can move the band edges slightly.
+"""
+
+import logging
+import time
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class ColorClassifier:
+    """
+    Compiles HSV color classes into an RGB lookup table.
+    """
+
+    def __init__(self, classes: dict, bits: int = 8):
+        """
+        Args:
+            classes: Class name -> list of (lower_hsv, upper_hsv) ranges (at most 8 classes)
+            bits: Bits kept per RGB channel (1-8); 8 is exact
+        """
+        if len(classes) > 8:
+            raise ValueError("ColorClassifier supports at most 8 classes")
+        if not 1 <= bits <= 8:
+            raise ValueError("bits must be between 1 and 8")
+        self.classes = {name: [(np.array(lower, dtype=np.uint8), np.array(upper, dtype=np.uint8))
+                               for lower, upper in ranges] for name, ranges in classes.items()}
+        self.bits = bits
+        self.bit = {name: 1 << i for i, name in enumerate(classes)}
+        self.shift = 8 - bits
+        channel_mask = (0xFF << self.shift) & 0xFF
+        self.index_mask = channel_mask | channel_mask << 8 | channel_mask << 16
+        self.table = self._build()
+
+    def _build(self) -> np.ndarray:
+        """
+        Classifies one representative color per bin and returns the table,
+        indexed by the packed little-endian RGB value (R + G<<8 + B<<16) of a bin.
+        """
+        start = time.perf_counter()
+        levels = 1 << self.bits
+        centers = (np.arange(levels) << self.shift) + ((1 << self.shift) >> 1)
+
+        # Every bin color, laid out as [blue][green][red] so the flat position
+        # matches the packed index when all 8 bits are kept
+        colors = np.empty((levels, levels, levels, 3), dtype=np.uint8)
+        colors[..., 0] = centers[None, None, :]
+        colors[..., 1] = centers[None, :, None]
+        colors[..., 2] = centers[:, None, None]
+        hsv = cv2.cvtColor(colors.reshape(levels * levels, levels, 3), cv2.COLOR_RGB2HSV)
+
+        labels = np.zeros(hsv.shape[:2], dtype=np.uint8)
+        for name, ranges in self.classes.items():
+            for lower, upper in ranges:
+                labels |= cv2.inRange(hsv, lower, upper) & self.bit[name]
+        labels = labels.ravel()
+
+        if self.bits == 8:
+            table = labels
+        else:
+            q = np.arange(levels)
+            index = (q[None, None, :] | q[None, :, None] << 8 | q[:, None, None] << 16).ravel()
+            table = np.zeros((self.index_mask >> self.shift) + 1, dtype=np.uint8)
+            table[index] = labels
+
+        logger.debug(f"Built color lookup table: {len(self.classes)} classes, {self.bits} bits/channel, "
+                     f"{table.nbytes / 1e6:.1f} MB in {(time.perf_counter() - start) * 1000:.0f} ms")
+        return table
+
+    def classify(self, pixels: np.ndarray, order: str = "rgb") -> np.ndarray:
+        """
+        Returns the class label map of an image region.
+
+        Args:
+            pixels: HxWx3 or HxWx4 uint8 pixels (e.g. a Frame ROI or a raw BGRA grab)
+            order: Channel order of the pixels, "rgb" or "bgr" (alpha, if any, is ignored)
+
+        Returns:
+            HxW uint8 labels; bit self.bit[name] is set for pixels in that class
+        """
+        if pixels.shape[2] == 3:
+            rgba = cv2.cvtColor(pixels, cv2.COLOR_RGB2RGBA if order == "rgb" else cv2.COLOR_BGR2RGBA)
+        elif order == "bgr":
+            rgba = cv2.cvtColor(pixels, cv2.COLOR_BGRA2RGBA)
+        else:
+            rgba = np.ascontiguousarray(pixels)
+
+        index = rgba.view("<u4")[..., 0] & self.index_mask
+        if self.shift:
+            index >>= self.shift
+        return self.table.take(index)
+
+    def mask(self, labels: np.ndarray, name: str) -> np.ndarray:
+        """
+        Returns a 0/255 mask of one class (the same form cv2.inRange returns).
+        """
+        return cv2.compare(labels & self.bit[name], 0, cv2.CMP_NE)
+
+
+_classifiers = {}  # Key of the classes and bits -> ColorClassifier
+
+
+def classifier_for(classes: dict, bits: int = 8) -> ColorClassifier:
+    """
+    Returns a ColorClassifier for these classes, reusing the last one built
+    for the same ranges. When the ranges change (e.g. the bands in config
+    were edited), a new table is built and the old one is released.
+    """
+    key = (bits, tuple((name, tuple((tuple(int(v) for v in lower), tuple(int(v) for v in upper))
+                                    for lower, upper in ranges))
+                       for name, ranges in classes.items()))
+    classifier = _classifiers.get(key)
+    if classifier is None:
+        _classifiers.clear()  # One table at a time: at 8 bits each one is 16 MB
+        classifier = ColorClassifier(classes, bits)
+        _classifiers[key] = classifier
+    return classifier
@@ -3,11 +3,24 @@
 # Timing Settings
 CHECK_INTERVAL = 1  # How often to check for dialogs (seconds)
 COOLDOWN_PERIOD = 10  # Time to wait between processing downloads (seconds)
-BROWSER_LOAD_WAIT = 3  # Time to wait for browser page to load (seconds)
+IDLE_MAX_INTERVAL = 2.5  # Polling slows down to this interval while nothing changes (seconds)
+IDLE_BACKOFF = 1.5  # Interval growth factor per quiet cycle
+FAST_POLL_INTERVAL = 0.25  # Polling interval right after a download, when the next dialog is due (seconds)
+FAST_POLL_WINDOW = 15  # How long fast polling lasts after the cooldown (seconds)
+BROWSER_LOAD_WAIT = 10  # Longest wait for the browser page to load (seconds)
+                        # Continues as soon as the "Slow download" button is detected
 BUTTON_CLICK_DELAY = 2  # Delay after clicking buttons (seconds)
 DOWNLOAD_CONFIRMATION_WAIT = 2  # Wait after clicking download button for confirmation page (seconds)
-TAB_CLOSE_DELAY = 6  # Wait this many seconds before closing tab after clicking download (seconds)
-                        # Nexus Mods has a 5-second countdown, so wait at least that long + buffer
+TAB_CLOSE_DELAY = 12  # Longest wait for the download to start before closing the tab (seconds)
+                      # Continues as soon as the "download has started" page is detected
+                      # Nexus Mods has a 5-second countdown, so keep this well above that
+DOWNLOAD_COUNTDOWN_FLOOR = 5  # The download is never confirmed sooner than this after clicking "Slow download"
+                              # (seconds): the countdown page looks like the confirmation page
+DOWNLOAD_CONFIRM_POLLS = 2  # Consecutive polls that must see the confirmation page
+WAIT_POLL_INTERVAL = 0.25  # How often those waits re-check the screen (seconds)
+FLOW_STEP_TIMEOUT = 5  # Time budget for a single click or tab-close step (seconds)
+FLOW_STEP_RETRIES = 1  # Extra attempts for steps that are safe to repeat (restoring Vortex)
+FLOW_RETRY_DELAY = 0.5  # Pause between attempts (seconds)
 
 # Detection Settings
 CONFIDENCE_THRESHOLD = 0.8  # Image matching confidence (0.0 to 1.0)
@@ -22,24 +35,43 @@ VORTEX_BUTTON_Y_PERCENT = 0.75  # 75% from top
 BROWSER_BUTTON_X_PERCENT = 0.638  # 63.8% from left
 BROWSER_BUTTON_Y_PERCENT = 0.558  # 55.8% from top
 
-# Search Regions (as percentage of window/screen dimensions)
-# For "Download manually" button in Vortex dialog
-VORTEX_SEARCH_TOP = 0.6  # Start searching at 60% from top
-VORTEX_SEARCH_LEFT = 0.0  # Start from left edge
-VORTEX_SEARCH_RIGHT = 0.5  # Search up to 50% of width (left half)
+# Search Regions (as percentage of screen dimensions)
+# Only these regions are captured each cycle, not the whole desktop
+# For "Download manually" button in Vortex dialog (calibrated button is at 16.7%, 41.3%)
+VORTEX_SEARCH_TOP = 0.35  # Start searching at 35% from top
+VORTEX_SEARCH_BOTTOM = 0.50  # Stop searching at 50% from top
+VORTEX_SEARCH_LEFT = 0.13  # Start at 13% from left
+VORTEX_SEARCH_RIGHT = 0.30  # Search up to 30% of width (before the purple premium panel)
 
 # For "Slow download" button in browser
-BROWSER_SEARCH_TOP = 0.3  # Start searching at 30% from top
-BROWSER_SEARCH_BOTTOM = 0.7  # Stop searching at 70% from top
-BROWSER_SEARCH_LEFT = 0.0  # Start from left edge
-BROWSER_SEARCH_RIGHT = 0.5  # Search up to 50% of width (left half)
+BROWSER_SEARCH_TOP = 0.35  # Start searching at 35% from top
+BROWSER_SEARCH_BOTTOM = 0.65  # Stop searching at 65% from top
+BROWSER_SEARCH_LEFT = 0.15  # Start at 15% from left
+BROWSER_SEARCH_RIGHT = 0.45  # Search up to 45% of width (before the purple section)
+
+# For the "Your download has started" confirmation page
+CONFIRMATION_SEARCH_TOP = 0.15  # File name box starts at 15% from top
+CONFIRMATION_SEARCH_BOTTOM = 0.55  # Confirmation text ends at 55% from top
+CONFIRMATION_SEARCH_LEFT = 0.20
+CONFIRMATION_SEARCH_RIGHT = 0.80
+CONFIRMATION_TEXT_TOP = 0.25  # "Your download has started" text starts at 25% of the screen height (clamped to the CONFIRMATION_SEARCH_* region)
+CONFIRMATION_FILE_BOX_BOTTOM = 0.30  # File name box ends at 30% of the screen height (clamped to the CONFIRMATION_SEARCH_* region)
+
+# For the "is a download dialog open" check: the manual button region plus the
+# left edge of the purple premium panel
+DIALOG_SEARCH_TOP = 0.30
+DIALOG_SEARCH_BOTTOM = 0.55
+DIALOG_SEARCH_LEFT = 0.13
+DIALOG_SEARCH_RIGHT = 0.40
+
+SCREEN_SIZE_REFRESH = 30  # Re-measure the screen resolution this often (seconds)
 
 # Button Size Filters (pixels)
 # Vortex dialog button dimensions
 VORTEX_BUTTON_MIN_WIDTH = 100
 VORTEX_BUTTON_MAX_WIDTH = 300
 VORTEX_BUTTON_MIN_HEIGHT = 30
-VORTEX_BUTTON_MAX_HEIGHT = 60
+VORTEX_BUTTON_MAX_HEIGHT = 70  # Matches the limit the detector used before it read these settings
 
 # Browser button dimensions
 BROWSER_BUTTON_MIN_WIDTH = 150
@@ -47,6 +79,46 @@ BROWSER_BUTTON_MAX_WIDTH = 400
 BROWSER_BUTTON_MIN_HEIGHT = 40
 BROWSER_BUTTON_MAX_HEIGHT = 80
 
+# Button Shape Filters (shared by both buttons)
+BUTTON_MIN_ASPECT = 2  # Buttons are wider than tall (width/height)
+BUTTON_MAX_ASPECT = 8
+
+# Button Color Bands (HSV, OpenCV ranges: H 0-180, S and V 0-255)
+# Gray button body, e.g. "Download manually" RGB(73,73,76) = HSV(120, 13, 76)
+BUTTON_GRAY_HSV_LOWER = (0, 0, 60)
+BUTTON_GRAY_HSV_UPPER = (180, 30, 100)
+# Purple premium buttons - a gray area containing this is not the free button
+PURPLE_HSV_LOWER = (125, 50, 50)
+PURPLE_HSV_UPPER = (155, 255, 255)
+PURPLE_MAX_RATIO = 0.1  # Most of a candidate that may be purple
+
+# Color Lookup Table
+# The bands above are compiled once into an RGB -> color class table, so detection
+# needs one table lookup per pixel instead of an HSV conversion and an inRange per band
+COLOR_LUT_ENABLED = True
+COLOR_LUT_BITS = 8  # Bits per RGB channel: 8 = exact (16 MB table), 6 = 4 MB, bands approximate
+
+# Multi-Resolution Detection
+# On large screens, button blobs are found on the search region shrunk by 2 or 4,
+# then confirmed and measured at full resolution around each blob
+DETECTION_DOWNSCALE = 0  # 1 = always native, 2 or 4 = fixed factor, 0 = pick from the screen height
+DETECTION_DOWNSCALE_HEIGHT = 720  # Automatic mode: shrink by 2 from 2x this height (1440p), by 4 from 4x (2880p)
+DETECTION_MIN_COARSE_SIZE = 12  # Automatic mode: the smallest button must stay this many pixels tall
+
+# Parallel Detection
+# Large search regions (e.g. a capture spanning several 4K monitors) are split into
+# overlapping tiles searched by a thread pool; the result is the same as in one piece
+DETECTION_WORKERS = 0  # Threads per search (0 = single-threaded; e.g. the number of CPU cores)
+DETECTION_TILE_MIN_PIXELS = 2_000_000  # Regions smaller than this are never tiled
+
+# Template Matching
+# Button templates are captured once (python templates.py capture <name>) and
+# matched with cv2.matchTemplate; matches below CONFIDENCE_THRESHOLD are ignored
+TEMPLATE_DIR = "templates"
+TEMPLATE_SCALES = (0.85, 0.9, 0.95, 1.0, 1.05, 1.1, 1.15, 1.25)  # Sizes tried around the expected template size
+TEMPLATE_COARSE_FACTOR = 0.5  # The first pass searches the region downscaled by this factor
+TEMPLATE_DPI_SCALE = 1.0  # Display scaling now / when the templates were captured (e.g. 1.25 for 100% -> 125%)
+
 # Edge Detection Settings
 CANNY_THRESHOLD_1 = 50
 CANNY_THRESHOLD_2 = 150
@@ -54,8 +126,78 @@ CANNY_THRESHOLD_2 = 150
 # Threshold Settings for Dark Button Detection
 BUTTON_THRESHOLD_VALUE = 80  # Pixels darker than this are considered button areas
 
+# Change Detection Gate
+# Skips the full button detector while the watched region looks the same
+CHANGE_GATE_ENABLED = True
+CHANGE_GATE_THRESHOLD = 0.01  # Fraction of sampled pixels that must change (1%)
+CHANGE_GATE_PIXEL_DELTA = 24  # Per-channel difference for a sampled pixel to count as changed
+CHANGE_GATE_STRIDE = 8  # Sample every 8th pixel in both directions
+CHANGE_GATE_MAX_AGE = 10  # Run the full detector at least this often, even on a static screen (seconds)
+
+# Location Tracker
+# Once a button is found, the next searches look around its last position first
+# and scan the whole search region only when it is not there
+TRACKER_ENABLED = True
+TRACKER_MARGIN = 0.5  # Window padding on each side, in button widths/heights (grows with each miss)
+TRACKER_SIZE_TOLERANCE = 0.25  # A tracked hit may differ from the last size by at most 25%
+TRACKER_MAX_MISSES = 5  # Drop the track after this many misses in a row
+TRACKER_MAX_AGE = 300  # Drop the track when not confirmed for this long (seconds)
+
+# Detection Race
+# The button strategies (color blobs, template, last known position) run at the same
+# time on each frame; the first one to clear its threshold decides, otherwise their
+# detections are combined by weighted voting
+DETECTION_RACE_ENABLED = False  # Experimental: the plain color detector + tracker is the default
+DETECTION_RACE_EARLY_EXIT = True  # False = always wait for every strategy and vote
+DETECTION_RACE_TIMEOUT = 0.5  # Longest wait for the strategies (seconds)
+DETECTION_FUSE_THRESHOLD = 0.35  # Smallest share of all the strategies' vote weight a position needs
+DETECTION_FUSE_RADIUS = 20  # Detections this close (pixels) vote for the same position
+COLOR_STRATEGY_THRESHOLD = 0.7  # Color detector confidence that wins outright
+COLOR_STRATEGY_WEIGHT = 1.0
+PRIOR_STRATEGY_THRESHOLD = 0.7  # Same, for the search around the last known position
+PRIOR_STRATEGY_WEIGHT = 0.5
+TEMPLATE_STRATEGY_WEIGHT = 1.0  # (a template match always clears CONFIDENCE_THRESHOLD)
+FALLBACK_CLICKS_ENABLED = False  # Click the configured percentage positions when nothing is detected
+FALLBACK_RETRY_DELAY = 10  # Wait after a download that clicked a fallback position and failed (seconds)
+
+# Dialog Cascade
+# Cheap checks that a Vortex download dialog is on screen, before the button detector runs
+DIALOG_CASCADE_ENABLED = True
+DIALOG_SAMPLE_GRID = (32, 16)  # Stage 1: pixels sampled (columns, rows) over the dialog region
+DIALOG_DARK_MAX_SATURATION = 60  # Stage 1: dialog background is unsaturated...
+DIALOG_DARK_MAX_VALUE = 90  # ...and dark (HSV value)
+DIALOG_MIN_DARK = 0.30  # Stage 1: smallest fraction of dark samples
+DIALOG_MIN_PURPLE = 0.03  # Stage 1: smallest fraction of purple samples
+DIALOG_HISTOGRAM_STRIDE = 4  # Stage 2: histogram every 4th pixel in both directions
+DIALOG_HISTOGRAM_THRESHOLD = 0.5  # Stage 2: dialog confidence needed to run the button detector
+DIALOG_FALLBACK_CONFIDENCE = 0.8  # With FALLBACK_CLICKS_ENABLED: click the calibrated position when this sure of a dialog but no button found
+
+# Detection Result Cache
+# Results are remembered by the exact pixels of the region each detector reads,
+# so a region identical to a recent one is not analyzed again
+RESULT_CACHE_ENABLED = True
+RESULT_CACHE_SIZE = 64  # Results kept (all detectors together)
+RESULT_CACHE_TTL = 30  # Recompute results older than this (seconds)
+
+# Pipelined Mode
+# Capture, detection and clicks run on separate threads connected by queues, so a slow
+# screen grab or debug save does not hold up the clicks (and the other way round)
+PIPELINE_ENABLED = False
+PIPELINE_COMMAND_QUEUE_SIZE = 8  # Actions waiting for the actuator thread before new ones are dropped
+PIPELINE_JOIN_TIMEOUT = 5.0  # How long shutdown waits for each thread (seconds)
+
+# Async Runtime
+# The dialog, the browser page and the tab clean-up are watched by separate asyncio
+# coroutines that hand over to each other as soon as a step is done, instead of sleeping
+# fixed times; capture, detection and clicks run on a thread pool
+ASYNC_RUNTIME_ENABLED = False  # Takes precedence over PIPELINE_ENABLED
+ASYNC_WORKERS = 4  # Threads for blocking calls
+ASYNC_SHUTDOWN_TIMEOUT = 5.0  # How long cancelled watchers get to finish (seconds)
+
 # Window Title Keywords
 VORTEX_WINDOW_TITLE = "Download mod"
+VORTEX_WINDOW_KEYWORDS = ["vortex"]  # The Vortex main window's title contains one of these (lowercase)
+BROWSER_WINDOW_KEYWORDS = ["chrome", "firefox", "edge", "opera", "brave", "nexusmods", "google chrome"]
 
 # Browser Tab Management
 AUTO_CLOSE_DOWNLOAD_TABS = True  # Automatically close browser tabs after download starts
@@ -63,13 +205,37 @@ AUTO_CLOSE_DOWNLOAD_TABS = True  # Automatically close browser tabs after downlo
 KEEP_ONE_TAB_OPEN = True  # After closing first tab, keep subsequent tabs open
                           # This keeps the browser window open and ready
 
+# Tab Janitor
+# Download tabs are counted and closed several at a time, with one switch to the browser
+# and one Ctrl+W per tab, instead of switching back and forth on every download
+TAB_JANITOR_ENABLED = False
+TAB_JANITOR_BATCH_SIZE = 5  # Close once this many tabs can be closed
+TAB_JANITOR_MAX_OPEN = 10  # Close right away once this many tabs are open (browser memory)
+TAB_JANITOR_IDLE_AFTER = 20  # Close what is open after this long without a new download (seconds)
+TAB_JANITOR_KEEP_OPEN = 1  # Oldest tabs never closed, so the browser window stays ready
+
 # Debug Settings
 SAVE_DEBUG_SCREENSHOTS = True  # Save screenshots for debugging
 DEBUG_SCREENSHOT_DIR = "debug_screenshots"
+DEBUG_SCREENSHOT_FORMAT = "png"  # "png" or "jpg" (smaller, lossy)
+DEBUG_PNG_COMPRESSION = 1  # PNG compression level 0-9 (low = fast to encode)
+DEBUG_JPEG_QUALITY = 85  # JPEG quality 1-95
+DEBUG_SCREENSHOT_QUEUE_SIZE = 8  # Screenshots waiting for the disk; more are dropped
+DEBUG_SCREENSHOT_MAX_FILES = 500  # Oldest screenshots are deleted past this count (0 = no limit)
+DEBUG_SCREENSHOT_MAX_MB = 200  # ...or past this total size in MB (0 = no limit)
+
+# Failure Frame Buffer
+# The last few captured frames are kept in memory and written out only when a download fails
+FRAME_BUFFER_ENABLED = True
+FRAME_BUFFER_SIZE = 30  # Frames kept in memory
+FRAME_BUFFER_MAX_MB = 256  # Memory cap for the kept frames (MB)
+FRAME_BUFFER_DIR = "failure_frames"
 
 # PyAutoGUI Settings
 PYAUTOGUI_PAUSE = 0.5  # Pause between PyAutoGUI actions (seconds)
 PYAUTOGUI_FAILSAFE = True  # Enable failsafe (move mouse to corner to stop)
+ACTUATOR_PROFILE = "safe"  # Input timings: "safe" (smooth moves, PYAUTOGUI_PAUSE after every call)
+                           # or "fast" (instant moves, minimal pauses)
 
 # Logging Settings
 LOG_DIR = "logs"
@@ -77,6 +243,12 @@ LOG_LEVEL = "DEBUG"  # Options: DEBUG, INFO, WARNING, ERROR, CRITICAL
                      # Use DEBUG for troubleshooting, INFO for normal operation
 LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
 
+# Metrics
+# Counters, timings and downloads/hour, rewritten to LOG_DIR/metrics.json and metrics.prom
+METRICS_ENABLED = True
+METRICS_EXPORT_INTERVAL = 15  # Seconds between metrics file rewrites
+METRICS_HTTP_PORT = 0  # Serve metrics on http://127.0.0.1:<port>/metrics (0 = disabled)
+
 # Manual Button Position (from calibration)
 # These are used as fallback if automatic detection fails
 # Percentages of screen size - adjust if your screen resolution changes
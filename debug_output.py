@@ -0,0 +1,267 @@
+"""
+Debug output that must never slow down the monitoring loop.
+"""
+
+import collections
+import json
+import logging
+import queue
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class ScreenshotWriter:
+    """
+    Saves debug screenshots on a background thread.
+
+    submit() only puts the frame on a bounded queue; encoding and disk I/O
+    happen on the writer thread. When the disk cannot keep up and the queue
+    is full, new screenshots are dropped instead of blocking the caller.
+    Old files are pruned so the directory stays under the configured count
+    and size limits.
+    """
+
+    def __init__(self, directory=None, queue_size: int = None, image_format: str = None,
+                 max_files: int = None, max_bytes: int = None):
+        """
+        Args:
+            directory: Where screenshots go (default: DEBUG_SCREENSHOT_DIR)
+            queue_size: Screenshots waiting to be written before new ones are dropped
+            image_format: "png" (fast, low compression) or "jpg"
+            max_files: Keep at most this many files (0 = no limit)
+            max_bytes: Keep at most this many bytes of files (0 = no limit)
+        """
+        self.directory = Path(directory or config.DEBUG_SCREENSHOT_DIR)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.image_format = (image_format or config.DEBUG_SCREENSHOT_FORMAT).lower()
+        self.max_files = config.DEBUG_SCREENSHOT_MAX_FILES if max_files is None else max_files
+        self.max_bytes = (config.DEBUG_SCREENSHOT_MAX_MB * 1024 * 1024) if max_bytes is None else max_bytes
+
+        self.queue = queue.Queue(maxsize=config.DEBUG_SCREENSHOT_QUEUE_SIZE if queue_size is None else queue_size)
+        self.written = 0
+        self.dropped = 0
+        self._sequence = 0
+        self._files = collections.deque(self._existing_files())  # (path, size), oldest first
+        self._total_bytes = sum(size for _, size in self._files)
+
+        self._thread = threading.Thread(target=self._run, name="ScreenshotWriter", daemon=True)
+        self._thread.start()
+
+    def _existing_files(self) -> list:
+        """
+        Returns the screenshots already in the directory, oldest first.
+        """
+        files = [p for p in self.directory.iterdir() if p.suffix.lower() in (".png", ".jpg", ".jpeg")]
+        files.sort(key=lambda p: p.stat().st_mtime)
+        return [(p, p.stat().st_size) for p in files]
+
+    def submit(self, pixels, prefix: str = "capture") -> bool:
+        """
+        Queues a screenshot for writing without blocking.
+
+        Args:
+            pixels: Frame, PIL image or RGB NumPy array
+            prefix: Filename prefix
+
+        Returns:
+            True if queued, False if dropped because the queue is full
+        """
+        # Name it now, so the timestamp is the capture time, not the write time
+        self._sequence += 1
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
+        name = f"{prefix}_{stamp}_{self._sequence:04d}.{self.image_format}"
+        try:
+            self.queue.put_nowait((name, pixels))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            logger.debug(f"Debug screenshot queue full, dropped {name}")
+            return False
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                name, pixels = item
+                self._write(self.directory / name, pixels)
+            except Exception as e:
+                logger.debug(f"Could not write debug screenshot: {e}")
+            finally:
+                self.queue.task_done()
+
+    def _write(self, path: Path, pixels):
+        """Encodes and saves one screenshot, then applies the retention policy."""
+        if hasattr(pixels, "image"):  # capture.Frame
+            image = pixels.image
+        elif isinstance(pixels, np.ndarray):
+            image = Image.fromarray(pixels)
+        else:
+            image = pixels
+
+        if self.image_format in ("jpg", "jpeg"):
+            image.save(path, format="JPEG", quality=config.DEBUG_JPEG_QUALITY)
+        else:
+            image.save(path, format="PNG", compress_level=config.DEBUG_PNG_COMPRESSION)
+
+        size = path.stat().st_size
+        self._files.append((path, size))
+        self._total_bytes += size
+        self.written += 1
+        self._prune()
+
+    def _prune(self):
+        """Deletes the oldest files until the directory is within the limits."""
+        while self._files and ((self.max_files and len(self._files) > self.max_files) or
+                               (self.max_bytes and self._total_bytes > self.max_bytes)):
+            path, size = self._files.popleft()
+            self._total_bytes -= size
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+    def flush(self):
+        """Blocks until every queued screenshot is written."""
+        self.queue.join()
+
+    def close(self, timeout: float = 5.0):
+        """
+        Writes what is still queued and stops the thread.
+        """
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            logger.warning("Debug screenshot writer did not drain in time, giving up")
+            return
+        self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        """Returns written/dropped counters and the current queue depth."""
+        return {
+            "written": self.written,
+            "dropped": self.dropped,
+            "queued": self.queue.qsize(),
+        }
+
+
+class FrameRingBuffer:
+    """
+    Keeps the last few captured frames in memory and writes them out only
+    when something goes wrong.
+
+    Each entry is a Frame together with the decisions detectors recorded on
+    it (frame.decisions), stored without its cached color conversions so it
+    holds only the RGB pixels. The buffer is capped both by frame count and
+    by those bytes; the oldest frames are evicted first. dump() hands a snapshot to a
+    background thread, so a failure never stalls the monitoring loop.
+    """
+
+    def __init__(self, capacity: int = None, max_bytes: int = None, directory=None):
+        """
+        Args:
+            capacity: Most frames kept (default: FRAME_BUFFER_SIZE)
+            max_bytes: Most pixel bytes kept (default: FRAME_BUFFER_MAX_MB)
+            directory: Where dumps go (default: FRAME_BUFFER_DIR)
+        """
+        self.capacity = config.FRAME_BUFFER_SIZE if capacity is None else capacity
+        self.max_bytes = (config.FRAME_BUFFER_MAX_MB * 1024 * 1024) if max_bytes is None else max_bytes
+        self.directory = Path(directory or config.FRAME_BUFFER_DIR)
+        self.frames = collections.deque()
+        self.bytes = 0
+        self.dumps = 0
+        self.dropped_dumps = 0
+        self._lock = threading.Lock()  # record() and dump() may run on different threads (pipeline mode)
+
+        self._queue = queue.Queue(maxsize=2)  # Dumps waiting to be written
+        self._thread = threading.Thread(target=self._run, name="FrameRingBuffer", daemon=True)
+        self._thread.start()
+
+    def record(self, frame):
+        """
+        Adds a frame, evicting the oldest ones past the count or byte limit.
+        """
+        frame = frame.pixels_only()
+        with self._lock:
+            self.frames.append(frame)
+            self.bytes += frame.rgb.nbytes
+            while self.frames and (len(self.frames) > self.capacity or self.bytes > self.max_bytes):
+                self.bytes -= self.frames.popleft().rgb.nbytes
+
+    def dump(self, reason: str) -> bool:
+        """
+        Writes the buffered frames and their decisions to disk in the background,
+        then empties the buffer.
+
+        Args:
+            reason: Short description of the failure, used in the folder name
+
+        Returns:
+            True if the dump was queued, False if dumps are backed up and it was skipped
+        """
+        with self._lock:
+            if not self.frames:
+                return False
+            snapshot = list(self.frames)
+            stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
+            try:
+                self._queue.put_nowait((f"{stamp}_{reason}", snapshot))
+            except queue.Full:
+                self.dropped_dumps += 1
+                logger.warning(f"Skipped failure dump '{reason}': previous dumps still being written")
+                return False
+            self.frames.clear()
+            self.bytes = 0
+            self.dumps += 1
+        logger.info(f"Dumping last {len(snapshot)} frames to {self.directory / f'{stamp}_{reason}'}")
+        return True
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._write(*item)
+            except Exception as e:
+                logger.debug(f"Could not write failure dump: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _write(self, name: str, frames: list):
+        """Writes one dump: a PNG per frame and a decisions.json index."""
+        folder = self.directory / name
+        folder.mkdir(parents=True, exist_ok=True)
+        index = []
+        for i, frame in enumerate(frames):
+            filename = f"frame_{i:03d}.png"
+            Image.fromarray(frame.rgb).save(folder / filename, format="PNG",
+                                            compress_level=config.DEBUG_PNG_COMPRESSION)
+            index.append({
+                "file": filename,
+                "timestamp": frame.timestamp,
+                "origin": list(frame.origin),
+                "size": list(frame.size),
+                "screen_size": list(frame.screen_size),
+                "decisions": frame.decisions,
+            })
+        with open(folder / "decisions.json", "w") as f:
+            json.dump(index, f, indent=2, default=str)
+
+    def close(self, timeout: float = 10.0):
+        """Finishes pending dumps and stops the thread."""
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            logger.warning("Failure dumps did not finish in time, giving up")
+            return
+        self._thread.join(timeout)
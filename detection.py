@@ -0,0 +1,271 @@
+"""
+Screen detectors for the Vortex Auto Downloader.
+
+These functions only look at pixels: they take a capture.Frame and return
+what they found. A Frame caches its color conversions, so detectors that
+share one frame never convert the same pixels twice. Capturing the screen
+and clicking are left to VortexAutoDownloader, which keeps the detectors
+importable (and benchmarkable) without pyautogui or win32gui.
+"""
+
+import logging
+
+import cv2
+import numpy as np
+
+import config
+from button_detector import ButtonDetector, ButtonSpec
+from capture import Frame
+from color_classes import classifier_for
+from strategies import Detection, Strategy
+from tracking import LocationTracker
+
+logger = logging.getLogger(__name__)
+
+
+def search_regions() -> dict:
+    """
+    Returns the search region each detector looks at, as (left, top, right,
+    bottom) fractions of the screen. Read from config, so a capture plan
+    can cover exactly these pixels.
+    """
+    return {
+        "manual_button": (config.VORTEX_SEARCH_LEFT, config.VORTEX_SEARCH_TOP,
+                          config.VORTEX_SEARCH_RIGHT, config.VORTEX_SEARCH_BOTTOM),
+        "slow_download": (config.BROWSER_SEARCH_LEFT, config.BROWSER_SEARCH_TOP,
+                          config.BROWSER_SEARCH_RIGHT, config.BROWSER_SEARCH_BOTTOM),
+        "download_started": (config.CONFIRMATION_SEARCH_LEFT, config.CONFIRMATION_SEARCH_TOP,
+                             config.CONFIRMATION_SEARCH_RIGHT, config.CONFIRMATION_SEARCH_BOTTOM),
+        "dialog": (config.DIALOG_SEARCH_LEFT, config.DIALOG_SEARCH_TOP,
+                   config.DIALOG_SEARCH_RIGHT, config.DIALOG_SEARCH_BOTTOM),
+    }
+
+
+def find_button_by_color(frame: Frame, color_ranges: list) -> tuple | None:
+    """
+    Finds the largest blob matching any of the given HSV color ranges.
+
+    Args:
+        frame: Captured screen
+        color_ranges: List of (lower_hsv, upper_hsv) tuples to match
+
+    Returns:
+        (x, y, area) of the blob center if found, None otherwise
+    """
+    screenshot_hsv = frame.hsv
+
+    mask = None
+    for lower, upper in color_ranges:
+        lower_bound = np.array(lower, dtype=np.uint8)
+        upper_bound = np.array(upper, dtype=np.uint8)
+        temp_mask = cv2.inRange(screenshot_hsv, lower_bound, upper_bound)
+
+        if mask is None:
+            mask = temp_mask
+        else:
+            mask = cv2.bitwise_or(mask, temp_mask)
+
+    # Find contours
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    if contours:
+        # Find largest contour (likely the button)
+        largest_contour = max(contours, key=cv2.contourArea)
+        area = cv2.contourArea(largest_contour)
+
+        # Filter out tiny matches
+        if area > config.MIN_BUTTON_AREA:
+            M = cv2.moments(largest_contour)
+            if M["m00"] != 0:
+                cx = int(M["m10"] / M["m00"])
+                cy = int(M["m01"] / M["m00"])
+                return (*frame.to_screen(cx, cy), area)
+
+    return None
+
+
+def button_specs() -> dict:
+    """
+    Returns the ButtonSpec of every button the downloader clicks, read from config.
+    """
+    regions = search_regions()
+    gray = [(config.BUTTON_GRAY_HSV_LOWER, config.BUTTON_GRAY_HSV_UPPER)]
+    purple = {"purple": (config.PURPLE_HSV_LOWER, config.PURPLE_HSV_UPPER)}
+    aspect = (config.BUTTON_MIN_ASPECT, config.BUTTON_MAX_ASPECT)
+    return {
+        # Gray "Download manually" button in the Vortex dialog, left of the purple premium panel
+        "manual_button": ButtonSpec(
+            "Download manually", regions["manual_button"], gray,
+            min_size=(config.VORTEX_BUTTON_MIN_WIDTH, config.VORTEX_BUTTON_MIN_HEIGHT),
+            max_size=(config.VORTEX_BUTTON_MAX_WIDTH, config.VORTEX_BUTTON_MAX_HEIGHT),
+            aspect=aspect, exclusions=purple, max_exclusion=config.PURPLE_MAX_RATIO),
+        # Gray "Slow download" button on the Nexus Mods page, same layout as the dialog
+        "slow_download": ButtonSpec(
+            "Slow download", regions["slow_download"], gray,
+            min_size=(config.BROWSER_BUTTON_MIN_WIDTH, config.BROWSER_BUTTON_MIN_HEIGHT),
+            max_size=(config.BROWSER_BUTTON_MAX_WIDTH, config.BROWSER_BUTTON_MAX_HEIGHT),
+            aspect=aspect, exclusions=purple, max_exclusion=config.PURPLE_MAX_RATIO),
+    }
+
+
+# Settings a ButtonDetector is built from (besides the search regions)
+_DETECTOR_SETTINGS = (
+    "BUTTON_GRAY_HSV_LOWER", "BUTTON_GRAY_HSV_UPPER", "PURPLE_HSV_LOWER", "PURPLE_HSV_UPPER", "PURPLE_MAX_RATIO",
+    "BUTTON_MIN_ASPECT", "BUTTON_MAX_ASPECT",
+    "VORTEX_BUTTON_MIN_WIDTH", "VORTEX_BUTTON_MIN_HEIGHT", "VORTEX_BUTTON_MAX_WIDTH", "VORTEX_BUTTON_MAX_HEIGHT",
+    "BROWSER_BUTTON_MIN_WIDTH", "BROWSER_BUTTON_MIN_HEIGHT", "BROWSER_BUTTON_MAX_WIDTH", "BROWSER_BUTTON_MAX_HEIGHT",
+    "COLOR_LUT_ENABLED", "COLOR_LUT_BITS", "DETECTION_DOWNSCALE", "DETECTION_WORKERS",
+)
+
+_detectors = {}  # Button name -> (settings and screen size it was built for, ButtonDetector)
+
+
+def button_detector(name: str, screen_size: tuple = None) -> ButtonDetector:
+    """
+    Returns the ButtonDetector for one of the button_specs(), built once and
+    reused until the settings it was built from or the screen size change.
+
+    Args:
+        name: Button name, e.g. "manual_button"
+        screen_size: (width, height) of the screen the frames come from
+    """
+    key = (tuple(getattr(config, setting) for setting in _DETECTOR_SETTINGS),
+           tuple(search_regions().values()), screen_size)
+    cached = _detectors.get(name)
+    if cached is None or cached[0] != key:
+        cached = _detectors[name] = (key, ButtonDetector(button_specs()[name]))
+    return cached[1]
+
+
+def clear_detectors():
+    """Drops the cached ButtonDetectors (e.g. after recalibrating)."""
+    _detectors.clear()
+
+
+def prepare_color_tables():
+    """
+    Builds the color lookup tables of every button spec now, so the first
+    detection does not pay for it. Does nothing when COLOR_LUT_ENABLED is off.
+    """
+    if config.COLOR_LUT_ENABLED:
+        for spec in button_specs().values():
+            classifier_for(spec.color_classes(), config.COLOR_LUT_BITS)
+
+
+def detect_buttons(frame: Frame, name: str, limit: int = None, search_box: tuple = None) -> list:
+    """
+    Runs the ButtonDetector for one of the button_specs().
+
+    Args:
+        search_box: Optional (left, top, right, bottom) in frame pixels to search instead of the spec's region
+
+    Returns:
+        Ranked list of button_detector.Candidate, best first
+    """
+    return button_detector(name, frame.screen_size).detect(frame, limit, search_box)
+
+
+def _best(frame: Frame, name: str, tracker: LocationTracker = None) -> tuple | None:
+    detector = button_detector(name, frame.screen_size)
+    if tracker is None:
+        best = detector.best(frame)
+    else:
+        best = tracker.locate(name, frame, detector.search_box(frame), lambda box: detector.best(frame, box))
+    return best.as_tuple() if best else None
+
+
+def detect_manual_button(frame: Frame, tracker: LocationTracker = None) -> tuple | None:
+    """
+    Looks for the gray "Download manually" button in the Vortex dialog.
+
+    Args:
+        frame: Captured screen
+        tracker: Optional LocationTracker; searches around the last known position first
+
+    Returns:
+        (x, y, area, aspect_ratio) of the best candidate in screen coordinates,
+        None if no candidate was found
+    """
+    return _best(frame, "manual_button", tracker)
+
+
+def detect_slow_download_button(frame: Frame, tracker: LocationTracker = None) -> tuple | None:
+    """
+    Looks for the gray "Slow download" button on the Nexus Mods page.
+
+    Args:
+        frame: Captured screen
+        tracker: Optional LocationTracker; searches around the last known position first
+
+    Returns:
+        (x, y, area, aspect_ratio) of the best candidate in screen coordinates,
+        None if no candidate was found
+    """
+    return _best(frame, "slow_download", tracker)
+
+
+def button_strategies(name: str, tracker: LocationTracker = None, matcher=None) -> list:
+    """
+    Returns the strategies a DetectionRace can use for one of the button_specs():
+
+    - "prior": the color detector in the window around the last known position
+      (only with a tracker, and only once the button has been seen). It only
+      reads the tracker; the caller records the race's outcome with tracker.record()
+    - "color": the color detector on the whole search region
+    - "template": the captured button template (only with a matcher and a template on disk)
+
+    Args:
+        name: Button name, e.g. "manual_button"
+        tracker: LocationTracker holding the last known positions
+        matcher: templates.TemplateMatcher
+    """
+    def detector(frame: Frame) -> ButtonDetector:
+        return button_detector(name, frame.screen_size)
+
+    strategies = []
+    if tracker is not None:
+        strategies.append(Strategy("prior", lambda frame: Detection.of(
+            tracker.peek(name, frame, detector(frame).search_box(frame), lambda box: detector(frame).best(frame, box)),
+            "prior"), config.PRIOR_STRATEGY_THRESHOLD, config.PRIOR_STRATEGY_WEIGHT))
+    strategies.append(Strategy("color", lambda frame: Detection.of(detector(frame).best(frame), "color"),
+                               config.COLOR_STRATEGY_THRESHOLD, config.COLOR_STRATEGY_WEIGHT))
+    if matcher is not None and matcher.available(name):
+        strategies.append(Strategy("template", lambda frame: Detection.of(matcher.match(frame, name), "template"),
+                                   matcher.threshold, config.TEMPLATE_STRATEGY_WEIGHT))
+    return strategies
+
+
+def detect_download_started(frame: Frame) -> tuple:
+    """
+    Checks whether the browser shows the "Your download has started" page.
+    Uses multiple detection methods for better reliability.
+
+    Returns:
+        (detected, bright_ratio, file_box_ratio)
+    """
+    # Both checks fall inside the declared "download_started" region
+    left, top, right, bottom = search_regions()["download_started"]
+    # The text band and the file box band are clamped to that region
+    text_top = min(max(config.CONFIRMATION_TEXT_TOP, top), bottom)
+    file_box_bottom = min(max(config.CONFIRMATION_FILE_BOX_BOTTOM, top), bottom)
+
+    # Method 1: Check for the large white text in center (more relaxed threshold)
+    search_gray = frame.roi(frame.bbox_from_percent(left, text_top, right, bottom), "gray")
+
+    # Lower threshold - look for bright pixels (white text)
+    bright_pixels = np.sum(search_gray > 180)  # Lowered from 200
+    total_pixels = search_gray.size
+    bright_ratio = bright_pixels / total_pixels
+
+    # Method 2: Check if there's a download file box (dark box with white text)
+    # The confirmation page has a file name box at the top
+    file_box_gray = frame.roi(frame.bbox_from_percent(left, top, right, file_box_bottom), "gray")
+
+    # Look for medium brightness (the dark box with text inside)
+    medium_bright = np.sum((file_box_gray > 100) & (file_box_gray < 200))
+    file_box_ratio = medium_bright / file_box_gray.size
+
+    # Combined detection: either bright text OR file box
+    detected = bright_ratio > 0.08 or file_box_ratio > 0.10  # Lower thresholds
+
+    return (detected, bright_ratio, file_box_ratio)
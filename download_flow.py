@@ -0,0 +1,235 @@
+"""
+The download flow as an explicit state machine.
+
+A download goes through these states, in order:
+
+    DialogSeen -> ManualClicked -> BrowserLoaded -> SlowClicked
+               -> DownloadConfirmed -> TabClosed -> BackToVortex
+
+Each state has a step: the action or wait that gets the flow to the next
+state. Steps have their own timeout and retry policy, and every visit to a
+state is recorded with entry/exit timestamps, so we can see where the time
+of a download goes and at which state it failed.
+
+The machine itself only calls the step functions it is given and reads the
+time from a clock, so it runs headless with fake steps and a FakeClock.
+"""
+
+import logging
+import sys
+from enum import Enum
+
+import numpy as np
+
+from scheduling import SystemClock
+
+logger = logging.getLogger(__name__)
+
+
+class State(Enum):
+    DIALOG_SEEN = "DialogSeen"
+    MANUAL_CLICKED = "ManualClicked"
+    BROWSER_LOADED = "BrowserLoaded"
+    SLOW_CLICKED = "SlowClicked"
+    DOWNLOAD_CONFIRMED = "DownloadConfirmed"
+    TAB_CLOSED = "TabClosed"
+    BACK_TO_VORTEX = "BackToVortex"
+
+
+# The order states are visited in
+FLOW_ORDER = [
+    State.DIALOG_SEEN,
+    State.MANUAL_CLICKED,
+    State.BROWSER_LOADED,
+    State.SLOW_CLICKED,
+    State.DOWNLOAD_CONFIRMED,
+    State.TAB_CLOSED,
+    State.BACK_TO_VORTEX,
+]
+
+
+def fatal_errors() -> tuple:
+    """
+    Returns the exceptions that stop the flow instead of counting as a failed
+    attempt: pyautogui's FailSafeException (mouse in the top-left corner), if
+    pyautogui is loaded. KeyboardInterrupt is never caught in the first place.
+    """
+    pyautogui = sys.modules.get("pyautogui")
+    return (pyautogui.FailSafeException,) if pyautogui is not None else ()
+
+
+class Step:
+    """
+    What to do in a state to reach the next one.
+    """
+
+    def __init__(self, action, timeout: float, retries: int = 0, retry_delay: float = 0.0,
+                 required: bool = True):
+        """
+        Args:
+            action: Callable(context, timeout) returning a truthy value on success.
+                    Its result is stored in context["results"][state].
+            timeout: Time budget for the step (seconds). Waits should stop at it;
+                     actions that take longer are logged as overruns.
+            retries: Extra attempts after a failed one
+            retry_delay: Pause between attempts (seconds)
+            required: If False, a failed step is logged and the flow continues
+        """
+        self.action = action
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.required = required
+
+
+class StateVisit:
+    """One pass through a state: timestamps, attempts and outcome."""
+
+    def __init__(self, state: State, entered: float):
+        self.state = state
+        self.entered = entered
+        self.exited = None
+        self.attempts = 0
+        self.ok = False
+        self.overran = False
+
+    @property
+    def duration(self) -> float:
+        return (self.exited if self.exited is not None else self.entered) - self.entered
+
+
+class DownloadFlow:
+    """
+    Runs the download steps as a state machine and keeps per-state timings.
+    """
+
+    def __init__(self, steps: dict, clock=None, history_size: int = 500, fatal: tuple = None):
+        """
+        Args:
+            steps: State -> Step for every state except BACK_TO_VORTEX (the final state)
+            clock: Clock with now() and sleep(); defaults to SystemClock
+            history_size: Durations kept per state for the latency report
+            fatal: Exception types a step may raise that are re-raised instead of
+                   retried (default: fatal_errors())
+        """
+        self.steps = steps
+        self.clock = clock or SystemClock()
+        self.fatal = fatal_errors() if fatal is None else tuple(fatal)
+        self.history_size = history_size
+        self.durations = {state: [] for state in FLOW_ORDER}  # State -> recent durations
+        self.visits = []         # StateVisits of the last run
+        self.failed_state = None  # State where the last run stopped, if it failed
+        self.runs = 0
+        self.failures = 0
+
+    def run(self, context: dict = None, start: State = State.DIALOG_SEEN, stop: State = None) -> bool:
+        """
+        Runs the flow from the start state to BACK_TO_VORTEX, or up to stop.
+
+        A run that starts in DIALOG_SEEN begins a new download; one that
+        starts further on resumes it (same context, its visits are added to
+        the ones already recorded), e.g. after a run that paused at stop.
+
+        Args:
+            context: Shared dict for the steps (e.g. the detected button position)
+            start: State to start in, to resume a flow part-way
+            stop: State to pause in without running its step (default: run to the end)
+
+        Returns:
+            True if BACK_TO_VORTEX (or stop) was reached, False if a required step failed
+
+        Raises:
+            Any of self.fatal a step raises (e.g. FailSafeException), without retrying
+        """
+        context = {} if context is None else context
+        context.setdefault("results", {})
+        if start == FLOW_ORDER[0]:
+            self.visits = []
+            self.runs += 1
+        self.failed_state = None
+
+        for state in FLOW_ORDER[FLOW_ORDER.index(start):]:
+            if state == stop:
+                return True
+            visit = StateVisit(state, self.clock.now())
+            self.visits.append(visit)
+            logger.debug(f"[Flow] -> {state.value}")
+
+            if state == State.BACK_TO_VORTEX:
+                visit.ok = True
+                visit.exited = visit.entered
+                self._record(visit)
+                return True
+
+            step = self.steps[state]
+            result = None
+            while visit.attempts <= step.retries:
+                if visit.attempts:
+                    self.clock.sleep(step.retry_delay)
+                visit.attempts += 1
+                try:
+                    result = step.action(context, step.timeout)
+                except self.fatal:
+                    visit.exited = self.clock.now()
+                    self.failed_state = state
+                    self.failures += 1
+                    raise
+                except Exception as e:
+                    logger.error(f"[Flow] {state.value} step raised: {e}")
+                    result = None
+                if result:
+                    break
+                logger.debug(f"[Flow] {state.value} attempt {visit.attempts} failed")
+
+            visit.exited = self.clock.now()
+            visit.ok = bool(result)
+            visit.overran = visit.duration > step.timeout
+            if visit.overran:
+                logger.warning(f"[Flow] {state.value} took {visit.duration:.2f}s (timeout {step.timeout}s)")
+            context["results"][state] = result
+            self._record(visit)
+
+            if not visit.ok:
+                if step.required:
+                    logger.warning(f"[Flow] Stopped at {state.value} after {visit.attempts} attempt(s)")
+                    self.failed_state = state
+                    self.failures += 1
+                    return False
+                logger.info(f"[Flow] {state.value} step did not succeed, continuing")
+
+        return True
+
+    def _record(self, visit: StateVisit):
+        """Adds a visit's duration to the per-state history."""
+        durations = self.durations[visit.state]
+        durations.append(visit.duration)
+        if len(durations) > self.history_size:
+            del durations[0]
+
+    def summary(self) -> str:
+        """
+        Returns the state timings of the last run as one line.
+        """
+        return ", ".join(f"{v.state.value} {v.duration:.2f}s" + ("" if v.ok else " (failed)")
+                         for v in self.visits)
+
+    def latency_stats(self) -> dict:
+        """
+        Returns per-state latency distributions over the kept history.
+
+        Returns:
+            State name -> {"count", "p50", "p95", "max", "mean"} in seconds
+        """
+        stats = {}
+        for state, durations in self.durations.items():
+            if not durations:
+                continue
+            samples = np.array(durations)
+            stats[state.value] = {
+                "count": len(durations),
+                "p50": float(np.percentile(samples, 50)),
+                "p95": float(np.percentile(samples, 95)),
+                "max": float(samples.max()),
+                "mean": float(samples.mean()),
+            }
+        return stats
@@ -0,0 +1,370 @@
+"""
+Cheap gates that decide whether the expensive detectors need to run at all.
+"""
+
+import logging
+import zlib
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+import config
+import detection
+from capture import Frame
+from scheduling import SystemClock
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeGate:
+    """
+    Skips full detection while the watched region is not changing.
+
+    For each watched region the gate keeps a tiny signature: a strided
+    subsample of the RGB pixels (1 of every stride x stride pixels). A new
+    frame only goes to the full detector when enough sampled pixels changed,
+    or when the last full run is older than max_age. Otherwise the caller
+    reuses the last result it stored for that region.
+    """
+
+    def __init__(self, threshold: float = None, pixel_delta: int = None, stride: int = None,
+                 max_age: float = None, clock=None):
+        """
+        Args:
+            threshold: Fraction of sampled pixels that must change to count as a change
+            pixel_delta: Per-channel difference (0-255) for a sampled pixel to count as changed
+            stride: Sample every stride-th pixel in both directions
+            max_age: Run the full detector at least this often (seconds), even when static
+            clock: Clock with now(); defaults to SystemClock
+        """
+        self.threshold = config.CHANGE_GATE_THRESHOLD if threshold is None else threshold
+        self.pixel_delta = config.CHANGE_GATE_PIXEL_DELTA if pixel_delta is None else pixel_delta
+        self.stride = config.CHANGE_GATE_STRIDE if stride is None else stride
+        self.max_age = config.CHANGE_GATE_MAX_AGE if max_age is None else max_age
+        self.clock = clock or SystemClock()
+        self._signatures = {}  # key -> signature of the last frame that ran the detector
+        self._run_times = {}   # key -> time of the last full detection
+        self._results = {}     # key -> last stored detection result
+        self.hits = 0    # Frames where detection was skipped
+        self.misses = 0  # Frames that ran the full detector
+        self.stale_runs = 0  # Misses caused only by max_age
+        self.last_changed = False  # Whether the last checked frame differed from the stored one
+
+    def signature(self, pixels: np.ndarray) -> np.ndarray:
+        """
+        Returns the strided subsample used to compare frames.
+        """
+        return pixels[::self.stride, ::self.stride].astype(np.int16)
+
+    def should_run(self, key: str, pixels: np.ndarray) -> bool:
+        """
+        Decides whether the full detector has to look at these pixels.
+
+        Args:
+            key: Name of the watched region
+            pixels: RGB pixels of the watched region
+
+        Returns:
+            True if the detector must run, False if the last result is still valid
+        """
+        signature = self.signature(pixels)
+        previous = self._signatures.get(key)
+        now = self.clock.now()
+        self.last_changed = False
+
+        if previous is None or previous.shape != signature.shape or key not in self._results:
+            reason = "first frame"
+            self.last_changed = True
+        else:
+            changed = np.any(np.abs(signature - previous) > self.pixel_delta, axis=-1)
+            changed_ratio = float(changed.mean()) if changed.size else 0.0
+            if changed_ratio > self.threshold:
+                reason = f"changed {changed_ratio:.2%}"
+                self.last_changed = True
+            elif now - self._run_times[key] >= self.max_age:
+                reason = "stale"
+                self.stale_runs += 1
+            else:
+                self.hits += 1
+                return False
+
+        self._signatures[key] = signature
+        self._run_times[key] = now
+        self.misses += 1
+        logger.debug(f"Change gate '{key}': running detector ({reason})")
+        return True
+
+    def store(self, key: str, result):
+        """Remembers the detector result for the current signature."""
+        self._results[key] = result
+
+    def last_result(self, key: str):
+        """Returns the last stored result for the region (None if there is none)."""
+        return self._results.get(key)
+
+    def invalidate(self, key: str = None):
+        """
+        Forces the next frame to run the detector (for one region, or all).
+        """
+        if key is None:
+            self._signatures.clear()
+            self._results.clear()
+        else:
+            self._signatures.pop(key, None)
+            self._results.pop(key, None)
+
+    def stats(self) -> dict:
+        """
+        Returns the gate counters; hit_rate is the fraction of skipped detections.
+        """
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale_runs": self.stale_runs,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+_MISSING = object()  # Cache lookup result when no entry is stored (None is a valid detector result)
+
+
+class ResultCache:
+    """
+    Memoizes detector results by the exact content of the region they read.
+
+    The key is a fast hash of the region's pixels (CRC-32 plus the per-channel
+    sums) together with the region's position on screen, since detectors
+    return screen coordinates. A frame whose region is byte-for-byte the same
+    as a recent one gets the stored result without any OpenCV work, and
+    without the side effects a real detection has (e.g. confirming a
+    LocationTracker track). Entries are evicted least-recently-used beyond
+    capacity, and ignored once older than ttl.
+    """
+
+    def __init__(self, capacity: int = None, ttl: float = None, clock=None):
+        """
+        Args:
+            capacity: Most results kept (all detectors together)
+            ttl: Results older than this are recomputed (seconds)
+            clock: Clock with now(); defaults to SystemClock
+        """
+        self.capacity = config.RESULT_CACHE_SIZE if capacity is None else capacity
+        self.ttl = config.RESULT_CACHE_TTL if ttl is None else ttl
+        self.clock = clock or SystemClock()
+        self._entries = OrderedDict()  # key -> (stored at, result)
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0  # Misses caused only by the ttl
+        self.evictions = 0
+
+    def key(self, name: str, frame: Frame, bbox: tuple) -> tuple:
+        """
+        Returns the cache key of a detector's region.
+
+        Args:
+            name: Detector name (results of different detectors never mix)
+            frame: Captured screen
+            bbox: (x1, y1, x2, y2) region the detector reads, in frame coordinates
+        """
+        pixels = frame.roi(bbox)
+        digest = zlib.crc32(np.ascontiguousarray(pixels))
+        sums = tuple(int(v) for v in cv2.sumElems(pixels)[:pixels.shape[2]]) if pixels.size else ()
+        return (name, frame.to_screen(bbox[0], bbox[1]), pixels.shape, frame.screen_size, digest, sums)
+
+    def lookup(self, name: str, frame: Frame, bbox: tuple, compute):
+        """
+        Returns the stored result for identical pixels, or runs compute()
+        and stores its result.
+
+        Args:
+            name: Detector name
+            frame: Captured screen
+            bbox: (x1, y1, x2, y2) region the detector reads, in frame coordinates
+            compute: callable() -> detector result (None is cached too)
+        """
+        key = self.key(name, frame, bbox)
+        now = self.clock.now()
+        entry = self._entries.get(key, _MISSING)
+        if entry is not _MISSING:
+            stored_at, result = entry
+            if now - stored_at <= self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return result
+            self.expired += 1
+
+        self.misses += 1
+        result = compute()
+        self._entries[key] = (now, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return result
+
+    def clear(self):
+        """Drops every stored result."""
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        """
+        Returns the cache counters; hit_rate is the fraction of lookups served from the cache.
+        """
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+class CascadeVerdict:
+    """Outcome of DialogCascade.run()."""
+
+    def __init__(self, stage: int, confidence: float, button=None):
+        self.stage = stage  # Last stage run (1-3)
+        self.confidence = confidence  # How sure the cascade is that a dialog is on screen (0-1)
+        self.button = button  # Stage 3 result when it ran (the button detector's return value)
+
+    @property
+    def dialog_present(self) -> bool:
+        """Whether the cheap stages (1 and 2) accepted the frame."""
+        return self.stage == 3
+
+    def __repr__(self):
+        return f"CascadeVerdict(stage {self.stage}, confidence {self.confidence:.2f}, button {self.button})"
+
+
+class DialogCascade:
+    """
+    Decides cheaply whether the Vortex "Download mod" dialog is on screen,
+    before the button detector runs.
+
+    - Stage 1 samples a sparse grid of pixels over the dialog region and
+      needs both the dialog's dark background and the purple premium panel.
+    - Stage 2 builds a coarse HSV histogram of the (subsampled) dialog
+      region. Its confidence is the best of a rule (enough purple and dark
+      pixels) and the correlation with the histogram of the last dialog
+      where the button was found, so unusual themes are recognized once seen.
+    - Stage 3 is the full button detector.
+
+    Each stage only runs when the previous one accepted the frame.
+    """
+
+    def __init__(self, grid: tuple = None, min_dark: float = None, min_purple: float = None,
+                 stride: int = None, threshold: float = None):
+        """
+        Args:
+            grid: (columns, rows) of pixels sampled by stage 1
+            min_dark: Stage 1: smallest fraction of samples with the dialog's dark background
+            min_purple: Stage 1: smallest fraction of samples in the purple band
+            stride: Stage 2: histogram every stride-th pixel in both directions
+            threshold: Stage 2: smallest dialog confidence that runs the button detector
+        """
+        self.grid = config.DIALOG_SAMPLE_GRID if grid is None else grid
+        self.min_dark = config.DIALOG_MIN_DARK if min_dark is None else min_dark
+        self.min_purple = config.DIALOG_MIN_PURPLE if min_purple is None else min_purple
+        self.stride = config.DIALOG_HISTOGRAM_STRIDE if stride is None else stride
+        self.threshold = config.DIALOG_HISTOGRAM_THRESHOLD if threshold is None else threshold
+        self.dark_lower = np.array((0, 0, 0), dtype=np.uint8)
+        self.dark_upper = np.array((180, config.DIALOG_DARK_MAX_SATURATION, config.DIALOG_DARK_MAX_VALUE),
+                                   dtype=np.uint8)
+        self.purple_lower = np.array(config.PURPLE_HSV_LOWER, dtype=np.uint8)
+        self.purple_upper = np.array(config.PURPLE_HSV_UPPER, dtype=np.uint8)
+        self.reference = None  # Histogram of the last dialog the button was found in
+        self.rejected = [0, 0]  # Frames rejected by stage 1 and stage 2
+        self.detected = 0      # Frames where stage 3 found the button
+        self.undetected = 0    # Frames that reached stage 3 without a button
+
+    def sample(self, pixels: np.ndarray) -> tuple:
+        """
+        Stage 1: classifies a sparse grid of pixels.
+
+        Returns:
+            (dark_ratio, purple_ratio) of the sampled pixels
+        """
+        height, width = pixels.shape[:2]
+        columns, rows = self.grid
+        ys = np.linspace(0, height - 1, min(rows, height)).astype(int)
+        xs = np.linspace(0, width - 1, min(columns, width)).astype(int)
+        hsv = cv2.cvtColor(np.ascontiguousarray(pixels[np.ix_(ys, xs)]), cv2.COLOR_RGB2HSV)
+        dark = cv2.countNonZero(cv2.inRange(hsv, self.dark_lower, self.dark_upper))
+        purple = cv2.countNonZero(cv2.inRange(hsv, self.purple_lower, self.purple_upper))
+        return dark / (len(ys) * len(xs)), purple / (len(ys) * len(xs))
+
+    def histogram(self, pixels: np.ndarray) -> np.ndarray:
+        """
+        Stage 2: normalized 18 x 4 x 4 (hue x saturation x value) histogram
+        of every stride-th pixel.
+        """
+        hsv = cv2.cvtColor(np.ascontiguousarray(pixels[::self.stride, ::self.stride]), cv2.COLOR_RGB2HSV)
+        hist = cv2.calcHist([hsv], [0, 1, 2], None, [18, 4, 4], [0, 180, 0, 256, 0, 256])
+        total = hist.sum()
+        return hist / total if total else hist
+
+    def histogram_confidence(self, hist: np.ndarray) -> float:
+        """
+        Stage 2 confidence: the rule score (purple panel share versus 10%, dark
+        background share versus 40%) or the correlation with the reference
+        dialog, whichever is higher.
+        """
+        purple = float(hist[12:16, 1:, 1:].sum())  # Hue 120-160, saturation and value >= 64
+        dark = float(hist[:, 0, :2].sum())  # Saturation < 64, value < 128
+        confidence = min(purple / 0.10, 1.0) * min(dark / 0.40, 1.0)
+        if self.reference is not None:
+            correlation = cv2.compareHist(hist, self.reference, cv2.HISTCMP_CORREL)
+            confidence = max(confidence, float(correlation))
+        return confidence
+
+    def run(self, frame: Frame, detect) -> CascadeVerdict:
+        """
+        Runs the stages on a frame until one rejects it.
+
+        Args:
+            frame: Captured screen covering the "dialog" search region
+            detect: callable() -> button detector result (stage 3), None if no button
+
+        Returns:
+            CascadeVerdict
+        """
+        pixels = frame.roi(frame.bbox_from_percent(*detection.search_regions()["dialog"]))
+        if pixels.size == 0:
+            self.rejected[0] += 1
+            return CascadeVerdict(1, 0.0)
+
+        dark, purple = self.sample(pixels)
+        if dark < self.min_dark or purple < self.min_purple:
+            self.rejected[0] += 1
+            return CascadeVerdict(1, 0.0)
+
+        hist = self.histogram(pixels)
+        confidence = self.histogram_confidence(hist)
+        if confidence < self.threshold:
+            self.rejected[1] += 1
+            logger.debug(f"Dialog cascade: stage 2 rejected (confidence {confidence:.2f})")
+            return CascadeVerdict(2, confidence)
+
+        button = detect()
+        if button:
+            self.detected += 1
+            self.reference = hist
+            return CascadeVerdict(3, 1.0, button)
+        self.undetected += 1
+        logger.debug(f"Dialog cascade: dialog likely present (confidence {confidence:.2f}) but no button detected")
+        return CascadeVerdict(3, confidence)
+
+    def stats(self) -> dict:
+        """
+        Returns how many frames each stage rejected and how many reached the detector.
+        """
+        return {
+            "stage1_rejected": self.rejected[0],
+            "stage2_rejected": self.rejected[1],
+            "detected": self.detected,
+            "undetected": self.undetected,
+        }
@@ -1,14 +1,25 @@
 import pyautogui
-import cv2
-import numpy as np
-from PIL import ImageGrab
-import time
 import logging
 from pathlib import Path
 from datetime import datetime
-import win32gui
-import win32con
 import config
+import detection
+import templates
+from button_detector import shutdown_thread_pool
+from debug_output import FrameRingBuffer, ScreenshotWriter
+from download_flow import DownloadFlow, State, Step
+from gating import ChangeGate, DialogCascade, ResultCache
+from metrics import SECONDS_BUCKETS, MetricsExporter, MetricsRegistry
+from pipeline import Pipeline
+from runtime import AsyncRuntime
+from scheduling import PollScheduler, SystemClock, wait_until
+from strategies import DetectionRace
+from tabs import TabJanitor
+from templates import TemplateMatcher
+from tracking import LocationTracker
+from capture import CaptureBackend, CapturePlanner, Frame, ImageGrabBackend
+from actuation import InputActuator, PyAutoGuiActuator
+from window_manager import Win32WindowManager, WindowManager
 
 # Setup logging
 log_dir = Path(config.LOG_DIR)
@@ -32,81 +43,222 @@ class VortexAutoDownloader:
     the 'Download manually' button and then the 'Slow download' button.
     """
     
-    def __init__(self):
+    def __init__(self, capture: CaptureBackend = None, clock=None, actuator: InputActuator = None,
+                 windows: WindowManager = None):
+        """
+        Args:
+            capture: Screen capture backend. Defaults to the live desktop (ImageGrab).
+            clock: Clock used for polling and timeouts. Defaults to real time (SystemClock).
+            actuator: Mouse and keyboard backend. Defaults to pyautogui with ACTUATOR_PROFILE timings.
+            windows: Window lookups. Defaults to the live desktop (win32gui).
+        """
+        self.capture = capture or ImageGrabBackend(size_ttl=config.SCREEN_SIZE_REFRESH)
+        self.actuator = actuator or PyAutoGuiActuator()  # Also sets pyautogui's FAILSAFE and PAUSE
+        self.windows = windows or Win32WindowManager()  # Caches the Vortex and browser window handles
+        self.clock = clock or SystemClock()
+        self.scheduler = PollScheduler(self.clock)
+        self.planner = CapturePlanner(detection.search_regions())  # Captures only the regions detectors read
+        detection.prepare_color_tables()  # Compile the color bands before the first cycle
+        self.template_matcher = TemplateMatcher()  # Button templates, for find_text_on_screen()
+        self.change_gate = ChangeGate(clock=self.clock) if config.CHANGE_GATE_ENABLED else None
+        self.tracker = LocationTracker(clock=self.clock) if config.TRACKER_ENABLED else None  # Last button positions
+        self.races = self._build_races() if config.DETECTION_RACE_ENABLED else {}  # Button -> DetectionRace
+        self.result_cache = ResultCache(clock=self.clock) if config.RESULT_CACHE_ENABLED else None
+        self.dialog_cascade = DialogCascade() if config.DIALOG_CASCADE_ENABLED else None  # Gates the detector
+        self.debug_writer = ScreenshotWriter() if config.SAVE_DEBUG_SCREENSHOTS else None
+        self.frame_buffer = FrameRingBuffer() if config.FRAME_BUFFER_ENABLED else None  # Dumped on failures
+        self.flow = self._build_flow()
+        self.metrics = self._build_metrics()
+        self.metrics_exporter = MetricsExporter(self.metrics) if config.METRICS_ENABLED else None
         self.running = False
         self.check_interval = config.CHECK_INTERVAL
         self.confidence = config.CONFIDENCE_THRESHOLD
         self.first_download_done = False  # Track if we've processed the first download
+        self.last_manual_click = None  # Where 'Download manually' was last clicked
+        self.fallback_clicked = False  # Whether the last 'Download manually' click was at the calibrated position
+        self.vortex_hwnd = None  # Vortex window to restore after closing a browser tab
+        self.slow_clicked_at = None  # When 'Slow download' was last clicked (clock time)
+        self.confirm_streak = 0  # Consecutive polls that saw the confirmation page
+        self.pipeline = None  # Set while running in pipelined mode (PIPELINE_ENABLED)
+        self.tab_janitor = (TabJanitor(self.close_download_tabs, clock=self.clock)
+                            if config.TAB_JANITOR_ENABLED else None)  # Closes download tabs in batches
         
-        # Failsafe: move mouse to top-left corner to stop
-        pyautogui.FAILSAFE = config.PYAUTOGUI_FAILSAFE
-        pyautogui.PAUSE = config.PYAUTOGUI_PAUSE
+        # Capture/conversion counters, reported in the cycle stats
+        self.frame_stats = {
+            "captures": 0,            # Screen grabs taken
+            "captures_saved": 0,      # Detector calls served from an existing frame
+            "conversions": 0,         # Color conversions computed
+            "conversions_saved": 0,   # Color conversions served from a frame's cache
+            "pixels_captured": 0,     # Total pixels grabbed (full screen or planned regions)
+        }
+        self._cycle_frames = []  # Frames captured during the current cycle
         
-    def find_text_on_screen(self, text: str, region=None) -> tuple | None:
+    def capture_frame(self, bbox: tuple = None, regions=None) -> Frame:
         """
-        Finds text on screen using OCR-free approach by looking for button patterns.
-        Returns (x, y) coordinates if found, None otherwise.
+        Captures the screen once; the frame can then be shared by several detectors.
+        
+        Args:
+            bbox: Optional (left, top, right, bottom) region in screen pixels
+            regions: Optional detector region name(s) (see detection.search_regions());
+                     only the union of those regions is captured
+        
+        Returns:
+            The captured Frame
         """
+        with self.metrics.histogram("capture_ms").time():
+            if regions:
+                screen_size = self.capture.size()
+                frame = self.capture.grab_frame(bbox=self.planner.bbox(regions, screen_size),
+                                                screen_size=screen_size)
+            else:
+                frame = self.capture.grab_frame(bbox=bbox)
+        self.frame_stats["captures"] += 1
+        self.frame_stats["pixels_captured"] += frame.width * frame.height
+        self._cycle_frames.append(frame)
+        if self.frame_buffer:
+            self.frame_buffer.record(frame)
+        return frame
+    
+    def _frame_or_capture(self, frame: Frame = None, regions=None) -> Frame:
+        """
+        Returns the given frame (counting the capture it saved), or captures a new one.
+        """
+        if frame is None:
+            return self.capture_frame(regions=regions)
+        self.frame_stats["captures_saved"] += 1
+        return frame
+    
+    def report_failure(self, reason: str):
+        """
+        Writes the recently captured frames and detector decisions to disk
+        (in the background) so the failure can be inspected later.
+        """
+        if self.frame_buffer:
+            self.frame_buffer.dump(reason)
+    
+    def end_cycle(self):
+        """
+        Folds the conversion counters of this cycle's frames into frame_stats.
+        """
+        frames, self._cycle_frames = self._cycle_frames, []  # Swapped first: the capture thread may append
+        for frame in frames:
+            self.frame_stats["conversions"] += frame.conversions
+            self.frame_stats["conversions_saved"] += frame.reused
+    
+    def _build_races(self) -> dict:
+        """
+        Builds a DetectionRace for each button from its strategies
+        (color blobs, last known position, captured template).
+        """
+        races = {}
+        for name in ("manual_button", "slow_download"):
+            strategies = detection.button_strategies(name, self.tracker, self.template_matcher)
+            races[name] = DetectionRace(name, strategies)
+            logger.info(f"Detection strategies for '{name}': {', '.join(s.name for s in strategies)}")
+        return races
+    
+    def cached(self, name: str, frame: Frame, compute):
+        """
+        Runs a detector, unless the result cache holds its result for the
+        exact same pixels in the detector's search region.
+        
+        A cached result does not reach the location tracker: the track is
+        neither confirmed nor decayed, so it can still expire (TRACKER_MAX_AGE)
+        while the pixels stay the same. The next real detection then scans
+        the full region and tracks the button again.
+        
+        Args:
+            name: Search region name (see detection.search_regions()), also the cache key
+            frame: Captured screen
+            compute: callable() -> detector result
+        """
+        if self.result_cache is None:
+            return compute()
+        bbox = frame.bbox_from_percent(*self.planner.regions[name])
+        return self.result_cache.lookup(name, frame, bbox, compute)
+    
+    def detect_button(self, name: str, frame: Frame) -> tuple | None:
+        """
+        Looks for a button in the frame: with the detection race when it is
+        enabled, otherwise with the color detector and the location tracker.
+        Results are served from the result cache when the pixels are unchanged.
+        
+        Args:
+            name: "manual_button" or "slow_download"
+            frame: Captured screen
+        
+        Returns:
+            (x, y, area, aspect_ratio) of the button, None if not found
+        """
+        return self.cached(name, frame, lambda: self._run_button_detectors(name, frame))
+    
+    def _run_button_detectors(self, name: str, frame: Frame) -> tuple | None:
+        race = self.races.get(name)
+        if race is None:
+            if name == "manual_button":
+                return detection.detect_manual_button(frame, self.tracker)
+            return detection.detect_slow_download_button(frame, self.tracker)
+        
+        winner = race.run(frame)
+        self.metrics.counter(f"race_{race.last_winner}").inc()
+        if self.tracker:
+            # Only the race's outcome reaches the tracker, from this thread
+            self.tracker.record(name, frame, winner, tracked=winner is not None and winner.strategy == "prior")
+        return winner.as_tuple() if winner else None
+    
+    def find_text_on_screen(self, text: str, region=None, frame: Frame = None) -> tuple | None:
+        """
+        Finds a button by its text, by matching the captured button template
+        (see templates.py). Only matches scoring at least CONFIDENCE_THRESHOLD count.
+        
+        Args:
+            text: Button text ("Download manually" or "Slow download")
+            region: Optional (left, top, right, bottom) screen box where the button should be
+            frame: Optional already-captured full-screen frame to search
+        
+        Returns:
+            (x, y) coordinates of the button center if found, None otherwise
+        """
+        name = templates.template_name(text)
+        if name is None:
+            logger.warning(f"No template for button text '{text}'")
+            return None
         try:
-            screenshot = ImageGrab.grab(bbox=region)
-            screenshot_np = np.array(screenshot)
-            screenshot_gray = cv2.cvtColor(screenshot_np, cv2.COLOR_RGB2GRAY)
+            frame = self._frame_or_capture(frame)
             
-            # Store screenshot for debugging
-            if config.SAVE_DEBUG_SCREENSHOTS:
-                debug_dir = Path(config.DEBUG_SCREENSHOT_DIR)
-                debug_dir.mkdir(exist_ok=True)
-                screenshot.save(debug_dir / f"screenshot_{datetime.now().strftime('%H%M%S')}.png")
+            # Store screenshot for debugging (written in the background)
+            if self.debug_writer:
+                self.debug_writer.submit(frame, "screenshot")
             
-            return screenshot_gray
+            match = self.template_matcher.match(frame, name, region)
+            if match:
+                logger.info(f"Found '{text}' template at ({match.x}, {match.y}), confidence: {match.confidence:.2f}")
+                return (match.x, match.y)
+            return None
         except Exception as e:
-            logger.error(f"Error capturing screenshot: {e}")
+            logger.error(f"Error matching '{text}' template: {e}")
             return None
     
-    def find_button_by_color(self, color_ranges: list, button_name: str) -> tuple | None:
+    def find_button_by_color(self, color_ranges: list, button_name: str, frame: Frame = None) -> tuple | None:
         """
         Finds a button on screen by its color pattern.
         
         Args:
             color_ranges: List of (lower_rgb, upper_rgb) tuples to match
             button_name: Name of button for logging
+            frame: Optional already-captured frame to search
             
         Returns:
             (x, y) coordinates of button center if found, None otherwise
         """
         try:
-            screenshot = ImageGrab.grab()
-            screenshot_np = np.array(screenshot)
-            screenshot_bgr = cv2.cvtColor(screenshot_np, cv2.COLOR_RGB2BGR)
-            screenshot_hsv = cv2.cvtColor(screenshot_bgr, cv2.COLOR_BGR2HSV)
-            
-            mask = None
-            for lower, upper in color_ranges:
-                lower_bound = np.array(lower, dtype=np.uint8)
-                upper_bound = np.array(upper, dtype=np.uint8)
-                temp_mask = cv2.inRange(screenshot_hsv, lower_bound, upper_bound)
-                
-                if mask is None:
-                    mask = temp_mask
-                else:
-                    mask = cv2.bitwise_or(mask, temp_mask)
+            frame = self._frame_or_capture(frame)
+            result = detection.find_button_by_color(frame, color_ranges)
             
-            # Find contours
-            contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            
-            if contours:
-                # Find largest contour (likely the button)
-                largest_contour = max(contours, key=cv2.contourArea)
-                area = cv2.contourArea(largest_contour)
-                
-                # Filter out tiny matches
-                if area > config.MIN_BUTTON_AREA:
-                    M = cv2.moments(largest_contour)
-                    if M["m00"] != 0:
-                        cx = int(M["m10"] / M["m00"])
-                        cy = int(M["m01"] / M["m00"])
-                        logger.info(f"Found {button_name} at ({cx}, {cy}), area: {area}")
-                        return (cx, cy)
+            if result:
+                cx, cy, area = result
+                logger.info(f"Found {button_name} at ({cx}, {cy}), area: {area}")
+                return (cx, cy)
             
             return None
         except Exception as e:
@@ -124,22 +276,11 @@ class VortexAutoDownloader:
         Returns:
             (x, y, width, height) of window if found, None otherwise
         """
-        def callback(hwnd, windows):
-            if win32gui.IsWindowVisible(hwnd):
-                window_title = win32gui.GetWindowText(hwnd)
-                if window_title:  # Only process non-empty titles
-                    if verbose:
-                        logger.debug(f"Checking window: '{window_title}'")
-                    if title_substring.lower() in window_title.lower():
-                        rect = win32gui.GetWindowRect(hwnd)
-                        windows.append((hwnd, window_title, rect))
-        
-        windows = []
-        win32gui.EnumWindows(callback, windows)
-        
-        if windows:
-            hwnd, full_title, rect = windows[0]
-            x1, y1, x2, y2 = rect
+        found = self.windows.find_title(title_substring, verbose)
+        
+        if found:
+            hwnd, full_title = found
+            x1, y1, x2, y2 = self.windows.rect(hwnd)
             logger.info(f"Found window '{full_title}' at ({x1}, {y1}, {x2-x1}, {y2-y1})")
             return (x1, y1, x2-x1, y2-y1)
         
@@ -148,86 +289,77 @@ class VortexAutoDownloader:
         
         return None
     
-    def click_download_manually(self, button_pos: tuple = None) -> bool:
+    def click_download_manually(self, button_pos: tuple = None, allow_fallback: bool = None) -> bool:
         """
-        Clicks the 'Download manually' button using reliable method.
-        Always uses the manually calibrated position for consistency.
+        Clicks the 'Download manually' button at its detected position.
         
         Args:
-            button_pos: Optional (x, y) coordinates. If provided, uses that, otherwise uses config.
+            button_pos: Optional (x, y) coordinates. If not provided, the button is looked for
+                       once more; the calibrated position in config is only used with
+                       FALLBACK_CLICKS_ENABLED.
+            allow_fallback: Click the calibrated position when the button is still not found
+                            (default: FALLBACK_CLICKS_ENABLED). Set when the dialog cascade
+                            is confident a dialog is on screen.
         
         Returns:
             True if clicked successfully, False otherwise
         """
+        if allow_fallback is None:
+            allow_fallback = config.FALLBACK_CLICKS_ENABLED
+        self.fallback_clicked = False
         try:
-            # Use provided position or fall back to manual calibration
             if button_pos:
                 click_x, click_y = button_pos
                 logger.info(f"Using detected position for 'Download manually': ({click_x}, {click_y})")
             else:
-                # Always use manually calibrated position for reliability
-                screen_width, screen_height = pyautogui.size()
-                click_x = int(screen_width * config.MANUAL_BUTTON_X_PERCENT)
-                click_y = int(screen_height * config.MANUAL_BUTTON_Y_PERCENT)
-                logger.info(f"Using MANUAL CALIBRATED position: ({click_x}, {click_y})")
-            
-            # Move mouse to button first (helps with focus/visibility)
-            pyautogui.moveTo(click_x, click_y, duration=0.3)
-            time.sleep(0.3)  # Pause for hover effect and window focus
+                # One more look first; the calibrated position is only clicked if that fails too
+                best = self.detect_button("manual_button", self.capture_frame(regions="manual_button"))
+                self.end_cycle()
+                if best:
+                    click_x, click_y = best[0], best[1]
+                    logger.info(f"Using detected position for 'Download manually': ({click_x}, {click_y})")
+                elif not allow_fallback:
+                    logger.warning("'Download manually' not detected - not clicking at the fallback position")
+                    return False
+                else:
+                    screen_width, screen_height = self.actuator.screen_size()
+                    click_x = int(screen_width * config.MANUAL_BUTTON_X_PERCENT)
+                    click_y = int(screen_height * config.MANUAL_BUTTON_Y_PERCENT)
+                    logger.info(f"Using MANUAL CALIBRATED position: ({click_x}, {click_y})")
+                    self.metrics.counter("fallbacks").inc()
+                    self.report_failure("manual_fallback")
+                    self.fallback_clicked = True
             
-            # Click the button - use left click explicitly
-            pyautogui.mouseDown(button='left')
-            time.sleep(0.1)
-            pyautogui.mouseUp(button='left')
+            # Move to the button, hover (focus/visibility), then click
+            self.actuator.click(click_x, click_y)
             logger.info(f"Clicked 'Download manually' at ({click_x}, {click_y})")
+            self.metrics.counter("clicks").inc()
+            self.last_manual_click = (click_x, click_y)
             
-            time.sleep(config.BUTTON_CLICK_DELAY)
+            self.actuator.wait(config.BUTTON_CLICK_DELAY, "after_click")
             return True
             
+        except self.flow.fatal:
+            raise  # FailSafe: stop the downloader, not just this step
         except Exception as e:
             logger.error(f"Error clicking 'Download manually': {e}")
             return False
     
-    def check_download_started(self) -> bool:
+    def check_download_started(self, frame: Frame = None) -> bool:
         """
         Checks if the browser tab shows "Your download has started" message.
         Uses multiple detection methods for better reliability.
         
+        Args:
+            frame: Optional already-captured frame to check
+        
         Returns:
             True if download confirmation page is detected, False otherwise
         """
         try:
-            screenshot = ImageGrab.grab()
-            screenshot_np = np.array(screenshot)
-            
-            height, width, _ = screenshot_np.shape
-            
-            # Method 1: Check for the large white text in center (more relaxed threshold)
-            center_y_start = int(height * 0.25)
-            center_y_end = int(height * 0.55)
-            center_x_start = int(width * 0.20)
-            center_x_end = int(width * 0.80)
-            
-            search_region = screenshot_np[center_y_start:center_y_end, center_x_start:center_x_end]
-            search_gray = cv2.cvtColor(search_region, cv2.COLOR_RGB2GRAY)
-            
-            # Lower threshold - look for bright pixels (white text)
-            bright_pixels = np.sum(search_gray > 180)  # Lowered from 200
-            total_pixels = search_gray.size
-            bright_ratio = bright_pixels / total_pixels
-            
-            # Method 2: Check if there's a download file box (dark box with white text)
-            # The confirmation page has a file name box at the top
-            file_box_region = screenshot_np[int(height * 0.15):int(height * 0.30), 
-                                           int(width * 0.20):int(width * 0.80)]
-            file_box_gray = cv2.cvtColor(file_box_region, cv2.COLOR_RGB2GRAY)
-            
-            # Look for medium brightness (the dark box with text inside)
-            medium_bright = np.sum((file_box_gray > 100) & (file_box_gray < 200))
-            file_box_ratio = medium_bright / file_box_gray.size
-            
-            # Combined detection: either bright text OR file box
-            detected = bright_ratio > 0.08 or file_box_ratio > 0.10  # Lower thresholds
+            frame = self._frame_or_capture(frame, regions="download_started")
+            detected, bright_ratio, file_box_ratio = self.cached(
+                "download_started", frame, lambda: detection.detect_download_started(frame))
             
             if detected:
                 logger.info(f"Download confirmation detected (bright: {bright_ratio:.2%}, file_box: {file_box_ratio:.2%})")
@@ -240,13 +372,17 @@ class VortexAutoDownloader:
             logger.debug(f"Error checking download status: {e}")
             return False
     
-    def close_browser_tab(self, is_first_download: bool = False) -> bool:
+    def close_browser_tab(self, is_first_download: bool = False, count: int = 1) -> bool:
         """
         Closes the current browser tab using keyboard shortcut (Ctrl+W).
         Uses multiple methods to ensure the browser is focused.
         
+        The Vortex window handle is remembered so restore_vortex() can bring
+        it back to the front afterwards.
+        
         Args:
             is_first_download: If True, this is the first download - keep the tab open
+            count: Tabs to close with a single focus switch (the newest ones)
         
         Returns:
             True if successful, False if skipped
@@ -261,313 +397,596 @@ class VortexAutoDownloader:
             # All subsequent downloads: Close the tab
             logger.info("Attempting to close browser tab...")
             
-            # First, find and save Vortex window handle so we can restore it later
-            def find_vortex_hwnd():
-                """Find Vortex window handle."""
-                def callback(hwnd, windows):
-                    if win32gui.IsWindowVisible(hwnd):
-                        window_title = win32gui.GetWindowText(hwnd).lower()
-                        if 'vortex' in window_title:
-                            windows.append(hwnd)
-                
-                windows = []
-                win32gui.EnumWindows(callback, windows)
-                return windows[0] if windows else None
-            
-            vortex_hwnd = find_vortex_hwnd()
+            # Find both windows in one lookup (cached handles are reused while valid),
+            # and save the Vortex handle so we can restore it later
+            handles = self.windows.resolve("vortex", "browser")
+            self.vortex_hwnd = handles["vortex"]
             
-            # Method 1: Find browser window and bring it to front (briefly)
-            browser_titles = ['chrome', 'firefox', 'edge', 'opera', 'brave', 'nexusmods', 'google chrome']
-            
-            def find_browser_hwnd():
-                """Find browser window handle."""
-                def callback(hwnd, windows):
-                    if win32gui.IsWindowVisible(hwnd):
-                        window_title = win32gui.GetWindowText(hwnd).lower()
-                        for title in browser_titles:
-                            if title in window_title:
-                                windows.append(hwnd)
-                
-                windows = []
-                win32gui.EnumWindows(callback, windows)
-                return windows[0] if windows else None
-            
-            browser_hwnd = find_browser_hwnd()
+            # Method 1: Bring the browser window to front (briefly)
+            browser_hwnd = handles["browser"]
             if browser_hwnd:
-                try:
-                    # Briefly bring browser to front
-                    win32gui.ShowWindow(browser_hwnd, win32con.SW_RESTORE)
-                    win32gui.SetForegroundWindow(browser_hwnd)
+                self.report_window_geometry("slow_download", browser_hwnd)
+                if self.windows.focus(browser_hwnd):
                     logger.debug(f"Brought browser window to front temporarily")
-                    time.sleep(0.3)  # Brief pause for focus
-                except Exception as e:
-                    logger.debug(f"Could not bring browser to front: {e}")
+                    self.actuator.wait(self.actuator.profile.focus_delay, "focus")  # Brief pause for focus
             
             # Method 2: Send Ctrl+W to close the current tab
-            logger.info("Sending Ctrl+W to close tab...")
-            
-            # Hold Ctrl and press W
-            pyautogui.keyDown('ctrl')
-            time.sleep(0.1)
-            pyautogui.press('w')
-            time.sleep(0.1)
-            pyautogui.keyUp('ctrl')
+            logger.info(f"Sending Ctrl+W to close {count} tab(s)...")
             
-            time.sleep(0.5)  # Brief wait for tab to close
+            # Hold Ctrl and press W once per tab, then wait briefly for the tabs to close
+            self.actuator.shortcut('ctrl', 'w', times=count)
             
-            # Method 3: Immediately restore Vortex to front
-            if vortex_hwnd:
-                try:
-                    win32gui.ShowWindow(vortex_hwnd, win32con.SW_RESTORE)
-                    win32gui.SetForegroundWindow(vortex_hwnd)
-                    logger.debug("Restored Vortex window to front")
-                    time.sleep(0.2)
-                except Exception as e:
-                    logger.debug(f"Could not restore Vortex to front: {e}")
-            
-            logger.info("✓ Browser tab closed, Vortex restored to front")
+            logger.info(f"✓ {count} browser tab(s) closed")
+            self.metrics.counter("tabs_closed").inc(count)
             
             return True
             
+        except self.flow.fatal:
+            raise
         except Exception as e:
             logger.error(f"Error closing browser tab: {e}", exc_info=True)
             return False
     
-    def click_slow_download(self) -> bool:
+    def close_download_tabs(self, count: int) -> bool:
+        """
+        Closes a batch of download tabs for the tab janitor, then brings Vortex back.
+        
+        Args:
+            count: Tabs to close
+        
+        Returns:
+            True if the tabs were closed
+        """
+        closed = self.close_browser_tab(count=count)
+        if closed and self.vortex_hwnd:
+            self.restore_vortex()
+        self.vortex_hwnd = None
+        return closed
+    
+    def sweep_tabs(self, idle: bool = False) -> int:
+        """
+        Lets the tab janitor close a batch of tabs if one is due.
+        
+        Args:
+            idle: The downloader is between mods
+        
+        Returns:
+            Number of tabs closed
+        """
+        if not self.tab_janitor:
+            return 0
+        closed = self.tab_janitor.sweep(idle)
+        if closed and self.change_gate:
+            self.change_gate.invalidate()  # The screen changed under the gate
+        return closed
+    
+    def report_window_lookups(self):
+        """
+        Logs and counts the window enumerations of the download that just ended.
+        """
+        period = self.windows.take_period()
+        self.metrics.counter("window_enumerations").inc(period["enumerations"])
+        logger.debug(f"Window lookups this download: {period['enumerations']} enumeration(s), "
+                     f"{period['enumeration_ms']:.1f} ms")
+    
+    def report_window_geometry(self, button: str, hwnd):
+        """
+        Tells the location tracker where the window holding a button is now,
+        so a remembered position is dropped once that window moves or resizes.
+        """
+        if not self.tracker:
+            return
+        try:
+            self.tracker.update_geometry(button, self.windows.rect(hwnd))
+        except Exception as e:
+            logger.debug(f"Could not read window geometry: {e}")
+    
+    def restore_vortex(self) -> bool:
+        """
+        Brings the Vortex window (found by close_browser_tab) back to the front.
+        
+        Returns:
+            True if Vortex was restored, False otherwise
+        """
+        if not self.vortex_hwnd:
+            return False
+        if not self.windows.focus(self.vortex_hwnd):
+            logger.debug("Could not restore Vortex to front")
+            self.windows.invalidate("vortex")
+            return False
+        logger.debug("Restored Vortex window to front")
+        self.report_window_geometry("manual_button", self.vortex_hwnd)
+        self.actuator.wait(self.actuator.profile.restore_delay, "focus")
+        return True
+    
+    def wait_until(self, predicate, timeout: float, poll: float = None):
+        """
+        Polls predicate until it returns something truthy or timeout expires.
+        See scheduling.wait_until; uses this downloader's clock.
+        
+        Returns:
+            The predicate's first truthy result, or None on timeout
+        """
+        start = self.clock.now()
+        result = wait_until(predicate, timeout, poll, clock=self.clock)
+        logger.debug(f"Waited {self.clock.now() - start:.2f}s ({'condition met' if result else 'timed out'})")
+        return result
+    
+    def find_slow_download_button(self) -> tuple | None:
+        """
+        Captures the browser region and looks for the 'Slow download' button.
+        
+        A candidate at the spot where 'Download manually' was just clicked is
+        the Vortex dialog still on screen, not the browser page, and is ignored.
+        
+        Returns:
+            (x, y, area, aspect_ratio) if found, None otherwise
+        """
+        frame = self.capture_frame(regions="slow_download")
+        best = self.detect_button("slow_download", frame)
+        frame.decisions["slow_download"] = best
+        self.end_cycle()
+        
+        if best and self.last_manual_click:
+            manual_x, manual_y = self.last_manual_click
+            if abs(best[0] - manual_x) <= 20 and abs(best[1] - manual_y) <= 20:
+                logger.debug("Ignoring 'Slow download' candidate at the 'Download manually' position")
+                return None
+        return best
+    
+    def download_confirmed(self) -> bool:
+        """
+        Checks for the 'download has started' page, with the 'Slow download'
+        button gone (so the download page itself is not mistaken for it).
+        
+        The Nexus countdown page passes the same check, so nothing counts
+        before DOWNLOAD_COUNTDOWN_FLOOR seconds after the 'Slow download'
+        click, and the page must be seen on DOWNLOAD_CONFIRM_POLLS
+        consecutive polls.
+        """
+        if (self.slow_clicked_at is not None
+                and self.clock.now() - self.slow_clicked_at < config.DOWNLOAD_COUNTDOWN_FLOOR):
+            return False
+        frame = self.capture_frame(regions=["download_started", "slow_download"])
+        seen = (self.check_download_started(frame)
+                and not detection.detect_slow_download_button(frame, self.tracker))
+        self.confirm_streak = self.confirm_streak + 1 if seen else 0
+        confirmed = self.confirm_streak >= config.DOWNLOAD_CONFIRM_POLLS
+        frame.decisions["download_confirmed"] = confirmed
+        self.end_cycle()
+        return confirmed
+    
+    def wait_for_browser_page(self, timeout: float = None) -> tuple | None:
+        """
+        Waits for the Nexus Mods page: returns as soon as the 'Slow download'
+        button is detected.
+        
+        Args:
+            timeout: Longest wait (seconds); defaults to BROWSER_LOAD_WAIT
+        
+        Returns:
+            (x, y, area, aspect_ratio) of the button, or None on timeout
+        """
+        timeout = config.BROWSER_LOAD_WAIT if timeout is None else timeout
+        best = self.wait_until(self.find_slow_download_button, timeout)
+        if best:
+            logger.info(f"Detected 'Slow download' button at ({best[0]}, {best[1]}), area: {best[2]}")
+        return best
+    
+    def click_slow_download(self, button: tuple = None) -> bool:
         """
         Clicks the 'Slow download' button in the browser.
-        Uses color-based detection similar to the Vortex button.
+        
+        Args:
+            button: Detected button (x, y, ...) from wait_for_browser_page().
+                    If None, the button is looked for once more; the configured fallback
+                    position is only clicked with FALLBACK_CLICKS_ENABLED.
         
         Returns:
             True if clicked successfully, False otherwise
         """
         try:
-            # Wait for browser page to fully load
-            time.sleep(config.BROWSER_LOAD_WAIT)
-            
-            # Look for the "Slow download" button on the Nexus Mods page
-            screenshot = ImageGrab.grab()
-            screenshot_np = np.array(screenshot)
-            
-            height, width, _ = screenshot_np.shape
-            
-            # Search in the center-left region where the "Slow download" button is
-            # Similar layout to Vortex dialog - gray button on left, purple on right
-            center_y_start = int(height * 0.35)
-            center_y_end = int(height * 0.65)
-            center_x_start = int(width * 0.15)   # Left side of page
-            center_x_end = int(width * 0.45)     # Stop before purple section
-            
-            search_region = screenshot_np[center_y_start:center_y_end, center_x_start:center_x_end]
-            search_hsv = cv2.cvtColor(search_region, cv2.COLOR_RGB2HSV)
-            search_gray = cv2.cvtColor(search_region, cv2.COLOR_RGB2GRAY)
-            
-            # Look for gray buttons (similar to "Download manually" button)
-            gray_lower = np.array([0, 0, 60])
-            gray_upper = np.array([180, 30, 100])
-            gray_mask = cv2.inRange(search_hsv, gray_lower, gray_upper)
-            
-            contours_gray, _ = cv2.findContours(gray_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            
-            button_candidates = []
-            
-            for contour in contours_gray:
-                x_c, y_c, w_c, h_c = cv2.boundingRect(contour)
-                
-                # Button size filter
-                if (config.BROWSER_BUTTON_MIN_WIDTH < w_c < config.BROWSER_BUTTON_MAX_WIDTH and 
-                    config.BROWSER_BUTTON_MIN_HEIGHT < h_c < config.BROWSER_BUTTON_MAX_HEIGHT):
-                    
-                    # Make sure it's not purple
-                    button_region_hsv = search_hsv[y_c:y_c+h_c, x_c:x_c+w_c]
-                    purple_mask = cv2.inRange(button_region_hsv, 
-                                             np.array([125, 50, 50]), 
-                                             np.array([155, 255, 255]))
-                    purple_ratio = np.sum(purple_mask > 0) / (w_c * h_c) if (w_c * h_c) > 0 else 1
-                    
-                    if purple_ratio > 0.1:
-                        logger.debug(f"Skipping gray area at ({x_c}, {y_c}) - purple detected ({purple_ratio:.2%})")
-                        continue
-                    
-                    # Convert to screen coordinates
-                    screen_x = center_x_start + x_c + w_c // 2
-                    screen_y = center_y_start + y_c + h_c // 2
-                    area = w_c * h_c
-                    
-                    # Check aspect ratio (buttons are wider than tall)
-                    aspect_ratio = w_c / h_c if h_c > 0 else 0
-                    if 2 < aspect_ratio < 8:
-                        button_candidates.append((screen_x, screen_y, area, aspect_ratio))
-                        logger.debug(f"Found gray button candidate at ({screen_x}, {screen_y}), size: {w_c}x{h_c}, aspect: {aspect_ratio:.2f}")
-            
-            if button_candidates:
-                # Sort by area (largest first)
-                button_candidates.sort(key=lambda x: -x[2])
-                click_x, click_y, area, aspect = button_candidates[0]
-                logger.info(f"Detected 'Slow download' button at ({click_x}, {click_y}), area: {area}")
+            if not button and not config.FALLBACK_CLICKS_ENABLED:
+                # One more look before giving up; never click blind
+                button = self.find_slow_download_button()
+                if not button:
+                    logger.warning("'Slow download' not detected - not clicking at the fallback position")
+                    return False
+            if button:
+                click_x, click_y = button[0], button[1]
             else:
                 # Fallback: Use configured position
+                width, height = self.capture.size()
                 click_x = int(width * config.BROWSER_BUTTON_X_PERCENT)
                 click_y = int(height * config.BROWSER_BUTTON_Y_PERCENT)
                 logger.info(f"Using fallback position for 'Slow download': ({click_x}, {click_y})")
+                self.metrics.counter("fallbacks").inc()
+                self.report_failure("slow_download_fallback")
             
-            # Move mouse to button first, then click
-            pyautogui.moveTo(click_x, click_y, duration=0.3)
-            time.sleep(0.3)  # Pause for hover effect and page focus
-            
-            # Click the button - use explicit mouse down/up
-            pyautogui.mouseDown(button='left')
-            time.sleep(0.1)
-            pyautogui.mouseUp(button='left')
+            # Move to the button, hover (page focus), then click
+            self.actuator.click(click_x, click_y)
+            self.slow_clicked_at = self.clock.now()
+            self.confirm_streak = 0
             logger.info(f"Clicked 'Slow download' at ({click_x}, {click_y})")
-            
-            # Close the browser tab after download starts
-            # First download: Keep tab open. Subsequent downloads: Close tab.
-            if config.AUTO_CLOSE_DOWNLOAD_TABS:
-                logger.info("Waiting for download to start...")
-                
-                # Wait a bit for the download to actually start
-                time.sleep(config.TAB_CLOSE_DELAY)  # Give download time to initiate
-                
-                # Check if this is the first download
-                is_first = not self.first_download_done
-                
-                if is_first:
-                    logger.info("First download - keeping tab open")
-                else:
-                    logger.info("Subsequent download - closing confirmation tab")
-                
-                self.close_browser_tab(is_first_download=is_first)
-                
-                # Optionally check if it actually closed (for debugging)
-                time.sleep(0.5)
-            
+            self.metrics.counter("clicks").inc()
             return True
             
+        except self.flow.fatal:
+            raise
         except Exception as e:
             logger.error(f"Error clicking 'Slow download': {e}")
             return False
     
-    def process_download(self, button_pos: tuple = None) -> bool:
+    def wait_for_download_started(self, timeout: float = None) -> bool:
+        """
+        Waits for the download to actually start: sleeps through the
+        countdown (DOWNLOAD_COUNTDOWN_FLOOR), then returns as soon as the
+        confirmation page is confirmed.
+        
+        Args:
+            timeout: Longest wait (seconds); defaults to TAB_CLOSE_DELAY
+        
+        Returns:
+            True if confirmed, False on timeout
+        """
+        timeout = config.TAB_CLOSE_DELAY if timeout is None else timeout
+        logger.info("Waiting for download to start...")
+        remaining = timeout
+        if self.slow_clicked_at is not None:
+            # No point polling through the countdown
+            floor = min(self.slow_clicked_at + config.DOWNLOAD_COUNTDOWN_FLOOR - self.clock.now(), timeout)
+            if floor > 0:
+                self.clock.sleep(floor)
+                remaining -= floor
+        if self.wait_until(self.download_confirmed, remaining):
+            return True
+        logger.warning(f"Download not confirmed after {timeout}s, continuing anyway")
+        self.report_failure("download_not_confirmed")
+        return False
+    
+    def _close_tab_step(self, context: dict) -> bool:
+        """
+        Flow step for DownloadConfirmed: closes the download tab.
+        First download: keep the tab open. Subsequent downloads: close it.
+        """
+        self.vortex_hwnd = None
+        if not config.AUTO_CLOSE_DOWNLOAD_TABS:
+            return True
+        if self.tab_janitor:
+            # Closed later, several at a time (the janitor keeps the first tab open)
+            self.first_download_done = True
+            self.tab_janitor.opened()
+            self.sweep_tabs()
+            return True
+        is_first = not self.first_download_done
+        if is_first:
+            logger.info("First download - keeping tab open")
+            self.close_browser_tab(is_first_download=True)
+            return True
+        logger.info("Subsequent download - closing confirmation tab")
+        return self.close_browser_tab()
+    
+    def _restore_vortex_step(self, context: dict) -> bool:
+        """
+        Flow step for TabClosed: brings Vortex back if the browser took focus.
+        """
+        if not self.vortex_hwnd:
+            return True
+        return self.restore_vortex()
+    
+    def _build_flow(self) -> DownloadFlow:
+        """
+        Builds the download state machine from this downloader's steps.
+        """
+        retries, retry_delay = config.FLOW_STEP_RETRIES, config.FLOW_RETRY_DELAY
+        return DownloadFlow({
+            # Clicks are never retried blindly: a second click could land on whatever opened
+            State.DIALOG_SEEN: Step(
+                lambda ctx, timeout: self.click_download_manually(ctx.get("button_pos"), ctx.get("allow_fallback")),
+                timeout=config.FLOW_STEP_TIMEOUT),
+            State.MANUAL_CLICKED: Step(
+                lambda ctx, timeout: self.wait_for_browser_page(timeout),
+                timeout=config.BROWSER_LOAD_WAIT, required=False),  # Falls back to the configured position
+            State.BROWSER_LOADED: Step(
+                lambda ctx, timeout: self.click_slow_download(ctx["results"].get(State.MANUAL_CLICKED)),
+                timeout=config.FLOW_STEP_TIMEOUT),
+            State.SLOW_CLICKED: Step(
+                lambda ctx, timeout: self.wait_for_download_started(timeout),
+                timeout=config.TAB_CLOSE_DELAY, required=False),
+            State.DOWNLOAD_CONFIRMED: Step(
+                lambda ctx, timeout: self._close_tab_step(ctx),
+                timeout=config.FLOW_STEP_TIMEOUT, required=False),
+            State.TAB_CLOSED: Step(
+                lambda ctx, timeout: self._restore_vortex_step(ctx),
+                timeout=config.FLOW_STEP_TIMEOUT, retries=retries, retry_delay=retry_delay, required=False),
+        }, clock=self.clock)
+    
+    def _build_metrics(self) -> MetricsRegistry:
+        """
+        Registers the downloader's metrics, so every one shows up in the export from the start.
+        """
+        metrics = MetricsRegistry()
+        metrics.counter("cycles", "Monitoring cycles run")
+        metrics.counter("detections", "Cycles where the 'Download manually' button was detected")
+        metrics.counter("fallbacks", "Clicks made at a configured fallback position")
+        metrics.counter("clicks", "Button clicks made")
+        metrics.counter("tabs_closed", "Browser tabs closed")
+        metrics.counter("window_enumerations", "Full passes over the desktop's windows")
+        metrics.counter("downloads", "Downloads completed")
+        metrics.counter("failures", "Downloads that stopped part-way")
+        metrics.gauge("cycle_ms", "Duration of the last monitoring cycle (ms, without the sleep)")
+        metrics.gauge("debug_queue_depth", "Debug screenshots waiting to be written",
+                      function=lambda: self.debug_writer.queue.qsize() if self.debug_writer else 0)
+        metrics.gauge("tracker_hit_rate", "Fraction of tracked searches that found the button",
+                      function=lambda: self.tracker.stats()["tracked_hit_rate"] if self.tracker else 0)
+        metrics.gauge("full_scan_hit_rate", "Fraction of full search-region scans that found the button",
+                      function=lambda: self.tracker.stats()["full_hit_rate"] if self.tracker else 0)
+        for outcome in ("prior", "color", "template", "fused", "none"):
+            metrics.counter(f"race_{outcome}", f"Detection races decided by '{outcome}'")
+        for stage in (1, 2, 3):
+            metrics.counter(f"cascade_stage{stage}", f"Cycles where the dialog cascade stopped at stage {stage}")
+        metrics.gauge("open_tabs", "Download tabs left open for the tab janitor",
+                      function=lambda: self.tab_janitor.open_tabs if self.tab_janitor else 0)
+        metrics.gauge("result_cache_hit_rate", "Fraction of detector runs served from the result cache",
+                      function=lambda: self.result_cache.stats()["hit_rate"] if self.result_cache else 0)
+        metrics.histogram("capture_ms", "Screen capture time (ms)")
+        metrics.histogram("detect_ms", "'Download manually' detector time (ms)")
+        metrics.histogram("download_seconds", "End-to-end time per mod (seconds)", buckets=SECONDS_BUCKETS)
+        metrics.rate("downloads_per_hour", "Downloads per hour over the last hour")
+        return metrics
+    
+    def process_download(self, button_pos: tuple = None, allow_fallback: bool = None) -> bool:
         """
-        Processes a single download by clicking through the dialogs.
+        Processes a single download by running the download state machine.
         
         Args:
             button_pos: Optional (x, y) coordinates of the download button.
-                       If None, will still attempt using manual calibration.
+                       If None, the button is looked for once more.
+            allow_fallback: Click the calibrated position if it is still not found
+                            (default: FALLBACK_CLICKS_ENABLED)
         
         Returns:
             True if successful, False otherwise
         """
         logger.info("Processing download...")
         
-        # Step 1: Click "Download manually" 
         # This will always attempt to click (using manual position if detection failed)
-        logger.info("Step 1: Clicking 'Download manually' button...")
-        if self.click_download_manually(button_pos):
-            logger.info("✓ Successfully clicked 'Download manually'")
-            time.sleep(config.BROWSER_LOAD_WAIT)  # Wait for browser page to load
-            
-            # Step 2: Click "Slow download" on the browser page
-            logger.info("Step 2: Clicking 'Slow download' button in browser...")
-            if self.click_slow_download():
-                logger.info("✓ Successfully clicked 'Slow download'")
-                logger.info("✓ Download process completed!")
-                return True
-            else:
-                logger.warning("✗ Failed to click 'Slow download'")
-                return False
+        with self.metrics.histogram("download_seconds").time(scale=1):
+            success = self.flow.run({"button_pos": button_pos, "allow_fallback": allow_fallback})
+        self.report_download(success)
+        return success
+    
+    def report_download(self, success: bool):
+        """
+        Logs and counts the outcome of the flow's last download, with its state timings.
+        """
+        logger.info(f"Flow timings: {self.flow.summary()}")
+        self.report_window_lookups()
+        
+        if success:
+            logger.info("✓ Download process completed!")
+            self.metrics.counter("downloads").inc()
+            self.metrics.rate("downloads_per_hour").mark()
         else:
-            logger.warning("✗ Failed to click 'Download manually'")
-            return False
+            failed = self.flow.failed_state.value
+            logger.warning(f"✗ Download stopped at {failed}")
+            self.metrics.counter("failures").inc()
+            self.report_failure(f"flow_failed_{failed}")
+        
+        for state, stats in self.flow.latency_stats().items():
+            logger.debug(f"[Flow] {state}: n={stats['count']}, p50 {stats['p50']:.2f}s, "
+                         f"p95 {stats['p95']:.2f}s, max {stats['max']:.2f}s")
     
-    def detect_button_on_screen(self, button_text: str) -> tuple | None:
+    def detect_button_on_screen(self, button_text: str, frame: Frame = None) -> tuple | None:
         """
         Detects if a button with specific characteristics is visible on screen.
         Uses color-based detection to find the gray "Download manually" button.
         
+        Args:
+            button_text: Name of the button for logging
+            frame: Optional already-captured frame (the cycle's shared frame)
+        
         Returns:
             (x, y) coordinates if found, None otherwise
         """
         try:
-            screenshot = ImageGrab.grab()
-            screenshot_np = np.array(screenshot)
-            
-            # Save debug screenshot if enabled
-            if config.SAVE_DEBUG_SCREENSHOTS:
-                debug_dir = Path(config.DEBUG_SCREENSHOT_DIR)
-                debug_dir.mkdir(exist_ok=True)
-                screenshot.save(debug_dir / f"fullscreen_{datetime.now().strftime('%H%M%S')}.png")
-            
-            height, width, _ = screenshot_np.shape
-            
-            # Search in the center-LEFT region where the FREE "Download manually" button is
-            # Based on manual calibration: button is at 16.7% from left, 41.3% from top
-            center_y_start = int(height * 0.35)  # Start higher to include the button
-            center_y_end = int(height * 0.50)    # End after the button
-            center_x_start = int(width * 0.13)   # Start much further left (button is at 16.7%)
-            center_x_end = int(width * 0.30)     # End after the button (button is at 16.7%)
-            
-            search_region = screenshot_np[center_y_start:center_y_end, center_x_start:center_x_end]
-            
-            # Convert to grayscale and HSV for better detection
-            search_gray = cv2.cvtColor(search_region, cv2.COLOR_RGB2GRAY)
-            search_hsv = cv2.cvtColor(search_region, cv2.COLOR_RGB2HSV)
+            frame = self._frame_or_capture(frame, regions="manual_button")
             
-            # Method 1: Look for gray buttons (dark gray button with light border)
-            # The "Download manually" button color from calibration: RGB(73,73,76), HSV(H:120, S:13, V:76)
-            # Gray in HSV: low saturation, medium-dark value
-            gray_lower = np.array([0, 0, 60])      # Dark gray (Value around 76)
-            gray_upper = np.array([180, 30, 100])  # Low saturation (S around 13), medium value
-            gray_mask = cv2.inRange(search_hsv, gray_lower, gray_upper)
+            # Save debug screenshot if enabled (written in the background)
+            if self.debug_writer:
+                self.debug_writer.submit(frame, "capture")
             
-            # Find contours in the gray areas
-            contours_gray, _ = cv2.findContours(gray_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            
-            button_candidates = []
-            
-            for contour in contours_gray:
-                x_c, y_c, w_c, h_c = cv2.boundingRect(contour)
-                
-                # Button size filter - the "Download manually" button is roughly 200x50 pixels
-                if (100 < w_c < 300 and 30 < h_c < 70):
-                    # Make sure it's not purple
-                    button_region_hsv = search_hsv[y_c:y_c+h_c, x_c:x_c+w_c]
-                    purple_mask = cv2.inRange(button_region_hsv, 
-                                             np.array([125, 50, 50]), 
-                                             np.array([155, 255, 255]))
-                    purple_ratio = np.sum(purple_mask > 0) / (w_c * h_c) if (w_c * h_c) > 0 else 1
-                    
-                    if purple_ratio > 0.1:
-                        logger.debug(f"Skipping gray area at ({x_c}, {y_c}) - purple detected ({purple_ratio:.2%})")
-                        continue
-                    
-                    # Convert to screen coordinates
-                    screen_x = center_x_start + x_c + w_c // 2
-                    screen_y = center_y_start + y_c + h_c // 2
-                    area = w_c * h_c
-                    
-                    # Check aspect ratio (buttons are wider than tall)
-                    aspect_ratio = w_c / h_c if h_c > 0 else 0
-                    if 2 < aspect_ratio < 8:  # Reasonable button proportions
-                        button_candidates.append((screen_x, screen_y, area, aspect_ratio))
-                        logger.debug(f"Found gray button candidate at ({screen_x}, {screen_y}), size: {w_c}x{h_c}, aspect: {aspect_ratio:.2f}")
+            # Skip the full detector while the search region is unchanged
+            if self.change_gate:
+                region = frame.roi(frame.bbox_from_percent(*self.planner.regions["manual_button"]))
+                if self.change_gate.should_run("manual_button", region):
+                    with self.metrics.histogram("detect_ms").time():
+                        best = self.detect_button("manual_button", frame)
+                    self.change_gate.store("manual_button", best)
+                else:
+                    best = self.change_gate.last_result("manual_button")
+            else:
+                with self.metrics.histogram("detect_ms").time():
+                    best = self.detect_button("manual_button", frame)
+            frame.decisions["manual_button"] = best
             
-            if button_candidates:
-                # Sort by area (largest first)
-                button_candidates.sort(key=lambda x: -x[2])
-                x, y, area, aspect = button_candidates[0]
+            if best:
+                self.metrics.counter("detections").inc()
+                x, y, area, aspect = best
                 logger.info(f"Detected '{button_text}' button at ({x}, {y}), area: {area}, aspect: {aspect:.2f}")
                 return (x, y)
             
-            # If no gray buttons found, log for debugging
-            logger.debug(f"No gray buttons found in search region. Checked {len(contours_gray)} gray areas.")
             return None
             
         except Exception as e:
             logger.error(f"Error detecting button on screen: {e}")
             return None
     
+    def log_cycle_stats(self, cycle_count: int):
+        """
+        Logs the capture, cache, tracker, race, cascade and scheduler counters.
+        """
+        stats = self.frame_stats
+        logger.debug(f"[Cycle {cycle_count}] Still monitoring... "
+                     f"(captures: {stats['captures']}, saved: {stats['captures_saved']}, "
+                     f"conversions: {stats['conversions']}, saved: {stats['conversions_saved']}, "
+                     f"pixels: {stats['pixels_captured'] / 1e6:.1f} MP)")
+        if self.change_gate:
+            gate = self.change_gate.stats()
+            logger.debug(f"[Cycle {cycle_count}] Change gate: {gate['hits']} skipped, "
+                         f"{gate['misses']} detected ({gate['stale_runs']} stale), "
+                         f"hit rate {gate['hit_rate']:.1%}")
+        if self.tracker:
+            track = self.tracker.stats()
+            logger.debug(f"[Cycle {cycle_count}] Tracker: tracked {track['tracked_hits']}/"
+                         f"{track['tracked_hits'] + track['tracked_misses']} "
+                         f"({track['tracked_hit_rate']:.1%}), full scan {track['full_hits']}/"
+                         f"{track['full_hits'] + track['full_misses']} ({track['full_hit_rate']:.1%}), "
+                         f"{track['invalidations']} dropped")
+        if self.result_cache:
+            cache = self.result_cache.stats()
+            logger.debug(f"[Cycle {cycle_count}] Result cache: {cache['hits']} hits, "
+                         f"{cache['misses']} misses ({cache['expired']} expired), "
+                         f"{cache['size']} stored, hit rate {cache['hit_rate']:.1%}")
+        for name, race in self.races.items():
+            race_stats = race.stats()
+            timings = ", ".join(f"{s} {ms:.1f}" for s, ms in race_stats["p50_ms"].items())
+            logger.debug(f"[Cycle {cycle_count}] Race '{name}': wins {race_stats['wins']}, "
+                         f"p50 ms {timings}, decided in {race_stats['decision_p50_ms']:.1f} ms")
+        if self.dialog_cascade:
+            cascade = self.dialog_cascade.stats()
+            logger.debug(f"[Cycle {cycle_count}] Dialog cascade: {cascade['stage1_rejected']} rejected "
+                         f"by sampling, {cascade['stage2_rejected']} by histogram, "
+                         f"{cascade['detected']} detected, {cascade['undetected']} without a button")
+        if self.tab_janitor:
+            tabs = self.tab_janitor.stats()
+            logger.debug(f"[Cycle {cycle_count}] Tab janitor: {tabs['open']} open, {tabs['closed']} closed "
+                         f"in {tabs['batches']} batches ({tabs['tabs_per_batch']:.1f} per focus switch)")
+        lookups = self.windows.stats()
+        logger.debug(f"[Cycle {cycle_count}] Windows: {lookups['enumerations']} enumerations "
+                     f"({lookups['enumeration_ms']:.1f} ms), {lookups['cache_hits']} cached handles reused, "
+                     f"{lookups['stale_handles']} stale")
+        actions = ", ".join(f"{name} {a['count']}x {a['mean'] * 1000:.0f} ms"
+                            for name, a in self.actuator.stats().items())
+        if actions:
+            logger.debug(f"[Cycle {cycle_count}] Input ({self.actuator.profile.name}): {actions}")
+        schedule = self.scheduler.stats()
+        logger.debug(f"[Cycle {cycle_count}] Scheduler: {schedule['wakeups']} wake-ups, "
+                     f"{schedule['slept']:.1f}s asleep, interval {schedule['interval']:.2f}s")
+    
+    def check_for_dialog(self, frame: Frame) -> tuple:
+        """
+        Looks for the Vortex dialog and its 'Download manually' button in a frame.
+        
+        Args:
+            frame: Captured screen covering the "manual_button" and "dialog" regions
+        
+        Returns:
+            (button_pos, fallback, verdict): the button position or None; whether the dialog
+            cascade is sure enough of a dialog to click the calibrated position without a
+            button; the CascadeVerdict (None without the cascade)
+        """
+        if not self.dialog_cascade:
+            return self.detect_button_on_screen("Download manually", frame), False, None
+        
+        # Cheap checks for a dialog first; the button detector only runs when they pass
+        verdict = self.dialog_cascade.run(frame, lambda: self.detect_button_on_screen("Download manually", frame))
+        self.metrics.counter(f"cascade_stage{verdict.stage}").inc()
+        # No button found, but the dialog is almost certainly there: the flow looks once
+        # more, then clicks the calibrated position (only with FALLBACK_CLICKS_ENABLED)
+        fallback = (config.FALLBACK_CLICKS_ENABLED and not verdict.button and verdict.dialog_present
+                    and verdict.confidence >= config.DIALOG_FALLBACK_CONFIDENCE)
+        return verdict.button, fallback, verdict
+    
+    def download(self, button_pos: tuple = None, fallback: bool = False) -> bool:
+        """
+        Runs the download flow for a detected dialog and schedules the next check.
+        """
+        logger.info("Attempting to process download...")
+        if self.change_gate:
+            self.change_gate.invalidate()  # We are about to change the screen ourselves
+        if self.process_download(button_pos, allow_fallback=fallback or None):
+            # Sleep through the cooldown in one wait, then poll fast for the next dialog
+            self.scheduler.download_finished()
+            logger.info(f"Waiting {self.scheduler.cooldown} seconds before next check...")
+            return True
+        self.schedule_failed_download()
+        return False
+    
+    def schedule_failed_download(self):
+        """
+        Adjusts the polling rate after a download that did not finish.
+        """
+        if self.fallback_clicked:
+            # A blind click did not work; the next cycle would most likely repeat it
+            logger.info(f"Fallback click failed, waiting {config.FALLBACK_RETRY_DELAY} seconds before next check...")
+            self.scheduler.back_off(config.FALLBACK_RETRY_DELAY)
+        else:
+            self.scheduler.activity()
+    
+    def schedule_quiet_cycle(self, verdict):
+        """
+        Adjusts the polling rate after a cycle without a download.
+        """
+        if verdict is not None and not verdict.dialog_present:
+            self.scheduler.idle()  # Rejected by the cheap stages: nothing to react to
+        elif self.change_gate and self.change_gate.last_changed:
+            self.scheduler.activity()
+        else:
+            self.scheduler.idle()
+    
+    def run_pipelined(self):
+        """
+        Runs the monitoring loop as a pipeline (see pipeline.py): screen grabs on
+        a capture thread, detection on a detector thread working on the newest
+        frame, and the download flow on an actuator thread. Returns when a
+        stage fails (e.g. FailSafe, re-raised here) or on Ctrl+C.
+        """
+        cycle_count = 0
+        
+        def detect(frame):
+            nonlocal cycle_count
+            cycle_count += 1
+            cycle_start = self.clock.now()
+            self.metrics.counter("cycles").inc()
+            if cycle_count % 10 == 0:
+                self.log_cycle_stats(cycle_count)
+                self.log_pipeline_stats(cycle_count)
+            
+            button_pos, fallback, verdict = self.check_for_dialog(frame)
+            commands = []
+            if button_pos or fallback:
+                commands.append(lambda: self.download(button_pos, fallback))
+            else:
+                self.schedule_quiet_cycle(verdict)
+                if self.tab_janitor and self.tab_janitor.due(idle=True):
+                    commands.append(lambda: self.sweep_tabs(idle=True))
+            self.end_cycle()
+            self.metrics.gauge("cycle_ms").set((self.clock.now() - cycle_start) * 1000)
+            return commands
+        
+        self.pipeline = Pipeline(capture=lambda: self.capture_frame(regions=["manual_button", "dialog"]),
+                                 detect=detect, pace=lambda sleep: self.scheduler.wait(sleep=sleep))
+        self.pipeline.start()
+        try:
+            while self.running and not self.pipeline.wait(0.5):
+                pass
+        finally:
+            self.pipeline.stop()
+            self.log_pipeline_stats(cycle_count)
+            self.pipeline.join()  # Re-raises what stopped a stage (e.g. FailSafeException)
+    
+    def log_pipeline_stats(self, cycle_count: int):
+        """
+        Logs per-stage utilization and queue depths of the pipeline.
+        """
+        stats = self.pipeline.stats()
+        stages = ", ".join(f"{name} {stage['utilization']:.0%} ({stage['items']})"
+                           for name, stage in stats["stages"].items())
+        logger.debug(f"[Cycle {cycle_count}] Pipeline: busy {stages}; queued frames {stats['frame_queue']}, "
+                     f"commands {stats['command_queue']}; {stats['frames_replaced']} frames replaced, "
+                     f"{stats['stale_frames']} stale, {stats['dropped_commands']} commands dropped")
+    
     def run(self):
         """
         Main loop that monitors for Vortex download dialogs and automates them.
@@ -583,37 +1002,41 @@ class VortexAutoDownloader:
         logger.info("-" * 60)
         
         self.running = True
-        last_process_time = 0
-        cooldown = config.COOLDOWN_PERIOD
+        if self.metrics_exporter:
+            # The async runtime's metrics flusher rewrites the files itself
+            self.metrics_exporter.start(files=not config.ASYNC_RUNTIME_ENABLED)
         
         try:
+            if config.ASYNC_RUNTIME_ENABLED:
+                AsyncRuntime(self).run()
+                return
+            if config.PIPELINE_ENABLED:
+                self.run_pipelined()
+                return
             cycle_count = 0
             while self.running:
-                current_time = time.time()
                 cycle_count += 1
-                
-                # Check if we're in cooldown period
-                if current_time - last_process_time < cooldown:
-                    time.sleep(self.check_interval)
-                    continue
+                cycle_start = self.clock.now()
+                self.metrics.counter("cycles").inc()
                 
                 # Log status every 10 cycles
                 if cycle_count % 10 == 0:
-                    logger.debug(f"[Cycle {cycle_count}] Still monitoring...")
+                    self.log_cycle_stats(cycle_count)
                 
-                # Try to detect "Download manually" button on screen
-                button_pos = self.detect_button_on_screen("Download manually")
+                # Capture once; every detector in this cycle works on the same frame.
+                # Only the regions the detectors search are grabbed.
+                frame = self.capture_frame(regions=["manual_button", "dialog"])
                 
-                # Only process if we detected a button OR if we want to force-try with manual position
-                # (We'll try with manual position anyway, but only log it if detection found something)
-                if button_pos or cycle_count % 5 == 0:  # Try every 5 cycles with manual position
-                    logger.info("Attempting to process download...")
-                    if self.process_download(button_pos):
-                        last_process_time = current_time
-                        logger.info(f"Waiting {cooldown} seconds before next check...")
-                    # Don't log failure every cycle, only when we actually tried
+                button_pos, fallback, verdict = self.check_for_dialog(frame)
+                if button_pos or fallback:
+                    self.download(button_pos, fallback)
+                else:
+                    self.schedule_quiet_cycle(verdict)
+                    self.sweep_tabs(idle=True)
                 
-                time.sleep(self.check_interval)
+                self.end_cycle()
+                self.metrics.gauge("cycle_ms").set((self.clock.now() - cycle_start) * 1000)
+                self.scheduler.wait()
                 
         except KeyboardInterrupt:
             logger.info("\nReceived keyboard interrupt, stopping...")
@@ -623,6 +1046,19 @@ class VortexAutoDownloader:
             logger.error(f"Unexpected error: {e}", exc_info=True)
         finally:
             self.running = False
+            if self.debug_writer:
+                self.debug_writer.close()
+                writer = self.debug_writer.stats()
+                logger.info(f"Debug screenshots: {writer['written']} written, {writer['dropped']} dropped")
+            if self.frame_buffer:
+                self.frame_buffer.close()
+            if self.metrics_exporter:
+                self.metrics_exporter.stop()
+            for race in self.races.values():
+                race.close()
+            shutdown_thread_pool()
+            downloads = self.metrics.rate("downloads_per_hour").snapshot()
+            logger.info(f"Downloads: {downloads['total']} ({downloads['overall_per_hour']:.1f}/hour)")
             logger.info("=" * 60)
             logger.info("Vortex Auto Downloader Stopped")
             logger.info("=" * 60)
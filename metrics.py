@@ -0,0 +1,337 @@
+"""
+Counters, gauges and histograms for the Vortex Auto Downloader, and an
+exporter that publishes them as JSON and Prometheus text.
+
+Metrics are cheap to update from the monitoring loop (a lock and an add);
+all formatting and file/HTTP I/O happens on the exporter thread.
+"""
+
+import bisect
+import collections
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Default histogram buckets
+MS_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000)
+SECONDS_BUCKETS = (1, 2, 5, 10, 15, 20, 30, 45, 60, 90, 120, 300)
+
+
+class Counter:
+    """A value that only goes up."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str = ""):
+        self.name = name
+        self.help = help_text
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self) -> dict:
+        return {"value": self.value}
+
+
+class Gauge:
+    """A value that can go up and down, or is read from a function at export time."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str = "", function=None):
+        self.name = name
+        self.help = help_text
+        self.value = 0
+        self.function = function
+
+    def set(self, value: float):
+        self.value = value
+
+    def snapshot(self) -> dict:
+        if self.function is not None:
+            try:
+                self.value = self.function()
+            except Exception as e:
+                logger.debug(f"Gauge {self.name} failed: {e}")
+        return {"value": self.value}
+
+
+class Histogram:
+    """
+    Bucketed distribution (Prometheus style) plus a window of recent samples
+    for percentiles in the JSON export.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str = "", buckets: tuple = MS_BUCKETS, window: int = 1000):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self.bucket_counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.window = window
+        self.recent = []
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+            self.recent.append(value)
+            if len(self.recent) > self.window:
+                del self.recent[0]
+
+    def time(self, scale: float = 1000.0):
+        """
+        Context manager that observes the elapsed time of its block
+        (in milliseconds by default; scale=1 for seconds).
+        """
+        return _Timer(self, scale)
+
+    def percentile(self, q: float) -> float | None:
+        """Returns the q-th percentile (0-100) of the recent samples."""
+        with self._lock:
+            samples = sorted(self.recent)
+        if not samples:
+            return None
+        index = min(int(round(q / 100 * (len(samples) - 1))), len(samples) - 1)
+        return samples[index]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            cumulative = []
+            total = 0
+            for count in self.bucket_counts:
+                total += count
+                cumulative.append(total)
+            snapshot = {"count": self.count, "sum": self.sum,
+                        "buckets": dict(zip([*map(str, self.buckets), "+Inf"], cumulative))}
+        snapshot.update({"p50": self.percentile(50), "p95": self.percentile(95), "p99": self.percentile(99)})
+        return snapshot
+
+
+class Rate:
+    """
+    Events per hour, both since start and over a sliding window
+    (e.g. downloads/hour over the last hour).
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str = "", window: float = 3600.0):
+        self.name = name
+        self.help = help_text
+        self.window = window
+        self.started = time.monotonic()
+        self.total = 0
+        self._times = collections.deque()
+        self._lock = threading.Lock()
+
+    def mark(self):
+        """Records one event now."""
+        with self._lock:
+            now = time.monotonic()
+            self.total += 1
+            self._times.append(now)
+            self._trim(now)
+
+    def _trim(self, now: float):
+        while self._times and now - self._times[0] > self.window:
+            self._times.popleft()
+
+    def per_hour(self) -> float:
+        """Events per hour over the window (or since start, if that is shorter)."""
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            span = min(now - self.started, self.window)
+            return len(self._times) / span * 3600 if span > 0 else 0.0
+
+    def snapshot(self) -> dict:
+        elapsed = time.monotonic() - self.started
+        return {
+            "value": self.per_hour(),
+            "total": self.total,
+            "overall_per_hour": self.total / elapsed * 3600 if elapsed > 0 else 0.0,
+        }
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, scale: float):
+        self.histogram = histogram
+        self.scale = scale
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe((time.perf_counter() - self.start) * self.scale)
+        return False
+
+
+class MetricsRegistry:
+    """
+    Holds every metric by name. Asking for an existing name returns the same metric.
+    """
+
+    def __init__(self, prefix: str = "vortex_"):
+        self.prefix = prefix
+        self.metrics = {}
+        self.started = time.time()
+
+    def _get(self, cls, name: str, *args, **kwargs):
+        metric = self.metrics.get(name)
+        if metric is None:
+            metric = cls(name, *args, **kwargs)
+            self.metrics[name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str = "") -> Counter:
+        return self._get(Counter, name, help_text)
+
+    def gauge(self, name: str, help_text: str = "", function=None) -> Gauge:
+        return self._get(Gauge, name, help_text, function)
+
+    def histogram(self, name: str, help_text: str = "", buckets: tuple = MS_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help_text, buckets)
+
+    def rate(self, name: str, help_text: str = "", window: float = 3600.0) -> Rate:
+        return self._get(Rate, name, help_text, window)
+
+    def to_dict(self) -> dict:
+        """Returns every metric's current values, for the JSON export."""
+        return {
+            "timestamp": time.time(),
+            "uptime_seconds": time.time() - self.started,
+            "metrics": {name: {"type": m.kind, **m.snapshot()} for name, m in self.metrics.items()},
+        }
+
+    def to_prometheus(self) -> str:
+        """Returns every metric in the Prometheus text exposition format."""
+        lines = []
+        for name, metric in self.metrics.items():
+            full_name = self.prefix + name
+            if metric.help:
+                lines.append(f"# HELP {full_name} {metric.help}")
+            lines.append(f"# TYPE {full_name} {metric.kind}")
+            snapshot = metric.snapshot()
+            if metric.kind == "histogram":
+                for bound, count in snapshot["buckets"].items():
+                    lines.append(f'{full_name}_bucket{{le="{bound}"}} {count}')
+                lines.append(f"{full_name}_sum {snapshot['sum']}")
+                lines.append(f"{full_name}_count {snapshot['count']}")
+            else:
+                lines.append(f"{full_name} {snapshot['value']}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsExporter:
+    """
+    Periodically rewrites the metrics as a JSON file and a Prometheus text
+    file, and optionally serves them on a localhost HTTP endpoint
+    (/metrics for Prometheus, /metrics.json for JSON).
+    """
+
+    def __init__(self, registry: MetricsRegistry, directory=None, interval: float = None, http_port: int = None):
+        """
+        Args:
+            registry: Metrics to export
+            directory: Where metrics.json and metrics.prom are written (default: LOG_DIR)
+            interval: Seconds between file rewrites (default: METRICS_EXPORT_INTERVAL)
+            http_port: Localhost port for the HTTP endpoint; 0 disables it (default: METRICS_HTTP_PORT)
+        """
+        self.registry = registry
+        self.directory = Path(directory or config.LOG_DIR)
+        self.interval = config.METRICS_EXPORT_INTERVAL if interval is None else interval
+        self.http_port = config.METRICS_HTTP_PORT if http_port is None else http_port
+        self._stop = threading.Event()
+        self._thread = None
+        self._server = None
+
+    def start(self, files: bool = True):
+        """
+        Starts the file writer thread and, if configured, the HTTP endpoint.
+
+        Args:
+            files: Start the file writer thread; False when the caller rewrites
+                   the files itself with write_files()
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if files:
+            self._thread = threading.Thread(target=self._run, name="MetricsExporter", daemon=True)
+            self._thread.start()
+        if self.http_port:
+            self._start_http()
+
+    def _start_http(self):
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, content_type = registry.to_prometheus(), "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body, content_type = json.dumps(registry.to_dict(), indent=2), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass  # Keep scrapes out of the log
+
+        try:
+            self._server = ThreadingHTTPServer(("127.0.0.1", self.http_port), Handler)
+        except OSError as e:
+            logger.warning(f"Could not start metrics endpoint on port {self.http_port}: {e}")
+            return
+        threading.Thread(target=self._server.serve_forever, name="MetricsHTTP", daemon=True).start()
+        logger.info(f"Metrics served on http://127.0.0.1:{self.http_port}/metrics")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.write_files()
+
+    def write_files(self):
+        """Rewrites metrics.json and metrics.prom (atomically, via a temp file)."""
+        try:
+            self._write_atomic(self.directory / "metrics.json", json.dumps(self.registry.to_dict(), indent=2))
+            self._write_atomic(self.directory / "metrics.prom", self.registry.to_prometheus())
+        except Exception as e:
+            logger.debug(f"Could not write metrics: {e}")
+
+    @staticmethod
+    def _write_atomic(path: Path, text: str):
+        temp = path.with_suffix(path.suffix + ".tmp")
+        temp.write_text(text, encoding="utf-8")
+        os.replace(temp, path)
+
+    def stop(self):
+        """Writes the final values and stops the thread and HTTP endpoint."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(self.interval + 1)
+        self.write_files()
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
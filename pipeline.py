@@ -0,0 +1,275 @@
+"""
+Pipelined monitoring: capture, detection and actions on separate threads.
+
+In the plain loop a slow screen grab, a slow detector or a long click
+sequence holds up everything else. Pipeline splits a cycle into three
+stages connected by queues:
+
+    capture thread --(LatestQueue, 1 frame)--> detector thread --(FIFO)--> actuator thread
+
+- The frame queue holds a single frame and a newer frame replaces an
+  unread one, so the detector always works on the most recent screen and
+  never falls behind.
+- Commands (clicks, key presses, whole download flows) run strictly in the
+  order the detector issued them.
+- While the actuator is busy, the screen is about to change, so frames
+  captured before its last command finished are discarded unread.
+
+Each stage records how long it was busy; the utilization shows which
+stage limits throughput.
+"""
+
+import logging
+import queue
+import threading
+import time
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class LatestQueue:
+    """
+    Single-slot queue where a newer item replaces an unread one.
+    """
+
+    def __init__(self):
+        self._item = None
+        self._full = False
+        self._closed = False
+        self._condition = threading.Condition()
+        self.put_count = 0
+        self.replaced = 0  # Items overwritten before they were read
+
+    def put(self, item):
+        """Stores an item, dropping the unread one if there is one. Never blocks."""
+        with self._condition:
+            if self._full:
+                self.replaced += 1
+            self._item = item
+            self._full = True
+            self.put_count += 1
+            self._condition.notify()
+
+    def get(self, timeout: float = None):
+        """
+        Takes the item, waiting up to timeout seconds for one.
+
+        Returns:
+            The item, or None on timeout or once the queue is closed
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._full or self._closed, timeout):
+                return None
+            if not self._full:
+                return None
+            item, self._item, self._full = self._item, None, False
+            return item
+
+    def close(self):
+        """Wakes up every waiting get()."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def qsize(self) -> int:
+        return 1 if self._full else 0
+
+
+class StageStats:
+    """Busy time and item count of one pipeline stage."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0  # Seconds spent working (not waiting on a queue or sleeping)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.items += 1
+            self.busy += seconds
+
+
+class Pipeline:
+    """
+    Runs the capture, detector and actuator stages on their own threads.
+    """
+
+    def __init__(self, capture, detect, pace=None, command_queue_size: int = None, join_timeout: float = None):
+        """
+        Args:
+            capture: callable() -> frame (None skips the cycle); runs on the capture thread
+            detect: callable(frame) -> list of commands (callables, may be empty); runs on the
+                    detector thread
+            pace: callable(sleep) run after every capture to wait for the next one; sleep is a
+                  function(seconds) that returns early on shutdown. Default: 10 ms.
+            command_queue_size: Commands waiting for the actuator before new ones are dropped
+                                (default: PIPELINE_COMMAND_QUEUE_SIZE)
+            join_timeout: How long stop() waits for each thread (seconds, default: PIPELINE_JOIN_TIMEOUT)
+        """
+        self.capture = capture
+        self.detect = detect
+        self.pace = pace
+        self.join_timeout = config.PIPELINE_JOIN_TIMEOUT if join_timeout is None else join_timeout
+        self.frames = LatestQueue()
+        self.commands = queue.Queue(maxsize=config.PIPELINE_COMMAND_QUEUE_SIZE
+                                    if command_queue_size is None else command_queue_size)
+        self.stages = {name: StageStats(name) for name in ("capture", "detect", "actuate")}
+        self.stale_frames = 0      # Frames discarded because an action ran after they were captured
+        self.dropped_commands = 0  # Commands dropped because the command queue was full
+        self.error = None          # Exception that stopped the pipeline, re-raised by join()
+
+        self._stop = threading.Event()
+        self._generation = 0  # Bumped whenever a command finishes; frames carry the value at capture
+        self._pending = 0     # Commands queued or running
+        self._lock = threading.Lock()
+        self._started_at = None
+        self._stopped_at = None
+        self._threads = []
+
+    @property
+    def running(self) -> bool:
+        return self._started_at is not None and not self._stop.is_set()
+
+    def actuator_busy(self) -> bool:
+        """True while commands are queued or running."""
+        with self._lock:
+            return self._pending > 0
+
+    def start(self):
+        """Starts the three stage threads."""
+        self._started_at = time.perf_counter()
+        for name, target in (("capture", self._capture_loop), ("detect", self._detect_loop),
+                             ("actuate", self._actuate_loop)):
+            thread = threading.Thread(target=self._guard, args=(target,), name=f"pipeline-{name}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _guard(self, target):
+        """Runs a stage loop; an exception in any stage stops the whole pipeline."""
+        try:
+            target()
+        except BaseException as e:
+            if self.error is None:
+                self.error = e
+            logger.debug(f"Pipeline stage {threading.current_thread().name} stopped: {e!r}")
+            self._stop.set()
+            self.frames.close()
+
+    def _capture_loop(self):
+        stats = self.stages["capture"]
+        while not self._stop.is_set():
+            # No point grabbing a screen the actuator is about to change
+            if not self.actuator_busy():
+                start = time.perf_counter()
+                generation = self._generation
+                frame = self.capture()
+                stats.record(time.perf_counter() - start)
+                if frame is not None:
+                    self.frames.put((generation, frame))
+            if self.pace:
+                self.pace(self._stop.wait)
+            else:
+                self._stop.wait(0.01)
+
+    def _detect_loop(self):
+        stats = self.stages["detect"]
+        while not self._stop.is_set():
+            item = self.frames.get(timeout=0.5)
+            if item is None:
+                continue
+            generation, frame = item
+            if generation != self._generation or self.actuator_busy():
+                self.stale_frames += 1
+                continue
+            start = time.perf_counter()
+            commands = self.detect(frame) or []
+            stats.record(time.perf_counter() - start)
+            for command in commands:
+                self.submit(command)
+
+    def _actuate_loop(self):
+        stats = self.stages["actuate"]
+        while not self._stop.is_set():
+            try:
+                command = self.commands.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            start = time.perf_counter()
+            try:
+                command()
+            finally:
+                stats.record(time.perf_counter() - start)
+                with self._lock:
+                    self._pending -= 1
+                    self._generation += 1
+
+    def submit(self, command) -> bool:
+        """
+        Queues a command for the actuator thread.
+
+        Returns:
+            True if queued, False if dropped because the queue is full
+        """
+        with self._lock:
+            try:
+                self.commands.put_nowait(command)
+            except queue.Full:
+                self.dropped_commands += 1
+                logger.warning("Pipeline command queue full, dropped a command")
+                return False
+            self._pending += 1
+            return True
+
+    def wait(self, timeout: float = None) -> bool:
+        """
+        Blocks until the pipeline stops (a stage failed or stop() was called).
+
+        Returns:
+            True if it stopped, False on timeout
+        """
+        return self._stop.wait(timeout)
+
+    def stop(self):
+        """
+        Stops the threads and waits for them. A running command finishes
+        first; commands still queued are discarded.
+        """
+        if self._stopped_at is None:
+            self._stopped_at = time.perf_counter()
+        self._stop.set()
+        self.frames.close()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(self.join_timeout)
+                if thread.is_alive():
+                    logger.warning(f"{thread.name} did not stop within {self.join_timeout}s")
+
+    def join(self):
+        """
+        Stops the pipeline and re-raises the exception that stopped a stage, if any.
+        """
+        self.stop()
+        if self.error is not None:
+            raise self.error
+
+    def stats(self) -> dict:
+        """
+        Returns per-stage item counts and utilization (busy time over the
+        time the pipeline has been running), the queue depths, and the
+        frames and commands that were dropped.
+        """
+        end = self._stopped_at or time.perf_counter()
+        elapsed = end - self._started_at if self._started_at else 0.0
+        return {
+            "stages": {name: {"items": stage.items, "busy": stage.busy,
+                              "utilization": stage.busy / elapsed if elapsed else 0.0}
+                       for name, stage in self.stages.items()},
+            "frame_queue": self.frames.qsize(),
+            "command_queue": self.commands.qsize(),
+            "frames_replaced": self.frames.replaced,
+            "stale_frames": self.stale_frames,
+            "dropped_commands": self.dropped_commands,
+        }
@@ -0,0 +1,219 @@
+"""
+asyncio runtime for VortexAutoDownloader.
+
+The plain loop runs one download at a time and sleeps fixed amounts in
+between. AsyncRuntime splits the work into watcher coroutines that wait on
+each other's events:
+
+- dialog watcher: looks for the Vortex dialog and clicks 'Download manually'
+- browser watcher: waits for the Nexus Mods page, clicks 'Slow download'
+  and waits for the download to start
+- tab janitor: closes the download tabs (in batches with the TabJanitor)
+  and brings Vortex back
+- metrics flusher: writes the metrics files and logs the counters
+
+The first three each run their part of the downloader's DownloadFlow
+(run(start=..., stop=...) on one shared context), so a mod gets the same
+per-state timeouts, retries, timestamps and latency history as in the
+plain loop. Each watcher starts as soon as the previous one signals it,
+and the dialog watcher resumes polling as soon as Vortex is back in front
+instead of after a fixed cooldown. Every blocking call (screen capture,
+OpenCV, pyautogui, win32) runs on a thread pool, so the event loop itself
+never blocks. If any watcher fails, e.g. on a FailSafe that the
+downloader's click and tab-close steps re-raise through the flow, the
+others are cancelled and the exception is raised from run().
+"""
+
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+from download_flow import State
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncRuntime:
+    """
+    Runs a VortexAutoDownloader as concurrent watcher coroutines.
+    """
+
+    def __init__(self, downloader, workers: int = None, shutdown_timeout: float = None):
+        """
+        Args:
+            downloader: VortexAutoDownloader whose detectors and actions are used
+            workers: Threads for blocking calls (default: ASYNC_WORKERS)
+            shutdown_timeout: How long cancelled watchers get to finish (seconds,
+                              default: ASYNC_SHUTDOWN_TIMEOUT)
+        """
+        self.downloader = downloader
+        self.workers = config.ASYNC_WORKERS if workers is None else workers
+        self.shutdown_timeout = config.ASYNC_SHUTDOWN_TIMEOUT if shutdown_timeout is None else shutdown_timeout
+        self.executor = None
+        self.cycles = 0
+        self.downloads = 0
+        self.failures = 0
+
+        # Created in main(), inside the event loop
+        self.screen = None          # Held by whoever uses the screen and the input: a dialog check and the
+                                    # mod it starts (until mod_done), or an idle tab sweep
+        self.manual_clicked = None  # 'Download manually' was clicked: the browser watcher takes over
+        self.tab_done = None        # The download page is finished with: the tab janitor takes over
+        self.mod_done = None        # The mod is finished with (either way): the screen can be released
+        self._download_started = None  # Loop time when the current mod's dialog was detected
+        self._context = None  # DownloadFlow context of the current mod, shared by the watchers
+
+    def run(self):
+        """
+        Runs the watchers until one of them fails or Ctrl+C; the exception
+        that stopped them (KeyboardInterrupt, FailSafeException, ...) is re-raised.
+        """
+        asyncio.run(self.main())
+
+    async def main(self):
+        """
+        Starts the watchers and waits until one of them raises; its exception
+        is re-raised here once the others are cancelled.
+        """
+        self.screen = asyncio.Lock()
+        self.manual_clicked = asyncio.Event()
+        self.tab_done = asyncio.Event()
+        self.mod_done = asyncio.Event()
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="runtime")
+
+        watchers = [
+            asyncio.create_task(self.dialog_watcher(), name="dialog watcher"),
+            asyncio.create_task(self.browser_watcher(), name="browser watcher"),
+            asyncio.create_task(self.tab_janitor(), name="tab janitor"),
+            asyncio.create_task(self.metrics_flusher(), name="metrics flusher"),
+        ]
+        try:
+            done, _ = await asyncio.wait(watchers, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                if task.exception() is not None:
+                    logger.debug(f"{task.get_name()} stopped: {task.exception()!r}")
+                    raise task.exception()
+        finally:
+            for task in watchers:
+                task.cancel()
+            await asyncio.wait(watchers, timeout=self.shutdown_timeout)
+            # Blocking calls still running are left to finish on their own
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            logger.info(f"Async runtime: {self.cycles} cycles, {self.downloads} downloads, "
+                        f"{self.failures} failed")
+
+    async def call(self, func, *args):
+        """
+        Runs a blocking function on the thread pool and waits for it to finish.
+
+        There is deliberately no timeout: a click or key press abandoned on
+        its thread would overlap the next input. Time budgets are kept by
+        the DownloadFlow steps, which record overruns.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self.executor, functools.partial(func, *args))
+
+    async def dialog_watcher(self):
+        """
+        Polls for the Vortex dialog at the scheduler's rate and clicks
+        'Download manually', then holds the screen until the other watchers
+        are finished with the mod.
+        """
+        d = self.downloader
+        while True:
+            async with self.screen:
+                self.cycles += 1
+                cycle_start = d.clock.now()
+                d.metrics.counter("cycles").inc()
+
+                frame = await self.call(d.capture_frame, None, ["manual_button", "dialog"])
+                button_pos, fallback, verdict = await self.call(d.check_for_dialog, frame)
+                d.end_cycle()
+                d.metrics.gauge("cycle_ms").set((d.clock.now() - cycle_start) * 1000)
+
+                if button_pos or fallback:
+                    logger.info("Attempting to process download...")
+                    self._download_started = asyncio.get_running_loop().time()
+                    if d.change_gate:
+                        d.change_gate.invalidate()  # We are about to change the screen ourselves
+                    self.mod_done.clear()
+                    self._context = {"button_pos": button_pos, "allow_fallback": fallback or None}
+                    if await self.call(d.flow.run, self._context, State.DIALOG_SEEN, State.MANUAL_CLICKED):
+                        self.manual_clicked.set()
+                        await self.mod_done.wait()
+                    else:
+                        self._finish(False)
+                else:
+                    d.schedule_quiet_cycle(verdict)
+
+            await asyncio.sleep(d.scheduler.next_wait())
+
+    async def browser_watcher(self):
+        """
+        After each 'Download manually' click: waits for the 'Slow download'
+        button, clicks it and waits for the download to start (the flow from
+        ManualClicked up to DownloadConfirmed).
+        """
+        d = self.downloader
+        while True:
+            await self.manual_clicked.wait()
+            self.manual_clicked.clear()
+
+            if await self.call(d.flow.run, self._context, State.MANUAL_CLICKED, State.DOWNLOAD_CONFIRMED):
+                self.tab_done.set()
+            else:
+                self._finish(False)
+
+    async def tab_janitor(self):
+        """
+        Closes the download tab (the first one stays open) and brings
+        Vortex back, then lets the dialog watcher resume. With the
+        TabJanitor, tabs are only counted here and closed in batches,
+        including while the downloader is idle: an idle sweep takes the
+        screen like a dialog check does, so it never runs during one or
+        during a mod.
+        """
+        d = self.downloader
+        while True:
+            try:
+                await asyncio.wait_for(self.tab_done.wait(), config.WAIT_POLL_INTERVAL * 4)
+            except asyncio.TimeoutError:
+                if d.tab_janitor and d.tab_janitor.due(idle=True):
+                    async with self.screen:
+                        if d.tab_janitor.due(idle=True):  # A mod may have run while we waited
+                            await self.call(d.sweep_tabs, True)
+                continue
+            self.tab_done.clear()
+            self._finish(await self.call(d.flow.run, self._context, State.DOWNLOAD_CONFIRMED))
+
+    async def metrics_flusher(self):
+        """
+        Rewrites the metrics files and logs the counters every
+        METRICS_EXPORT_INTERVAL seconds.
+        """
+        d = self.downloader
+        while True:
+            await asyncio.sleep(config.METRICS_EXPORT_INTERVAL)
+            if d.metrics_exporter:
+                await self.call(d.metrics_exporter.write_files)
+            d.log_cycle_stats(self.cycles)
+
+    def _finish(self, success: bool):
+        """
+        Records the outcome of one mod and hands the screen back to the dialog watcher.
+        """
+        d = self.downloader
+        elapsed = asyncio.get_running_loop().time() - self._download_started
+        d.metrics.histogram("download_seconds").observe(elapsed)
+        d.report_download(success)
+        if success:
+            self.downloads += 1
+            logger.info(f"Mod finished in {elapsed:.1f}s")
+            # Vortex is back in front and the dialog is gone: poll fast for the next one right away
+            d.scheduler.download_finished(cooldown=0)
+        else:
+            self.failures += 1
+            d.schedule_failed_download()
+        self._context = None
+        self.mod_done.set()
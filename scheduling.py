@@ -0,0 +1,198 @@
+"""
+Timing for the monitoring loop: clocks and the adaptive polling scheduler.
+
+Everything that sleeps or reads the time goes through a clock object, so the
+schedule can be driven by FakeClock in tests and benchmarks.
+"""
+
+import logging
+import time
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class SystemClock:
+    """Real time: time.monotonic() and time.sleep()."""
+
+    def now(self) -> float:
+        return time.monotonic()
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            time.sleep(seconds)
+
+
+class FakeClock:
+    """
+    Manual clock for tests: sleep() advances the time instantly and is recorded.
+    """
+
+    def __init__(self, start: float = 0.0):
+        self.time = start
+        self.sleeps = []  # Every sleep() duration, in order
+
+    def now(self) -> float:
+        return self.time
+
+    def sleep(self, seconds: float):
+        seconds = max(seconds, 0.0)
+        self.sleeps.append(seconds)
+        self.time += seconds
+
+    def advance(self, seconds: float):
+        """Moves time forward without recording a sleep."""
+        self.time += seconds
+
+
+def wait_until(predicate, timeout: float, poll: float = None, clock=None):
+    """
+    Polls a condition until it holds or the timeout expires.
+
+    The predicate is always evaluated at least once, so a condition that is
+    already true returns without sleeping.
+
+    Args:
+        predicate: Callable returning a truthy value once the condition holds
+        timeout: Longest time to wait (seconds)
+        poll: Time between evaluations (seconds); defaults to WAIT_POLL_INTERVAL
+        clock: Clock with now() and sleep(); defaults to SystemClock
+
+    Returns:
+        The first truthy value returned by the predicate, or None on timeout
+    """
+    clock = clock or SystemClock()
+    poll = config.WAIT_POLL_INTERVAL if poll is None else poll
+    deadline = clock.now() + timeout
+
+    while True:
+        result = predicate()
+        if result:
+            return result
+        remaining = deadline - clock.now()
+        if remaining <= 0:
+            return None
+        clock.sleep(min(poll, remaining))
+
+
+class PollScheduler:
+    """
+    Decides how long the monitoring loop sleeps between cycles.
+
+    - Idle: the interval starts at base_interval and grows by the backoff
+      factor every quiet cycle, up to max_interval.
+    - Activity (the screen changed): back to base_interval.
+    - Download finished: the whole cooldown is slept in one wait, then the
+      loop polls at fast_interval for fast_window seconds, since that is
+      when the next Vortex dialog usually shows up.
+    - Back off (an attempt failed in a way that would just repeat): one long
+      wait, then the base rate; any fast-polling window is cancelled.
+    """
+
+    def __init__(self, clock=None, base_interval: float = None, max_interval: float = None,
+                 backoff: float = None, fast_interval: float = None, fast_window: float = None,
+                 cooldown: float = None):
+        """
+        Args:
+            clock: Clock with now() and sleep(); defaults to SystemClock
+            base_interval: Normal polling interval (seconds)
+            max_interval: Longest idle interval (seconds)
+            backoff: Interval growth factor per idle cycle
+            fast_interval: Polling interval right after a download (seconds)
+            fast_window: How long fast polling lasts after the cooldown (seconds)
+            cooldown: Pause after a finished download (seconds)
+        """
+        self.clock = clock or SystemClock()
+        self.base_interval = config.CHECK_INTERVAL if base_interval is None else base_interval
+        self.max_interval = config.IDLE_MAX_INTERVAL if max_interval is None else max_interval
+        self.backoff = config.IDLE_BACKOFF if backoff is None else backoff
+        self.fast_interval = config.FAST_POLL_INTERVAL if fast_interval is None else fast_interval
+        self.fast_window = config.FAST_POLL_WINDOW if fast_window is None else fast_window
+        self.cooldown = config.COOLDOWN_PERIOD if cooldown is None else cooldown
+
+        self.interval = self.base_interval
+        self.cooldown_until = None
+        self.fast_until = None
+        self.wakeups = 0
+        self.slept = 0.0
+
+    def in_cooldown(self) -> bool:
+        """True while the post-download cooldown is running."""
+        return self.cooldown_until is not None and self.clock.now() < self.cooldown_until
+
+    def idle(self):
+        """Records a quiet cycle: polling slows down."""
+        self.interval = min(self.interval * self.backoff, self.max_interval)
+
+    def activity(self):
+        """Records that the screen changed: polling goes back to the base rate."""
+        self.interval = self.base_interval
+
+    def download_finished(self, cooldown: float = None):
+        """
+        Starts the cooldown, followed by the fast-polling window.
+
+        Args:
+            cooldown: Overrides the configured cooldown (seconds), e.g. 0 when
+                      the caller already knows the screen has settled
+        """
+        now = self.clock.now()
+        self.cooldown_until = now + (self.cooldown if cooldown is None else cooldown)
+        self.fast_until = self.cooldown_until + self.fast_window
+        self.interval = self.base_interval
+
+    def back_off(self, delay: float):
+        """
+        Pauses polling after a failed attempt, so it is not retried every fast-poll cycle.
+
+        Args:
+            delay: Seconds until the next cycle
+        """
+        self.cooldown_until = self.clock.now() + delay
+        self.fast_until = None
+        self.interval = self.base_interval
+
+    def next_delay(self) -> float:
+        """
+        Returns how long to sleep before the next cycle (seconds).
+        """
+        now = self.clock.now()
+        if self.cooldown_until is not None and now < self.cooldown_until:
+            return self.cooldown_until - now
+        if self.fast_until is not None and now < self.fast_until:
+            return self.fast_interval
+        return self.interval
+
+    def wait(self, sleep=None) -> float:
+        """
+        Sleeps until the next cycle is due.
+
+        Args:
+            sleep: Optional function(seconds) used instead of the clock's sleep,
+                   e.g. an Event.wait that returns early on shutdown
+
+        Returns:
+            The time slept (seconds)
+        """
+        delay = self.next_wait()
+        (sleep or self.clock.sleep)(delay)
+        return delay
+
+    def next_wait(self) -> float:
+        """
+        Returns the delay before the next cycle and counts it as slept, for
+        callers that do the sleeping themselves (e.g. with asyncio.sleep).
+        """
+        delay = self.next_delay()
+        self.wakeups += 1
+        self.slept += delay
+        return delay
+
+    def stats(self) -> dict:
+        """Returns wake-up and sleep counters."""
+        return {
+            "wakeups": self.wakeups,
+            "slept": self.slept,
+            "interval": self.interval,
+        }
@@ -0,0 +1,213 @@
+"""
+Several detection strategies raced on the same frame.
+
+Each button can be found in more than one way: color blobs
+(ButtonDetector), a captured template (TemplateMatcher), or a search
+around its last known position (LocationTracker). DetectionRace runs the
+strategies for one button concurrently and returns as soon as one of them
+clears its own confidence bar; strategies that have not started by then
+are cancelled. If none does, the detections they did make are fused by
+weighted voting: strategies that agree on a position add up.
+
+Strategies only look at the frame. Anything stateful, such as confirming
+the winner with the LocationTracker, is left to the caller, on its own
+thread, once the race is decided.
+
+Which strategy decided, and how long each one took, is recorded for the
+logs and the metrics.
+"""
+
+import logging
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class Detection:
+    """A button found by one strategy (or by fusing several), in screen coordinates."""
+
+    def __init__(self, x: int, y: int, width: int, height: int, confidence: float, strategy: str):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.bbox = (x - width // 2, y - height // 2, x - width // 2 + width, y - height // 2 + height)
+        self.confidence = confidence
+        self.strategy = strategy
+
+    @classmethod
+    def of(cls, found, strategy: str) -> "Detection | None":
+        """
+        Wraps a button_detector.Candidate or templates.TemplateMatch
+        (anything with x, y, width, height and confidence); None stays None.
+        """
+        if found is None:
+            return None
+        detection = cls(found.x, found.y, found.width, found.height, found.confidence, strategy)
+        detection.bbox = getattr(found, "bbox", detection.bbox)
+        return detection
+
+    def as_tuple(self) -> tuple:
+        """Returns (x, y, area, aspect_ratio), the format of the button detectors."""
+        return (self.x, self.y, self.width * self.height, self.width / self.height if self.height else 0)
+
+    def __repr__(self):
+        return (f"Detection({self.strategy}: ({self.x}, {self.y}), {self.width}x{self.height}, "
+                f"confidence {self.confidence:.2f})")
+
+
+class Strategy:
+    """
+    One way of finding a button.
+    """
+
+    def __init__(self, name: str, find, threshold: float, weight: float = 1.0):
+        """
+        Args:
+            name: Strategy name for logs and stats ("color", "template", "prior")
+            find: callable(frame) -> Detection or None
+            threshold: Confidence at which this strategy alone decides the race
+            weight: Vote weight when detections are fused
+        """
+        self.name = name
+        self.find = find
+        self.threshold = threshold
+        self.weight = weight
+
+
+class DetectionRace:
+    """
+    Runs a button's strategies concurrently on one frame.
+    """
+
+    def __init__(self, name: str, strategies: list, early_exit: bool = None, fuse_threshold: float = None,
+                 fuse_radius: int = None, timeout: float = None, history: int = 200):
+        """
+        Args:
+            name: Button name for logging
+            strategies: List of Strategy
+            early_exit: Return the first detection that clears its strategy's threshold
+                        (default: DETECTION_RACE_EARLY_EXIT); otherwise always fuse
+            fuse_threshold: Smallest fused score accepted (default: DETECTION_FUSE_THRESHOLD)
+            fuse_radius: Detections whose centers are this close (pixels) vote together
+                         (default: DETECTION_FUSE_RADIUS)
+            timeout: Longest wait for the strategies (seconds, default: DETECTION_RACE_TIMEOUT);
+                     slower ones are left out of the vote
+            history: Timings kept per strategy for the stats
+        """
+        self.name = name
+        self.strategies = strategies
+        self.early_exit = config.DETECTION_RACE_EARLY_EXIT if early_exit is None else early_exit
+        self.fuse_threshold = config.DETECTION_FUSE_THRESHOLD if fuse_threshold is None else fuse_threshold
+        self.fuse_radius = config.DETECTION_FUSE_RADIUS if fuse_radius is None else fuse_radius
+        self.timeout = config.DETECTION_RACE_TIMEOUT if timeout is None else timeout
+        self.pool = ThreadPoolExecutor(max_workers=max(len(strategies), 1), thread_name_prefix=f"race-{name}")
+        self.wins = {strategy.name: 0 for strategy in strategies}
+        self.wins.update(fused=0, none=0)
+        self.timings = {strategy.name: deque(maxlen=history) for strategy in strategies}  # ms
+        self.race_times = deque(maxlen=history)  # ms until the race was decided
+        self.last_winner = None
+
+    def _timed(self, strategy: Strategy, frame) -> Detection | None:
+        start = time.perf_counter()
+        try:
+            return strategy.find(frame)
+        except Exception as e:
+            logger.debug(f"[{self.name}] Strategy '{strategy.name}' failed: {e}")
+            return None
+        finally:
+            self.timings[strategy.name].append((time.perf_counter() - start) * 1000)
+
+    def run(self, frame) -> Detection | None:
+        """
+        Races the strategies on the frame.
+
+        Returns:
+            The winning Detection (strategy "fused" when decided by voting), or None
+        """
+        start = time.perf_counter()
+        pending = {self.pool.submit(self._timed, strategy, frame): strategy for strategy in self.strategies}
+        found = []  # (Strategy, Detection)
+        deadline = start + self.timeout
+        winner = None
+
+        while pending and winner is None:
+            done, _ = wait(pending, timeout=max(deadline - time.perf_counter(), 0), return_when=FIRST_COMPLETED)
+            if not done:
+                logger.debug(f"[{self.name}] Strategies timed out: {', '.join(s.name for s in pending.values())}")
+                break
+            for future in done:
+                strategy = pending.pop(future)
+                detection = future.result()
+                if detection is None:
+                    continue
+                found.append((strategy, detection))
+                if self.early_exit and detection.confidence >= strategy.threshold:
+                    winner = detection
+                    break
+
+        # The race is decided: strategies that have not started are dropped (running ones cannot be stopped)
+        for future in pending:
+            future.cancel()
+        if winner is None:
+            winner = self.fuse(found)
+        self.race_times.append((time.perf_counter() - start) * 1000)
+        self.last_winner = winner.strategy if winner else "none"
+        self.wins[self.last_winner] += 1
+        if winner:
+            logger.debug(f"[{self.name}] {winner} decided after {self.race_times[-1]:.1f} ms")
+        return winner
+
+    def fuse(self, found: list) -> Detection | None:
+        """
+        Weighted vote over the detections made. Each detection votes
+        weight x confidence for every detection within fuse_radius of it;
+        the best-supported group wins if its share of the total weight of
+        all the race's strategies (including those that found nothing, or
+        did not finish) reaches fuse_threshold. A lone weak detection
+        therefore cannot win the vote on its own.
+        The fused position is the vote-weighted mean of the group.
+        """
+        if not found:
+            return None
+        total = sum(strategy.weight for strategy in self.strategies)
+        best_group, best_score = None, 0.0
+        for _, anchor in found:
+            group = [(s, d) for s, d in found
+                     if abs(d.x - anchor.x) <= self.fuse_radius and abs(d.y - anchor.y) <= self.fuse_radius]
+            score = sum(s.weight * d.confidence for s, d in group) / total
+            if score > best_score:
+                best_group, best_score = group, score
+
+        if best_score < self.fuse_threshold:
+            logger.debug(f"[{self.name}] Fused score {best_score:.2f} is below {self.fuse_threshold}")
+            return None
+        votes = np.array([s.weight * d.confidence for s, d in best_group])
+        x = int(round(np.average([d.x for _, d in best_group], weights=votes)))
+        y = int(round(np.average([d.y for _, d in best_group], weights=votes)))
+        _, anchor = max(best_group, key=lambda item: item[1].confidence)
+        return Detection(x, y, anchor.width, anchor.height, best_score, "fused")
+
+    def stats(self) -> dict:
+        """
+        Returns the wins per strategy ("fused" and "none" included), each
+        strategy's median run time, and the median time to a decision (ms).
+        """
+        def median(values):
+            return float(np.median(values)) if values else 0.0
+
+        return {
+            "wins": dict(self.wins),
+            "p50_ms": {name: median(times) for name, times in self.timings.items()},
+            "decision_p50_ms": median(self.race_times),
+        }
+
+    def close(self):
+        """Stops the strategy threads."""
+        self.pool.shutdown(wait=False)
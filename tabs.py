@@ -0,0 +1,111 @@
+"""
+Batched closing of the browser tabs the downloads leave behind.
+
+Closing each download tab right away costs a focus switch to the browser,
+a Ctrl+W and a switch back to Vortex on every mod. TabJanitor instead
+counts the confirmed download tabs and closes them several at a time,
+with one focus switch and one Ctrl+W per tab:
+
+- when batch_size tabs can be closed,
+- when max_open tabs are open (to keep the browser's memory bounded),
+- or when the downloader has been idle for idle_after seconds.
+
+The oldest keep_open tabs are never closed, so the browser window stays
+open and ready for the next download. Ctrl+W closes the active tab, and
+after closing the last tab the browser activates the one before it, so a
+batch removes the newest tabs.
+"""
+
+import logging
+
+import config
+from scheduling import SystemClock
+
+logger = logging.getLogger(__name__)
+
+
+class TabJanitor:
+    """
+    Tracks open download tabs and decides when to close them in a batch.
+    """
+
+    def __init__(self, close_tabs, batch_size: int = None, max_open: int = None, idle_after: float = None,
+                 keep_open: int = None, clock=None):
+        """
+        Args:
+            close_tabs: callable(count) -> bool; focuses the browser once, closes count tabs
+                        and brings Vortex back
+            batch_size: Close once this many tabs can be closed (default: TAB_JANITOR_BATCH_SIZE)
+            max_open: Close right away once this many tabs are open (default: TAB_JANITOR_MAX_OPEN)
+            idle_after: Close what is open after this long without a new tab (seconds,
+                        default: TAB_JANITOR_IDLE_AFTER)
+            keep_open: Oldest tabs that are never closed (default: TAB_JANITOR_KEEP_OPEN)
+            clock: Clock with now(); defaults to SystemClock
+        """
+        self.close_tabs = close_tabs
+        self.batch_size = config.TAB_JANITOR_BATCH_SIZE if batch_size is None else batch_size
+        self.max_open = config.TAB_JANITOR_MAX_OPEN if max_open is None else max_open
+        self.idle_after = config.TAB_JANITOR_IDLE_AFTER if idle_after is None else idle_after
+        self.keep_open = config.TAB_JANITOR_KEEP_OPEN if keep_open is None else keep_open
+        self.clock = clock or SystemClock()
+        self.open_tabs = 0
+        self.last_opened = None  # When the newest tab was counted
+        self.closed = 0          # Tabs closed in total
+        self.batches = 0         # Focus switches spent closing them
+        self.failed_batches = 0
+
+    @property
+    def closable(self) -> int:
+        """Tabs that may be closed now."""
+        return max(self.open_tabs - self.keep_open, 0)
+
+    def opened(self):
+        """Counts a confirmed download tab."""
+        self.open_tabs += 1
+        self.last_opened = self.clock.now()
+
+    def due(self, idle: bool = False) -> bool:
+        """
+        Whether a batch should be closed now.
+
+        Args:
+            idle: The downloader is between mods (no dialog or page being worked on)
+        """
+        if not self.closable:
+            return False
+        if self.closable >= self.batch_size or self.open_tabs >= self.max_open:
+            return True
+        return idle and self.clock.now() - self.last_opened >= self.idle_after
+
+    def sweep(self, idle: bool = False) -> int:
+        """
+        Closes the closable tabs in one batch if one is due.
+
+        Args:
+            idle: The downloader is between mods
+
+        Returns:
+            Number of tabs closed (0 if no batch was due or closing failed)
+        """
+        if not self.due(idle):
+            return 0
+        count = self.closable
+        reason = "idle" if idle and count < self.batch_size and self.open_tabs < self.max_open else "batch"
+        logger.info(f"Closing {count} browser tab(s) ({reason}, {self.open_tabs} open)")
+        if not self.close_tabs(count):
+            self.failed_batches += 1
+            return 0
+        self.open_tabs -= count
+        self.closed += count
+        self.batches += 1
+        return count
+
+    def stats(self) -> dict:
+        """Returns the open-tab count and how many tabs and batches were closed."""
+        return {
+            "open": self.open_tabs,
+            "closed": self.closed,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "tabs_per_batch": self.closed / self.batches if self.batches else 0.0,
+        }
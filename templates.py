@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Template matching for the "Download manually" and "Slow download" buttons.
+
+A template is a crop of the button, captured once from the live screen or
+a recorded frame, saved with the screen size it came from. For the current
+screen size the template is scaled into a small pyramid (a few scales
+around the expected size, each at full and coarse resolution). Pyramids
+are cached on disk, so later runs at the same resolution load them instead
+of resizing again.
+
+Matching runs cv2.matchTemplate on a downscaled search region first, then
+refines the best hit at full resolution in a small window around it. Only
+matches scoring at least CONFIDENCE_THRESHOLD are reported.
+
+Usage:
+    python templates.py capture manual_button                  (live screen)
+    python templates.py capture slow_download --frame shot.png
+    python templates.py capture manual_button --frame shot.png --bbox 254 410 482 449
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import math
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+from PIL import Image
+
+import config
+import detection
+from capture import Frame, ImageGrabBackend, percent_to_bbox
+
+logger = logging.getLogger(__name__)
+
+# Button text (as passed to find_text_on_screen) -> template name
+TEXT_TEMPLATES = {
+    "download manually": "manual_button",
+    "slow download": "slow_download",
+}
+
+
+def template_name(text: str) -> str | None:
+    """Returns the template name for a button text, or None if there is no template for it."""
+    return TEXT_TEMPLATES.get(text.strip().lower())
+
+
+class TemplateMatch:
+    """A template found on screen, in screen coordinates."""
+
+    def __init__(self, x: int, y: int, width: int, height: int, confidence: float, scale: float):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.confidence = confidence
+        self.scale = scale  # Template scale relative to the size it was captured at
+
+    def __repr__(self):
+        return f"TemplateMatch(({self.x}, {self.y}), {self.width}x{self.height}, confidence {self.confidence:.2f})"
+
+
+class TemplatePyramid:
+    """
+    A template scaled for one screen size: per scale, a full-resolution and a coarse version.
+    """
+
+    def __init__(self, scales: list, full: list, coarse: list):
+        self.scales = scales
+        self.full = full
+        self.coarse = coarse
+
+    def save(self, path: Path):
+        arrays = {"scales": np.array(self.scales)}
+        for i, (full, coarse) in enumerate(zip(self.full, self.coarse)):
+            arrays[f"full_{i}"] = full
+            arrays[f"coarse_{i}"] = coarse
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path: Path) -> "TemplatePyramid":
+        with np.load(path) as data:
+            scales = data["scales"].tolist()
+            return cls(scales, [data[f"full_{i}"] for i in range(len(scales))],
+                       [data[f"coarse_{i}"] for i in range(len(scales))])
+
+
+class TemplateMatcher:
+    """
+    Finds button templates in frames, with scaled pyramids cached per screen size.
+    """
+
+    def __init__(self, directory=None, threshold: float = None, scales: tuple = None,
+                 coarse_factor: float = None, dpi_scale: float = None):
+        """
+        Args:
+            directory: Where templates live (default: TEMPLATE_DIR); the cache is its "cache" subfolder
+            threshold: Minimum match score, 0-1 (default: CONFIDENCE_THRESHOLD)
+            scales: Scales tried around the expected size (default: TEMPLATE_SCALES)
+            coarse_factor: Downscale factor of the coarse search (default: TEMPLATE_COARSE_FACTOR)
+            dpi_scale: Display scaling relative to when the templates were captured (default: TEMPLATE_DPI_SCALE)
+        """
+        self.directory = Path(directory or config.TEMPLATE_DIR)
+        self.cache_dir = self.directory / "cache"
+        self.threshold = config.CONFIDENCE_THRESHOLD if threshold is None else threshold
+        self.scales = tuple(config.TEMPLATE_SCALES if scales is None else scales)
+        self.coarse_factor = config.TEMPLATE_COARSE_FACTOR if coarse_factor is None else coarse_factor
+        self.dpi_scale = config.TEMPLATE_DPI_SCALE if dpi_scale is None else dpi_scale
+        self.coarse_slack = 0.2  # Coarse scores run lower (blur), so candidates only need threshold - slack
+        self._pyramids = {}  # (name, screen_size) -> TemplatePyramid
+        self._missing = set()  # Templates already reported as missing
+
+    def template_path(self, name: str) -> Path:
+        return self.directory / f"{name}.png"
+
+    def available(self, name: str) -> bool:
+        """True if a template was captured for this button."""
+        return self.template_path(name).exists()
+
+    def save_template(self, name: str, pixels: np.ndarray, screen_size: tuple):
+        """
+        Saves a button template.
+
+        Args:
+            name: Template name (e.g. "manual_button")
+            pixels: RGB crop of the button
+            screen_size: (width, height) of the screen the crop was taken from
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        Image.fromarray(pixels).save(self.template_path(name))
+        with open(self.directory / f"{name}.json", "w") as f:
+            json.dump({"screen_size": list(screen_size)}, f)
+        self._pyramids = {key: p for key, p in self._pyramids.items() if key[0] != name}
+        self._missing.discard(name)
+        logger.info(f"Saved template '{name}' ({pixels.shape[1]}x{pixels.shape[0]}) to {self.template_path(name)}")
+
+    def pyramid(self, name: str, screen_size: tuple) -> TemplatePyramid | None:
+        """
+        Returns the template pyramid for this screen size: from memory, from
+        the disk cache, or built (and cached) from the template.
+        """
+        key = (name, tuple(screen_size))
+        pyramid = self._pyramids.get(key)
+        if pyramid is not None:
+            return pyramid
+
+        path = self.template_path(name)
+        if not path.exists():
+            if name not in self._missing:
+                logger.warning(f"No template for '{name}' - run: python templates.py capture {name}")
+                self._missing.add(name)
+            return None
+
+        template_bytes = path.read_bytes()
+        meta_path = self.directory / f"{name}.json"
+        source_size = json.loads(meta_path.read_text())["screen_size"] if meta_path.exists() else screen_size
+        digest = hashlib.sha1(template_bytes + repr((source_size, self.scales, self.coarse_factor,
+                                                     self.dpi_scale)).encode()).hexdigest()[:12]
+        cache_path = self.cache_dir / f"{name}_{screen_size[0]}x{screen_size[1]}_{digest}.npz"
+
+        if cache_path.exists():
+            try:
+                pyramid = TemplatePyramid.load(cache_path)
+            except Exception as e:
+                logger.debug(f"Could not load template cache {cache_path}: {e}")
+        if pyramid is None:
+            gray = cv2.cvtColor(np.array(Image.open(path).convert("RGB")), cv2.COLOR_RGB2GRAY)
+            pyramid = self._build(gray, screen_size[1] / source_size[1] * self.dpi_scale)
+            try:
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                pyramid.save(cache_path)
+            except OSError as e:
+                logger.debug(f"Could not write template cache {cache_path}: {e}")
+            logger.debug(f"Built template pyramid '{name}' for {screen_size[0]}x{screen_size[1]}")
+
+        self._pyramids[key] = pyramid
+        return pyramid
+
+    def _build(self, gray: np.ndarray, base_scale: float) -> TemplatePyramid:
+        """Resizes the template to every scale, at full and coarse resolution."""
+        scales, full, coarse = [], [], []
+        height, width = gray.shape
+        for scale in self.scales:
+            s = base_scale * scale
+            w, h = round(width * s), round(height * s)
+            cw, ch = round(w * self.coarse_factor), round(h * self.coarse_factor)
+            if cw < 8 or ch < 4:
+                continue
+            interpolation = cv2.INTER_AREA if s < 1 else cv2.INTER_LINEAR
+            scaled = cv2.resize(gray, (w, h), interpolation=interpolation)
+            scales.append(s)
+            full.append(scaled)
+            coarse.append(cv2.resize(scaled, (cw, ch), interpolation=cv2.INTER_AREA))
+        return TemplatePyramid(scales, full, coarse)
+
+    def match(self, frame: Frame, name: str, region: tuple = None) -> TemplateMatch | None:
+        """
+        Looks for a template in the frame.
+
+        Args:
+            frame: Captured screen
+            name: Template name
+            region: Optional (x1, y1, x2, y2) box in screen pixels where the button
+                    should be; defaults to its search region from detection.search_regions()
+
+        Returns:
+            The best TemplateMatch scoring at least the threshold, or None
+        """
+        pyramid = self.pyramid(name, frame.screen_size)
+        if pyramid is None or not pyramid.scales:
+            return None
+
+        if region is None:
+            region = percent_to_bbox(detection.search_regions()[name], frame.screen_size)
+        left, top = frame.to_screen(0, 0)
+        x1, y1, x2, y2 = region
+        # The region says where the button center can be; widen it so the whole template fits
+        pad_y, pad_x = (size // 2 + 1 for size in pyramid.full[-1].shape)
+        x1, y1, x2, y2 = x1 - pad_x, y1 - pad_y, x2 + pad_x, y2 + pad_y
+        search_box = (max(x1 - left, 0), max(y1 - top, 0), min(x2 - left, frame.width), min(y2 - top, frame.height))
+        gray = frame.roi(search_box, "gray")
+        if gray.size == 0:
+            return None
+
+        # Coarse pass: every scale on the downscaled region
+        f = self.coarse_factor
+        small = cv2.resize(gray, None, fx=f, fy=f, interpolation=cv2.INTER_AREA)
+        hits = []  # (score, scale index, location)
+        for i, template in enumerate(pyramid.coarse):
+            if template.shape[0] > small.shape[0] or template.shape[1] > small.shape[1]:
+                continue
+            scores = np.nan_to_num(cv2.matchTemplate(small, template, cv2.TM_CCOEFF_NORMED))
+            _, score, _, location = cv2.minMaxLoc(scores)
+            if score >= self.threshold - self.coarse_slack:
+                hits.append((score, i, location))
+
+        # Fine pass: the two best scales (the true size is often between two) at
+        # full resolution, each in a small window around its coarse hit
+        best = None
+        margin = math.ceil(2 / f) + 2
+        for _, i, (cx, cy) in sorted(hits, reverse=True)[:2]:
+            template = pyramid.full[i]
+            th, tw = template.shape
+            wx1, wy1 = max(int(cx / f) - margin, 0), max(int(cy / f) - margin, 0)
+            wx2, wy2 = min(int(cx / f) + tw + margin, gray.shape[1]), min(int(cy / f) + th + margin, gray.shape[0])
+            window = gray[wy1:wy2, wx1:wx2]
+            if window.shape[0] < th or window.shape[1] < tw:
+                continue
+            scores = np.nan_to_num(cv2.matchTemplate(window, template, cv2.TM_CCOEFF_NORMED))
+            _, score, _, (mx, my) = cv2.minMaxLoc(scores)
+            if best is None or score > best.confidence:
+                x, y = frame.to_screen(search_box[0] + wx1 + mx + tw // 2, search_box[1] + wy1 + my + th // 2)
+                best = TemplateMatch(x, y, tw, th, float(score), pyramid.scales[i])
+
+        if best is not None and not (region[0] <= best.x <= region[2] and region[1] <= best.y <= region[3]):
+            logger.debug(f"Template '{name}' best match at ({best.x}, {best.y}) is outside its region")
+            return None
+        if best is None or best.confidence < self.threshold:
+            if best is not None:
+                logger.debug(f"Template '{name}' best score {best.confidence:.2f} is below {self.threshold}")
+            return None
+        return best
+
+
+def capture_template(matcher: TemplateMatcher, name: str, frame: Frame, bbox: tuple = None, margin: int = 4) -> bool:
+    """
+    Cuts a button template out of a frame and saves it.
+
+    Args:
+        matcher: Matcher whose template directory receives the template
+        name: "manual_button" or "slow_download"
+        frame: Full-screen frame showing the button
+        bbox: (x1, y1, x2, y2) of the button in frame pixels; found with the
+              color detector if not given
+        margin: Pixels of surrounding background kept around a detected button
+
+    Returns:
+        True if a template was saved
+    """
+    if bbox is None:
+        candidates = detection.detect_buttons(frame, name, limit=1)
+        if not candidates:
+            logger.error(f"Could not find '{name}' in the frame - pass --bbox")
+            return False
+        x1, y1, x2, y2 = candidates[0].bbox
+        left, top = frame.to_screen(0, 0)
+        bbox = (x1 - left - margin, y1 - top - margin, x2 - left + margin, y2 - top + margin)
+    x1, y1, x2, y2 = bbox
+    pixels = frame.rgb[max(y1, 0):y2, max(x1, 0):x2]
+    if pixels.size == 0:
+        logger.error(f"Empty template region {bbox}")
+        return False
+    matcher.save_template(name, np.ascontiguousarray(pixels), frame.screen_size)
+    return True
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Capture button templates for template matching")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    capture = subparsers.add_parser("capture", help="Save a button template")
+    capture.add_argument("name", choices=sorted(set(TEXT_TEMPLATES.values())))
+    capture.add_argument("--frame", help="Recorded full-screen PNG (default: grab the live screen)")
+    capture.add_argument("--bbox", type=int, nargs=4, metavar=("X1", "Y1", "X2", "Y2"),
+                         help="Button box in pixels (default: found with the color detector)")
+    capture.add_argument("--dir", help="Template directory (default: TEMPLATE_DIR)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format=config.LOG_FORMAT)
+    if args.frame:
+        frame = Frame(Image.open(args.frame).convert("RGB"))
+    else:
+        frame = ImageGrabBackend().grab_frame()
+    matcher = TemplateMatcher(directory=args.dir)
+    return 0 if capture_template(matcher, args.name, frame, tuple(args.bbox) if args.bbox else None) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""
+Puts the repository root on sys.path so the tests import the modules the
+same way main.py does. Everything runs headless: input, windows, screen
+and time come from the fakes (RecordingActuator, FakeWindowManager,
+ReplayBackend, FakeClock).
+"""
+
+import os
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture(scope="session")
+def main_module(tmp_path_factory):
+    """
+    Imports main.py for tests that drive the real VortexAutoDownloader.
+
+    main.py imports pyautogui at the top, which needs a desktop. When it is
+    not installed, a stand-in module with only FailSafeException is put in
+    its place: the downloader gets a RecordingActuator, so nothing else of
+    pyautogui is used. The import's log file goes to a temporary directory.
+    """
+    try:
+        import pyautogui  # noqa: F401
+    except Exception:
+        pyautogui = types.ModuleType("pyautogui")
+        pyautogui.FailSafeException = type("FailSafeException", (Exception,), {})
+        sys.modules["pyautogui"] = pyautogui
+
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("main"))
+    try:
+        import main
+    finally:
+        os.chdir(cwd)
+    return main
+
+
+@pytest.fixture
+def make_downloader(main_module, monkeypatch, tmp_path):
+    """
+    Returns a factory for VortexAutoDownloaders on fakes: frames from a
+    ReplayBackend, input through the given actuator, a FakeWindowManager
+    with a Vortex and a browser window, and debug output off.
+    """
+    import config
+    from capture import ReplayBackend
+    from window_manager import FakeWindowManager
+
+    monkeypatch.chdir(tmp_path)
+    for setting in ("SAVE_DEBUG_SCREENSHOTS", "FRAME_BUFFER_ENABLED", "METRICS_ENABLED"):
+        monkeypatch.setattr(config, setting, False)
+
+    def make(images: list, actuator, clock=None):
+        windows = FakeWindowManager()
+        windows.add_window("Vortex")
+        windows.add_window("Nexus Mods - Google Chrome")
+        return main_module.VortexAutoDownloader(capture=ReplayBackend.from_images(images), clock=clock,
+                                                actuator=actuator, windows=windows)
+
+    return make
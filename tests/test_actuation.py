@@ -0,0 +1,64 @@
+"""
+Input timing per profile, measured with the RecordingActuator on a FakeClock.
+"""
+
+import pytest
+
+import config
+from actuation import RecordingActuator, timing_profile, timing_profiles
+
+
+def test_safe_click_takes_the_original_timings(monkeypatch):
+    monkeypatch.setattr(config, "PYAUTOGUI_PAUSE", 0.5)
+    actuator = RecordingActuator(timing_profile("safe"))
+
+    actuator.click(100, 200)
+
+    # 0.3 move + 0.3 hover + 0.1 hold, plus a 0.5 pause after each of the three pyautogui calls
+    assert actuator.clock.now() == pytest.approx(2.2)
+    assert [name for _, name, _ in actuator.events] == ["moveTo", "mouseDown", "mouseUp"]
+    assert actuator.events[0][2] == (100, 200)
+    assert actuator.stats()["click"] == {"count": 1, "seconds": pytest.approx(2.2), "mean": pytest.approx(2.2)}
+
+
+def test_safe_shortcut_closes_one_tab_per_key_press(monkeypatch):
+    monkeypatch.setattr(config, "PYAUTOGUI_PAUSE", 0.5)
+    actuator = RecordingActuator("safe")
+
+    actuator.shortcut("ctrl", "w", times=3)
+
+    names = [name for _, name, _ in actuator.events]
+    assert names == ["keyDown", "press", "press", "press", "keyUp"]
+    # 5 calls x 0.5 pause + 4 key gaps x 0.1 + 0.5 after the keys
+    assert actuator.total_seconds() == pytest.approx(3.4)
+
+
+def test_fast_profile_is_much_quicker_for_the_same_input():
+    timings = {}
+    for name in timing_profiles():
+        actuator = RecordingActuator(name)
+        actuator.click(100, 200)
+        actuator.click(300, 400)
+        actuator.shortcut("ctrl", "w")
+        actuator.wait(actuator.profile.restore_delay, "restore")
+        timings[name] = actuator.total_seconds()
+        assert actuator.counts == {"click": 2, "shortcut": 1, "restore": 1}
+
+    assert timings["fast"] == pytest.approx(2 * 0.08 + 0.21 + 0.05)
+    assert timings["fast"] < timings["safe"] / 5
+
+
+def test_wait_is_recorded_under_its_reason():
+    actuator = RecordingActuator("fast")
+
+    actuator.wait(0.4, "focus")
+    actuator.wait(0.2, "focus")
+
+    assert actuator.events == []
+    assert actuator.stats()["focus"]["count"] == 2
+    assert actuator.stats()["focus"]["mean"] == pytest.approx(0.3)
+
+
+def test_unknown_profile_is_rejected():
+    with pytest.raises(ValueError, match="Unknown actuator profile"):
+        timing_profile("ludicrous")
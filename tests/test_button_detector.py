@@ -0,0 +1,168 @@
+"""
+ButtonDetector and its summed-area tables on synthetic screens, the shared
+detection thread pools and tiled searches.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+import pytest
+
+import button_detector
+import config
+import detection
+from benchmark import BUTTON_GRAY, TEXT_WHITE, jittered_frames, make_synthetic_frame
+from button_detector import ButtonDetector
+from capture import Frame
+
+
+def test_concurrent_callers_get_one_pool_per_worker_count():
+    button_detector.shutdown_thread_pool()
+    with ThreadPoolExecutor(max_workers=8) as callers:
+        pools = list(callers.map(lambda workers: (workers, button_detector.thread_pool(workers)), [2, 4] * 16))
+
+    assert len({id(pool) for _, pool in pools}) == 2
+    assert all(pool._max_workers == workers for workers, pool in pools)
+    button_detector.shutdown_thread_pool()
+
+
+def test_shutdown_closes_the_pools_and_the_next_search_starts_a_new_one():
+    pool = button_detector.thread_pool(2)
+    other = button_detector.thread_pool(3)
+    assert list(pool.map(lambda x: x * 2, [1, 2, 3])) == [2, 4, 6]
+
+    button_detector.shutdown_thread_pool()
+
+    for closed in (pool, other):
+        with pytest.raises(RuntimeError):
+            closed.submit(print)
+    assert button_detector.thread_pool(2) is not pool
+    button_detector.shutdown_thread_pool()
+
+
+def seam_buttons(pixels: np.ndarray, tiles: list):
+    """
+    Draws labelled buttons centered on the start and on the end of every
+    inner tile edge, so each one is cut by a tile border.
+    """
+    height, width = pixels.shape[:2]
+    xs = sorted({tile[0] for tile in tiles if tile[0] > 0} | {tile[2] for tile in tiles if tile[2] < width})
+    ys = sorted({tile[1] for tile in tiles if tile[1] > 0} | {tile[3] for tile in tiles if tile[3] < height})
+    centers = [(x, height // 3) for x in xs] + [(width // 5, y) for y in ys] + [(x, y) for x in xs[:1] for y in ys[:1]]
+    for cx, cy in centers:
+        cv2.rectangle(pixels, (cx - 110, cy - 28), (cx + 110, cy + 28), BUTTON_GRAY, -1)
+        cv2.putText(pixels, "Slow download", (cx - 95, cy + 8), cv2.FONT_HERSHEY_SIMPLEX, 0.7, TEXT_WHITE, 2)
+    return centers
+
+
+@pytest.mark.parametrize("width, height", [(1920, 1080), (3840, 2160)])
+@pytest.mark.parametrize("downscale", [1, 0])
+def test_tiled_search_finds_the_same_candidates_as_one_piece(monkeypatch, width, height, downscale):
+    monkeypatch.setattr(config, "DETECTION_TILE_MIN_PIXELS", 0)
+    spec = detection.button_specs()["slow_download"]
+    whole = ButtonDetector(spec, workers=0, downscale=downscale)
+    tiled = ButtonDetector(spec, workers=4, downscale=downscale)
+    box = (0, 0, width, height)
+
+    frames = jittered_frames(width, height, 4, seed=3)
+    seams = make_synthetic_frame(width, height, "idle")
+    tiles = tiled.tiles(box, tiled.downscale_for(Frame(seams)))
+    assert len(tiles) > 1
+    centers = seam_buttons(seams, tiles)
+
+    try:
+        for pixels in frames + [seams]:
+            frame = Frame(pixels)
+            expected = [(c.bbox, c.confidence) for c in whole.detect(frame, search_box=box)]
+            assert [(c.bbox, c.confidence) for c in tiled.detect(frame, search_box=box)] == expected
+            assert expected
+        # Every button across a seam is found
+        assert len(expected) == len(centers)
+    finally:
+        button_detector.shutdown_thread_pool()
+
+
+BACKGROUND = (32, 33, 36)
+PURPLE = (150, 60, 220)
+
+
+def test_summed_area_table_sums_match_numpy():
+    rng = np.random.default_rng(1)
+    mask = (rng.random((50, 70)) > 0.5).astype(np.uint8) * 255
+    value = rng.integers(0, 256, (50, 70), dtype=np.uint8)
+    table = button_detector.SummedAreaTable({"mask": mask, "value": value}, {"mask": 1 / 255})
+
+    for x, y, w, h in [(0, 0, 70, 50), (5, 7, 10, 3), (60, 40, 30, 30), (-5, -5, 10, 10)]:
+        x1, y1 = max(x, 0), max(y, 0)
+        sums = table.sums(x, y, w, h)
+        assert sums["mask"] == pytest.approx(np.count_nonzero(mask[y1:y + h, x1:x + w]))
+        assert sums["value"] == pytest.approx(int(value[y1:y + h, x1:x + w].sum()))
+    assert table.sums(80, 0, 5, 5) == {"mask": 0.0, "value": 0.0}
+
+
+def gray_spec() -> button_detector.ButtonSpec:
+    return button_detector.ButtonSpec(
+        "Test", (0, 0, 1, 1), [(config.BUTTON_GRAY_HSV_LOWER, config.BUTTON_GRAY_HSV_UPPER)],
+        min_size=(100, 30), max_size=(300, 70), aspect=(2, 8),
+        exclusions={"purple": (config.PURPLE_HSV_LOWER, config.PURPLE_HSV_UPPER)}, max_exclusion=0.1)
+
+
+def screen(*buttons, size=(1000, 600)) -> np.ndarray:
+    """A dark screen with gray buttons given as (x, y, width, height) of their top-left corner."""
+    pixels = np.full((size[1], size[0], 3), BACKGROUND, dtype=np.uint8)
+    for x, y, w, h in buttons:
+        pixels[y:y + h, x:x + w] = BUTTON_GRAY
+    return pixels
+
+
+@pytest.fixture(params=[True, False], ids=["lut", "hsv"])
+def detector(request) -> ButtonDetector:
+    return ButtonDetector(gray_spec(), use_lut=request.param, downscale=1, workers=0)
+
+
+def test_detector_keeps_only_plausible_sizes_and_aspects(detector):
+    pixels = screen((20, 20, 200, 48),    # Fits
+                    (20, 120, 90, 40),    # Too narrow
+                    (20, 220, 320, 60),   # Too wide
+                    (400, 20, 120, 66),   # Aspect 1.8: too square
+                    (400, 120, 290, 34))  # Aspect 8.5: too flat
+
+    candidates = detector.detect(Frame(pixels))
+
+    assert [c.bbox for c in candidates] == [(20, 20, 220, 68)]
+    assert (candidates[0].x, candidates[0].y) == (120, 44)
+
+
+def test_detector_skips_buttons_covered_by_the_exclusion_color(detector):
+    pixels = screen((20, 20, 200, 50), (20, 200, 200, 50))
+    pixels[35:55, 100:125] = PURPLE   # 5% of the first button
+    pixels[210:240, 80:150] = PURPLE  # 21% of the second
+
+    [candidate] = detector.detect(Frame(pixels))
+
+    assert candidate.bbox == (20, 20, 220, 70)
+    assert candidate.features["exclusion"] == pytest.approx(0.05)
+
+
+def test_detector_ranks_by_confidence_then_size_then_position(detector):
+    pixels = screen((500, 400, 120, 40), (20, 400, 120, 40), (500, 20, 180, 60), (20, 20, 200, 50))
+    cv2.putText(pixels, "Label", (40, 55), cv2.FONT_HERSHEY_SIMPLEX, 1.0, TEXT_WHITE, 2)  # Only on the last one
+
+    candidates = detector.detect(Frame(pixels))
+
+    assert [c.bbox[:2] for c in candidates] == [(20, 20), (500, 20), (20, 400), (500, 400)]
+    assert candidates[0].confidence > candidates[1].confidence
+    assert candidates[1].confidence == pytest.approx(candidates[3].confidence)
+    assert [c.bbox[:2] for c in detector.detect(Frame(pixels), limit=2)] == [(20, 20), (500, 20)]
+
+
+def test_detector_searches_only_the_search_box_in_screen_coordinates(detector):
+    frame = Frame(screen((20, 20, 200, 50), (600, 300, 200, 50)), origin=(1000, 500), screen_size=(3000, 2000))
+
+    [left] = detector.detect(frame, search_box=(0, 0, 500, 600))
+    [right] = detector.detect(frame, search_box=(500, 200, 1000, 600))
+
+    assert left.bbox == (1020, 520, 1220, 570)
+    assert right.bbox == (1600, 800, 1800, 850)
+    assert detector.detect(frame, search_box=(300, 0, 500, 200)) == []
@@ -0,0 +1,103 @@
+"""
+Frames, capture planning and the capture backends' screen size.
+"""
+
+import numpy as np
+from PIL import Image
+
+import capture
+from capture import CapturePlanner, Frame, ImageGrabBackend, ReplayBackend
+
+
+def gradient(width: int = 64, height: int = 48) -> np.ndarray:
+    y, x = np.mgrid[0:height, 0:width]
+    return np.stack([x * 4 % 256, y * 5 % 256, (x + y) % 256], axis=-1).astype(np.uint8)
+
+
+def test_frame_converts_each_color_space_once():
+    frame = Frame(gradient())
+
+    hsv = frame.hsv
+    assert frame.hsv is hsv
+    assert frame.view("hsv") is hsv
+    frame.gray
+    assert (frame.conversions, frame.reused) == (2, 2)
+
+
+def test_frame_roi_is_a_view_and_roi_conversions_are_cached():
+    pixels = gradient()
+    frame = Frame(pixels)
+    box = (10, 5, 30, 25)
+
+    assert np.shares_memory(frame.roi(box), pixels)
+    hsv = frame.roi(box, "hsv")
+    assert frame.roi(box, "hsv") is hsv
+    assert np.array_equal(hsv, Frame(gradient()).hsv[5:25, 10:30])
+    assert frame.conversions == 1
+
+    # Once the whole frame is converted, crops are views of it
+    whole = frame.hsv
+    assert np.shares_memory(frame.roi((0, 0, 8, 8), "hsv"), whole)
+
+
+def test_region_frame_maps_screen_fractions_and_coordinates():
+    # A 400 x 200 capture taken at (1000, 500) of a 1920 x 1080 screen
+    frame = Frame(np.zeros((200, 400, 3), dtype=np.uint8), origin=(1000, 500), screen_size=(1920, 1080))
+
+    assert frame.bbox_from_percent(0.53125, 0.5, 0.625, 0.6) == (20, 40, 200, 148)
+    assert frame.bbox_from_percent(0.0, 0.0, 0.6, 0.5) == (0, 0, 152, 40)  # Clipped to the frame
+    assert frame.bbox_from_percent(0.0, 0.0, 0.1, 0.1) == (0, 0, 0, 0)  # Not in this frame
+    assert frame.to_screen(20, 40) == (1020, 540)
+
+
+def test_planner_captures_the_union_of_the_active_regions():
+    planner = CapturePlanner({"a": (0.1, 0.2, 0.3, 0.4), "b": (0.25, 0.1, 0.5, 0.3), "c": (0.8, 0.8, 0.9, 0.9)})
+
+    assert planner.bbox("a", (1000, 500)) == (100, 100, 300, 200)
+    assert planner.bbox(["a", "b"], (1000, 500)) == (100, 50, 500, 200)
+    assert planner.bbox(("b", "a"), (1000, 500)) is planner.bbox(["a", "b"], (1000, 500))
+    assert planner.bbox(["a", "b"], (2000, 1000)) == (200, 100, 1000, 400)
+
+    planner.update_regions({"a": (0.0, 0.0, 0.5, 0.5)})
+    assert planner.bbox("a", (1000, 500)) == (0, 0, 500, 250)
+
+
+def test_region_capture_matches_the_same_pixels_of_a_full_capture():
+    pixels = gradient(640, 360)
+    backend = ReplayBackend.from_images([Image.fromarray(pixels)])
+    planner = CapturePlanner({"button": (0.25, 0.5, 0.5, 0.75)})
+    screen_size = backend.size()
+
+    full = backend.grab_frame()
+    region = backend.grab_frame(bbox=planner.bbox("button", screen_size), screen_size=screen_size)
+
+    assert region.origin == (160, 180) and region.size == (160, 90)
+    box_full, box_region = (full.bbox_from_percent(0.25, 0.5, 0.5, 0.75),
+                            region.bbox_from_percent(0.25, 0.5, 0.5, 0.75))
+    assert np.array_equal(full.roi(box_full), region.roi(box_region))
+    assert full.to_screen(*box_full[:2]) == region.to_screen(*box_region[:2])
+
+
+def test_image_grab_size_comes_from_the_system_metrics(monkeypatch):
+    grabs = []
+    monkeypatch.setattr(capture.ImageGrab, "grab",
+                        lambda bbox=None, all_screens=False: grabs.append(bbox) or Image.new("RGB", (1920, 1080)))
+    metrics = {0: 2560, 1: 1440, 78: 5120, 79: 1440}
+    monkeypatch.setattr(ImageGrabBackend, "_system_metrics", staticmethod(lambda: metrics.get))
+
+    assert ImageGrabBackend().size() == (2560, 1440)
+    assert ImageGrabBackend(all_screens=True).size() == (5120, 1440)
+    assert grabs == []
+
+
+def test_image_grab_size_reuses_the_last_full_capture(monkeypatch):
+    grabs = []
+    monkeypatch.setattr(capture.ImageGrab, "grab",
+                        lambda bbox=None, all_screens=False: grabs.append(bbox) or Image.new("RGB", (1920, 1080)))
+    monkeypatch.setattr(ImageGrabBackend, "_system_metrics", staticmethod(lambda: None))
+    backend = ImageGrabBackend(size_ttl=30)
+
+    assert backend.size() == (1920, 1080)  # No metrics: measured with one full grab
+    backend.grab((0, 0, 10, 10))
+    assert backend.size() == (1920, 1080)
+    assert grabs == [None, (0, 0, 10, 10)]
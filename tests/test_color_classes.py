@@ -0,0 +1,76 @@
+"""
+Lookup-table color masks against cvtColor + inRange, over every RGB color.
+"""
+
+import cv2
+import numpy as np
+import pytest
+
+import config
+import detection
+from benchmark import color_masks_hsv, color_masks_lut, make_synthetic_frame
+from capture import Frame
+from color_classes import ColorClassifier
+
+
+@pytest.fixture(scope="module")
+def every_color() -> np.ndarray:
+    """All 2**24 RGB colors as a 4096 x 4096 image."""
+    value = np.arange(1 << 24, dtype=np.uint32)
+    return np.stack([value & 255, (value >> 8) & 255, value >> 16], axis=-1).astype(np.uint8).reshape(4096, 4096, 3)
+
+
+def in_range_masks(rgb: np.ndarray, classes: dict) -> dict:
+    hsv = cv2.cvtColor(rgb, cv2.COLOR_RGB2HSV)
+    masks = {}
+    for name, ranges in classes.items():
+        mask = np.zeros(rgb.shape[:2], dtype=np.uint8)
+        for lower, upper in ranges:
+            mask |= cv2.inRange(hsv, np.asarray(lower, dtype=np.uint8), np.asarray(upper, dtype=np.uint8))
+        masks[name] = mask
+    return masks
+
+
+@pytest.mark.parametrize("button", ["manual_button", "slow_download"])
+def test_lut_masks_match_in_range_for_every_color(every_color, button):
+    # The gray band, the purple exclusion and the label text at the configured table size
+    classes = detection.button_specs()[button].color_classes()
+    classifier = ColorClassifier(classes, config.COLOR_LUT_BITS)
+    labels = classifier.classify(every_color)
+    expected = in_range_masks(every_color, classes)
+    if config.COLOR_LUT_BITS < 8:
+        # A smaller table classifies each color like the center of its bin: every channel
+        # may be off by up to half a bin, and the masks match inRange on those colors
+        shift = 8 - config.COLOR_LUT_BITS
+        expected = in_range_masks((every_color >> shift << shift) + ((1 << shift) >> 1), classes)
+
+    for name in classes:
+        assert np.array_equal(classifier.mask(labels, name), expected[name]), name
+
+
+def test_quantized_lut_classifies_every_color_like_its_bin_center(every_color):
+    classes = detection.button_specs()["slow_download"].color_classes()
+    classifier = ColorClassifier(classes, 6)
+    labels = classifier.classify(every_color)
+    centers = (every_color >> 2 << 2) + 2
+    expected = in_range_masks(centers, classes)
+
+    for name in classes:
+        assert np.array_equal(classifier.mask(labels, name), expected[name]), name
+
+
+def test_lut_reads_bgr_and_bgra_pixels():
+    classes = detection.button_specs()["slow_download"].color_classes()
+    classifier = ColorClassifier(classes, config.COLOR_LUT_BITS)
+    rgb = make_synthetic_frame(640, 360, "browser_page")
+    labels = classifier.classify(rgb)
+
+    assert np.array_equal(classifier.classify(cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR), order="bgr"), labels)
+    assert np.array_equal(classifier.classify(cv2.cvtColor(rgb, cv2.COLOR_RGB2BGRA), order="bgr"), labels)
+
+
+@pytest.mark.parametrize("scene", ["vortex_dialog", "browser_page", "download_started", "idle"])
+def test_benchmark_masks_agree_on_synthetic_screens(scene):
+    frame = Frame(make_synthetic_frame(1920, 1080, scene))
+    for lut, hsv in zip(color_masks_lut(frame), color_masks_hsv(frame)):
+        assert np.array_equal(lut, hsv)
@@ -0,0 +1,113 @@
+"""
+Debug screenshots and failure dumps, written in the background.
+"""
+
+import json
+import threading
+
+import numpy as np
+from PIL import Image
+
+from capture import Frame
+from debug_output import FrameRingBuffer, ScreenshotWriter
+
+
+def frame(value: int, size: tuple = (40, 30)) -> Frame:
+    width, height = size
+    return Frame(np.full((height, width, 3), value, dtype=np.uint8), origin=(100, 200))
+
+
+class SlowImage:
+    """An image whose save() waits until released, to back up the writer queue."""
+
+    def __init__(self, release: threading.Event):
+        self.release = release
+
+    def save(self, path, **kwargs):
+        self.release.wait(5)
+        path.write_bytes(b"slow")
+
+
+def test_ring_buffer_evicts_past_the_frame_count():
+    buffer = FrameRingBuffer(capacity=3, max_bytes=10**9, directory="unused")
+    frames = [frame(i) for i in range(5)]
+    for f in frames:
+        buffer.record(f)
+
+    assert [f.timestamp for f in buffer.frames] == [f.timestamp for f in frames[2:]]
+    assert buffer.bytes == 3 * frames[0].rgb.nbytes
+    buffer.close()
+
+
+def test_ring_buffer_evicts_past_the_byte_limit():
+    one = frame(0).rgb.nbytes
+    buffer = FrameRingBuffer(capacity=100, max_bytes=2 * one + 1, directory="unused")
+    for i in range(5):
+        buffer.record(frame(i))
+
+    assert len(buffer.frames) == 2
+    assert buffer.bytes == 2 * one
+    buffer.close()
+
+
+def test_ring_buffer_keeps_only_the_pixels_of_a_frame():
+    buffer = FrameRingBuffer(capacity=10, max_bytes=10**9, directory="unused")
+    f = Frame(Image.fromarray(frame(10).rgb))
+    buffer.record(f)
+    f.hsv, f.gray, f.roi((0, 0, 10, 10), "bgr")  # Detectors convert after the frame is buffered
+    f.decisions["manual_button"] = {"found": False}
+
+    [kept] = buffer.frames
+    assert kept.rgb is f.rgb
+    assert not kept._views and not kept._roi_views and kept._image is None
+    assert kept.decisions == {"manual_button": {"found": False}}
+    assert buffer.bytes == f.rgb.nbytes
+    buffer.close()
+
+
+def test_ring_buffer_dump_writes_frames_and_decisions_then_empties(tmp_path):
+    buffer = FrameRingBuffer(capacity=10, max_bytes=10**9, directory=tmp_path)
+    assert not buffer.dump("nothing")
+
+    for i in range(3):
+        f = frame(i * 50)
+        f.decisions["step"] = i
+        buffer.record(f)
+    assert buffer.dump("click_failed")
+    buffer.close()
+
+    [folder] = tmp_path.iterdir()
+    assert folder.name.endswith("_click_failed")
+    index = json.loads((folder / "decisions.json").read_text())
+    assert [entry["decisions"] for entry in index] == [{"step": 0}, {"step": 1}, {"step": 2}]
+    assert index[0]["origin"] == [100, 200] and index[0]["size"] == [40, 30]
+    assert np.array_equal(np.asarray(Image.open(folder / index[2]["file"])), frame(100).rgb)
+    assert not buffer.frames and buffer.bytes == 0 and buffer.dumps == 1
+
+
+def test_screenshot_writer_keeps_the_newest_files(tmp_path):
+    writer = ScreenshotWriter(tmp_path, queue_size=20, image_format="png", max_files=3, max_bytes=0)
+    for i in range(5):
+        assert writer.submit(frame(i), prefix=f"shot{i}")
+    writer.flush()
+    writer.close()
+
+    assert sorted(p.name.split("_")[0] for p in tmp_path.iterdir()) == ["shot2", "shot3", "shot4"]
+    assert writer.stats() == {"written": 5, "dropped": 0, "queued": 0}
+
+
+def test_screenshot_writer_drops_instead_of_blocking_when_the_disk_is_slow(tmp_path):
+    release = threading.Event()
+    writer = ScreenshotWriter(tmp_path, queue_size=1, image_format="png", max_files=0, max_bytes=0)
+
+    writer.submit(SlowImage(release))  # Taken by the writer thread, which then waits
+    while writer.queue.qsize():
+        pass
+    assert writer.submit(frame(1).rgb)  # Fills the queue
+    assert not writer.submit(frame(2))
+
+    release.set()
+    writer.flush()
+    writer.close()
+    assert writer.stats()["dropped"] == 1
+    assert writer.written == 2
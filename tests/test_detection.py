@@ -0,0 +1,27 @@
+"""
+Caching of the per-button ButtonDetectors.
+"""
+
+import config
+import detection
+
+
+def test_detector_is_reused_for_the_same_settings_and_screen():
+    detection.clear_detectors()
+    first = detection.button_detector("manual_button", (1920, 1080))
+
+    assert detection.button_detector("manual_button", (1920, 1080)) is first
+    assert detection.button_detector("slow_download", (1920, 1080)) is not first
+
+
+def test_detector_is_rebuilt_when_the_screen_or_config_changes(monkeypatch):
+    detection.clear_detectors()
+    first = detection.button_detector("manual_button", (1920, 1080))
+
+    resized = detection.button_detector("manual_button", (3840, 2160))
+    assert resized is not first
+
+    monkeypatch.setattr(config, "VORTEX_SEARCH_TOP", config.VORTEX_SEARCH_TOP + 0.01)
+    moved = detection.button_detector("manual_button", (3840, 2160))
+    assert moved is not resized
+    assert moved.spec.region[1] == config.VORTEX_SEARCH_TOP
@@ -0,0 +1,154 @@
+"""
+DownloadFlow timeouts, retries and failure handling, with the steps driven
+by a RecordingActuator and a ReplayBackend on a shared FakeClock.
+"""
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from actuation import RecordingActuator
+from capture import ReplayBackend
+from download_flow import FLOW_ORDER, DownloadFlow, State, Step
+from scheduling import FakeClock, wait_until
+
+
+class FailSafe(Exception):
+    """Stands in for pyautogui.FailSafeException."""
+
+
+def blank(value: int) -> Image.Image:
+    return Image.fromarray(np.full((40, 60, 3), value, dtype=np.uint8))
+
+
+def page_loaded(capture: ReplayBackend) -> bool:
+    """The fake 'browser page' is loaded once a bright frame comes up."""
+    return np.asarray(capture.grab()).mean() > 128
+
+
+def make_flow(clock, actuator, capture, overrides: dict = None, fatal=(FailSafe,)):
+    def click(ctx, timeout):
+        actuator.click(100, 200)
+        return True
+
+    def wait_page(ctx, timeout):
+        return wait_until(lambda: page_loaded(capture), timeout, poll=0.5, clock=clock)
+
+    steps = {
+        State.DIALOG_SEEN: Step(click, timeout=5),
+        State.MANUAL_CLICKED: Step(wait_page, timeout=10, required=False),
+        State.BROWSER_LOADED: Step(click, timeout=5),
+        State.SLOW_CLICKED: Step(wait_page, timeout=12, required=False),
+        State.DOWNLOAD_CONFIRMED: Step(lambda ctx, timeout: actuator.shortcut("ctrl", "w") or True, timeout=5),
+        State.TAB_CLOSED: Step(lambda ctx, timeout: True, timeout=5, retries=1, retry_delay=0.5),
+    }
+    steps.update(overrides or {})
+    return DownloadFlow(steps, clock=clock, fatal=fatal)
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def actuator(clock):
+    return RecordingActuator("safe", clock=clock)
+
+
+def test_happy_path_visits_every_state_in_order(clock, actuator):
+    capture = ReplayBackend.from_images([blank(0), blank(0), blank(255)], loop=False)
+    flow = make_flow(clock, actuator, capture)
+
+    assert flow.run({})
+    assert [visit.state for visit in flow.visits] == FLOW_ORDER
+    assert all(visit.ok for visit in flow.visits)
+    assert flow.failed_state is None
+    # Two dark frames polled 0.5s apart before the page showed up
+    assert flow.visits[1].duration == pytest.approx(1.0)
+    assert actuator.counts["click"] == 2
+    assert actuator.counts["shortcut"] == 1
+
+
+def test_timed_out_wait_is_optional_and_flow_continues(clock, actuator):
+    capture = ReplayBackend.from_images([blank(0)])
+    flow = make_flow(clock, actuator, capture)
+
+    assert flow.run({})
+    manual = flow.visits[1]
+    assert manual.state == State.MANUAL_CLICKED
+    assert not manual.ok
+    # The wait stops at its own timeout and does not count as an overrun
+    assert manual.duration == pytest.approx(10.0)
+    assert not manual.overran
+
+
+def test_slow_step_is_flagged_as_overrun(clock, actuator):
+    capture = ReplayBackend.from_images([blank(255)])
+
+    def slow_click(ctx, timeout):
+        clock.advance(timeout + 1)
+        return True
+
+    flow = make_flow(clock, actuator, capture, {State.DIALOG_SEEN: Step(slow_click, timeout=5)})
+
+    assert flow.run({})
+    assert flow.visits[0].overran
+    assert flow.visits[0].duration == pytest.approx(6.0)
+
+
+def test_retries_sleep_the_retry_delay_between_attempts(clock, actuator):
+    capture = ReplayBackend.from_images([blank(255)])
+    outcomes = iter([False, None, True])
+    restore = Step(lambda ctx, timeout: next(outcomes), timeout=5, retries=2, retry_delay=0.5)
+    flow = make_flow(clock, actuator, capture, {State.TAB_CLOSED: restore})
+
+    assert flow.run({})
+    visit = flow.visits[-2]
+    assert visit.state == State.TAB_CLOSED
+    assert visit.ok and visit.attempts == 3
+    assert clock.sleeps[-2:] == [0.5, 0.5]
+
+
+def test_required_step_failure_stops_the_flow(clock, actuator):
+    capture = ReplayBackend.from_images([blank(255)])
+
+    def broken_click(ctx, timeout):
+        raise RuntimeError("window vanished")
+
+    flow = make_flow(clock, actuator, capture, {State.BROWSER_LOADED: Step(broken_click, timeout=5, retries=1)})
+
+    assert not flow.run({})
+    assert flow.failed_state == State.BROWSER_LOADED
+    assert flow.visits[-1].attempts == 2
+    assert flow.failures == 1
+    assert State.DOWNLOAD_CONFIRMED not in {visit.state for visit in flow.visits}
+
+
+def test_fatal_errors_are_raised_without_retrying(clock, actuator):
+    capture = ReplayBackend.from_images([blank(255)])
+    attempts = []
+
+    def failsafe(ctx, timeout):
+        attempts.append(clock.now())
+        raise FailSafe("mouse in the corner")
+
+    flow = make_flow(clock, actuator, capture, {State.DIALOG_SEEN: Step(failsafe, timeout=5, retries=3)})
+
+    with pytest.raises(FailSafe):
+        flow.run({})
+    assert len(attempts) == 1
+    assert flow.failed_state == State.DIALOG_SEEN
+
+
+def test_latency_stats_cover_every_run(clock, actuator):
+    capture = ReplayBackend.from_images([blank(255)])
+    flow = make_flow(clock, actuator, capture)
+
+    for _ in range(3):
+        flow.run({})
+
+    stats = flow.latency_stats()
+    assert stats[State.DIALOG_SEEN.value]["count"] == 3
+    # One safe click: 0.3 move + 0.3 hover + 0.1 hold, plus three 0.5s pyautogui pauses
+    assert stats[State.DIALOG_SEEN.value]["p50"] == pytest.approx(2.2)
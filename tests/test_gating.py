@@ -0,0 +1,248 @@
+"""
+Cheap gates in front of the detectors, on synthetic frames.
+"""
+
+import cv2
+import numpy as np
+
+import detection
+from benchmark import make_synthetic_frame, PREMIUM_PURPLE
+from capture import Frame
+from gating import ChangeGate, DialogCascade, ResultCache
+from scheduling import FakeClock
+
+DIALOG_DARK = (45, 45, 50)
+
+
+def dialog_region(frame: Frame) -> tuple:
+    return frame.bbox_from_percent(*detection.search_regions()["dialog"])
+
+
+def themed_dialog(purple_share: float) -> Frame:
+    """
+    A dark screen whose dialog region has a vertical purple band covering
+    purple_share of its width.
+    """
+    pixels = np.full((1080, 1920, 3), DIALOG_DARK, dtype=np.uint8)
+    frame = Frame(pixels)
+    left, top, right, bottom = dialog_region(frame)
+    band = int((right - left) * purple_share)
+    pixels[top:bottom, left:left + band] = PREMIUM_PURPLE
+    return frame
+
+
+class Detector:
+    """Stage 3 stand-in that counts its calls."""
+
+    def __init__(self, result=None):
+        self.result = result
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.result
+
+
+def test_cascade_stage1_rejects_screens_without_the_dialog_colors():
+    cascade = DialogCascade()
+    detect = Detector((320, 446))
+
+    for scene in ("idle", "browser_page", "download_started"):
+        verdict = cascade.run(Frame(make_synthetic_frame(1920, 1080, scene)), detect)
+        assert verdict.stage == 1
+        assert not verdict.dialog_present
+
+    assert detect.calls == 0
+    assert cascade.stats()["stage1_rejected"] == 3
+
+
+def test_cascade_stage2_rejects_too_little_purple_for_a_dialog():
+    cascade = DialogCascade()
+    frame = themed_dialog(0.04)
+    detect = Detector((320, 446))
+
+    # Enough purple samples for stage 1, but the histogram says it is not a dialog
+    dark, purple = cascade.sample(frame.roi(dialog_region(frame)))
+    assert dark >= cascade.min_dark and purple >= cascade.min_purple
+    verdict = cascade.run(frame, detect)
+
+    assert verdict.stage == 2
+    assert verdict.confidence < cascade.threshold
+    assert detect.calls == 0
+    assert cascade.stats()["stage2_rejected"] == 1
+
+
+def test_cascade_stage3_runs_the_detector_on_a_dialog():
+    cascade = DialogCascade()
+    frame = Frame(make_synthetic_frame(1920, 1080, "vortex_dialog"))
+
+    found = cascade.run(frame, Detector((320, 446)))
+    missed = cascade.run(frame, Detector(None))
+
+    assert (found.stage, found.button, found.confidence) == (3, (320, 446), 1.0)
+    assert missed.stage == 3 and missed.dialog_present and missed.button is None
+    assert missed.confidence == 1.0
+    assert cascade.stats() == {"stage1_rejected": 0, "stage2_rejected": 0, "detected": 1, "undetected": 1}
+
+
+def test_cascade_accepts_a_dialog_resembling_the_last_one_with_a_button():
+    cascade = DialogCascade()
+    faint = themed_dialog(0.04)
+    assert cascade.run(faint, Detector((1, 1))).stage == 2
+
+    # The button is found on a dialog with the usual panel; its histogram becomes the reference
+    assert cascade.run(themed_dialog(0.15), Detector((1, 1))).button == (1, 1)
+    assert cascade.reference is not None
+
+    pixels = faint.roi(dialog_region(faint))
+    hist = cascade.histogram(pixels)
+    correlation = cv2.compareHist(hist, cascade.reference, cv2.HISTCMP_CORREL)
+    verdict = cascade.run(faint, Detector(None))
+
+    assert correlation >= cascade.threshold
+    assert verdict.stage == 3
+    assert verdict.confidence == correlation
+
+
+
+def test_change_gate_runs_only_when_sampled_pixels_change():
+    clock = FakeClock()
+    gate = ChangeGate(threshold=0.01, pixel_delta=24, stride=8, max_age=10, clock=clock)
+    pixels = np.full((80, 80, 3), 40, dtype=np.uint8)  # 10 x 10 = 100 sampled pixels
+
+    assert gate.should_run("region", pixels)
+    gate.store("region", "button")
+    assert not gate.should_run("region", pixels.copy())
+
+    # Changes between the sampled pixels, or too small to count, keep it closed
+    pixels[1:8, 1:8] = 255
+    pixels[::8, ::8] += 20
+    assert not gate.should_run("region", pixels)
+    assert gate.last_result("region") == "button"
+
+    # 2 of the 100 sampled pixels changed: above the 1% threshold
+    pixels[0:9:8, 0] = 200
+    assert gate.should_run("region", pixels)
+    assert gate.last_changed
+    gate.store("region", None)
+    assert not gate.should_run("region", pixels)
+    assert not gate.last_changed
+    assert gate.stats()["hits"] == 3 and gate.stats()["misses"] == 2
+
+
+def test_change_gate_reruns_a_static_region_after_max_age():
+    clock = FakeClock()
+    gate = ChangeGate(threshold=0.01, pixel_delta=24, stride=8, max_age=10, clock=clock)
+    pixels = np.zeros((80, 80, 3), dtype=np.uint8)
+    gate.should_run("region", pixels)
+    gate.store("region", None)
+
+    clock.advance(9.9)
+    assert not gate.should_run("region", pixels)
+    clock.advance(0.1)
+    assert gate.should_run("region", pixels)
+    assert not gate.last_changed
+    assert gate.stats()["stale_runs"] == 1
+
+
+def test_change_gate_invalidate_forces_the_next_run():
+    gate = ChangeGate(threshold=0.01, pixel_delta=24, stride=8, max_age=10, clock=FakeClock())
+    pixels = np.zeros((80, 80, 3), dtype=np.uint8)
+    for key in ("a", "b"):
+        gate.should_run(key, pixels)
+        gate.store(key, key)
+
+    gate.invalidate("a")
+    assert gate.should_run("a", pixels)
+    assert not gate.should_run("b", pixels)
+    assert gate.last_result("a") is None
+
+    gate.invalidate()
+    assert gate.should_run("b", pixels)
+
+
+class Compute:
+    """Detector stand-in that counts its runs."""
+
+    def __init__(self):
+        self.runs = 0
+
+    def __call__(self):
+        self.runs += 1
+        return (self.runs, 0, 0, 0)
+
+
+def test_result_cache_hits_only_on_identical_pixels_at_the_same_place():
+    cache = ResultCache(capacity=8, ttl=30, clock=FakeClock())
+    pixels = make_synthetic_frame(640, 360, "vortex_dialog")
+    compute = Compute()
+    box = (0, 0, 320, 180)
+
+    first = cache.lookup("manual_button", Frame(pixels), box, compute)
+    assert cache.lookup("manual_button", Frame(pixels.copy()), box, compute) == first
+
+    changed = pixels.copy()
+    changed[10, 10] += 1  # Changes the CRC and the channel sums
+    assert cache.lookup("manual_button", Frame(changed), box, compute) != first
+    assert cache.lookup("manual_button", Frame(pixels, origin=(5, 0)), box, compute) != first  # Other screen position
+    assert cache.lookup("slow_download", Frame(pixels), box, compute) != first  # Other detector
+    assert compute.runs == 4
+    assert cache.stats()["hits"] == 1
+
+
+def test_result_cache_key_covers_crc_and_channel_sums():
+    cache = ResultCache(capacity=8, ttl=30, clock=FakeClock())
+    pixels = np.zeros((4, 4, 3), dtype=np.uint8)
+    swapped = pixels.copy()
+    pixels[0, 0] = (10, 20, 30)
+    swapped[0, 0] = (30, 20, 10)
+
+    name, position, shape, screen_size, digest, sums = cache.key("a", Frame(pixels), (0, 0, 4, 4))
+    assert sums == (10, 20, 30)
+    assert digest != cache.key("a", Frame(swapped), (0, 0, 4, 4))[4]
+
+
+def test_result_cache_none_is_a_cached_result():
+    cache = ResultCache(capacity=8, ttl=30, clock=FakeClock())
+    frame = Frame(np.zeros((10, 10, 3), dtype=np.uint8))
+    runs = []
+
+    for _ in range(3):
+        assert cache.lookup("a", frame, (0, 0, 10, 10), lambda: runs.append(1)) is None
+    assert len(runs) == 1
+
+
+def test_result_cache_evicts_the_least_recently_used():
+    cache = ResultCache(capacity=2, ttl=30, clock=FakeClock())
+    frames = [Frame(np.full((10, 10, 3), i, dtype=np.uint8)) for i in range(3)]
+    compute = Compute()
+    box = (0, 0, 10, 10)
+
+    cache.lookup("a", frames[0], box, compute)
+    cache.lookup("a", frames[1], box, compute)
+    cache.lookup("a", frames[0], box, compute)  # Hit: frames[1] is now the oldest
+    cache.lookup("a", frames[2], box, compute)  # Evicts frames[1]
+
+    assert compute.runs == 3
+    cache.lookup("a", frames[0], box, compute)
+    assert compute.runs == 3
+    cache.lookup("a", frames[1], box, compute)
+    assert compute.runs == 4
+    assert cache.stats()["evictions"] == 2 and cache.stats()["size"] == 2
+
+
+def test_result_cache_recomputes_after_ttl():
+    clock = FakeClock()
+    cache = ResultCache(capacity=8, ttl=30, clock=clock)
+    frame = Frame(np.zeros((10, 10, 3), dtype=np.uint8))
+    compute = Compute()
+
+    cache.lookup("a", frame, (0, 0, 10, 10), compute)
+    clock.advance(30)
+    cache.lookup("a", frame, (0, 0, 10, 10), compute)
+    assert compute.runs == 1
+    clock.advance(30.1)
+    cache.lookup("a", frame, (0, 0, 10, 10), compute)
+
+    assert compute.runs == 2
+    assert cache.stats()["expired"] == 1
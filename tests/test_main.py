@@ -0,0 +1,144 @@
+"""
+The real VortexAutoDownloader steps on fakes: frames from a ReplayBackend,
+input through a RecordingActuator, windows from a FakeWindowManager. The
+FailSafe tests raise from the actuator, so the exception has to pass
+through the downloader's own step methods to stop a flow or the runtime.
+"""
+
+import asyncio
+import sys
+
+import pytest
+from PIL import Image
+
+from actuation import RecordingActuator
+from benchmark import make_synthetic_frame
+from download_flow import State
+from runtime import AsyncRuntime
+from scheduling import FakeClock
+
+
+class CornerActuator(RecordingActuator):
+    """Raises pyautogui's FailSafe on the first mouse press, as when the mouse hits the corner."""
+
+    def _mouse_down(self):
+        raise sys.modules["pyautogui"].FailSafeException("corner")
+
+
+def scene(name: str) -> Image.Image:
+    return Image.fromarray(make_synthetic_frame(1920, 1080, name))
+
+
+def test_failsafe_in_a_click_stops_the_flow(make_downloader):
+    clock = FakeClock()
+    downloader = make_downloader([scene("vortex_dialog")], CornerActuator("fast", clock=clock), clock)
+
+    with pytest.raises(sys.modules["pyautogui"].FailSafeException):
+        downloader.process_download((300, 400))
+    assert downloader.flow.failed_state == State.DIALOG_SEEN
+    assert downloader.flow.visits[-1].attempts == 1
+
+
+def test_failsafe_in_ctrl_w_stops_the_flow(make_downloader):
+    class CornerKeys(RecordingActuator):
+        def _key_down(self, key):
+            raise sys.modules["pyautogui"].FailSafeException("corner")
+
+    clock = FakeClock()
+    downloader = make_downloader([scene("browser_page")], CornerKeys("fast", clock=clock), clock)
+    downloader.first_download_done = True
+
+    with pytest.raises(sys.modules["pyautogui"].FailSafeException):
+        downloader.close_browser_tab()
+
+
+
+def test_failsafe_from_a_real_click_stops_the_async_runtime(make_downloader):
+    downloader = make_downloader([scene("vortex_dialog")], CornerActuator("fast"))
+    runtime = AsyncRuntime(downloader, workers=2, shutdown_timeout=1.0)
+
+    async def main():
+        # A swallowed FailSafe would keep the watchers running: fail instead of hanging
+        await asyncio.wait_for(runtime.main(), 10)
+
+    with pytest.raises(sys.modules["pyautogui"].FailSafeException):
+        asyncio.run(main())
+    assert runtime.cycles >= 1
+    assert downloader.flow.failed_state == State.DIALOG_SEEN
+
+
+def dialog_without_button() -> Image.Image:
+    """The Vortex dialog with its 'Download manually' button painted over."""
+    pixels = make_synthetic_frame(1920, 1080, "vortex_dialog")
+    pixels[400:500, 200:450] = (45, 45, 50)
+    return Image.fromarray(pixels)
+
+
+def clicks(actuator) -> list:
+    """Positions of the mouse presses."""
+    positions, position = [], None
+    for _, name, args in actuator.events:
+        if name == "moveTo":
+            position = args
+        elif name == "mouseDown":
+            positions.append(position)
+    return positions
+
+
+@pytest.mark.parametrize("enabled", [False, True])
+def test_cascade_fallback_needs_fallback_clicks_enabled(make_downloader, monkeypatch, enabled):
+    import config
+    monkeypatch.setattr(config, "FALLBACK_CLICKS_ENABLED", enabled)
+    clock = FakeClock()
+    downloader = make_downloader([dialog_without_button()], RecordingActuator("fast", clock=clock), clock)
+
+    button_pos, fallback, verdict = downloader.check_for_dialog(downloader.capture_frame(None, ["manual_button", "dialog"]))
+
+    assert button_pos is None
+    assert verdict.dialog_present and verdict.confidence >= config.DIALOG_FALLBACK_CONFIDENCE
+    assert fallback is enabled
+
+
+def test_fallback_click_looks_for_the_button_again_first(make_downloader):
+    clock = FakeClock()
+    actuator = RecordingActuator("fast", clock=clock)
+    downloader = make_downloader([scene("vortex_dialog")], actuator, clock)
+
+    assert downloader.click_download_manually(None, allow_fallback=True)
+
+    [(x, y)] = clicks(actuator)
+    # On the button (200 x 48 around 16.7%, 41.3% of the screen), not at the calibrated position
+    assert abs(x - 0.167 * 1920) < 100 and abs(y - 0.413 * 1080) < 24
+    assert not downloader.fallback_clicked
+
+
+def test_failed_fallback_click_backs_off(make_downloader, monkeypatch):
+    import config
+    monkeypatch.setattr(config, "FALLBACK_CLICKS_ENABLED", True)
+    clock = FakeClock()
+    actuator = RecordingActuator("fast", clock=clock)
+    downloader = make_downloader([dialog_without_button()], actuator, clock)
+
+    assert downloader.click_download_manually(None)
+    [position] = clicks(actuator)
+    assert position == (int(1920 * config.MANUAL_BUTTON_X_PERCENT), int(1080 * config.MANUAL_BUTTON_Y_PERCENT))
+    assert downloader.fallback_clicked
+
+    # The flow did not finish: no new blind click on the next fast-poll cycle
+    downloader.scheduler.download_finished(cooldown=0)
+    downloader.schedule_failed_download()
+    assert downloader.scheduler.next_delay() == config.FALLBACK_RETRY_DELAY
+    clock.advance(config.FALLBACK_RETRY_DELAY)
+    assert downloader.scheduler.next_delay() == downloader.scheduler.base_interval
+
+
+def test_failed_download_without_fallback_polls_again_at_the_base_rate(make_downloader):
+    clock = FakeClock()
+    downloader = make_downloader([scene("vortex_dialog")], RecordingActuator("fast", clock=clock), clock)
+
+    assert downloader.click_download_manually(None)
+    downloader.scheduler.idle()
+    downloader.schedule_failed_download()
+
+    assert not downloader.fallback_clicked
+    assert downloader.scheduler.next_delay() == downloader.scheduler.base_interval
@@ -0,0 +1,161 @@
+"""
+Pipeline stages, queues and shutdown, with frames from a ReplayBackend.
+"""
+
+import threading
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from capture import Frame, ReplayBackend
+from debug_output import FrameRingBuffer
+from pipeline import LatestQueue, Pipeline
+
+
+class Stop(Exception):
+    """Stands in for pyautogui.FailSafeException."""
+
+
+def replay(count: int = 3) -> ReplayBackend:
+    images = [Image.fromarray(np.full((20, 30, 3), i * 40, dtype=np.uint8)) for i in range(count)]
+    return ReplayBackend.from_images(images)
+
+
+def test_latest_queue_keeps_only_the_newest_item():
+    frames = LatestQueue()
+    for item in ("a", "b", "c"):
+        frames.put(item)
+
+    assert frames.get(timeout=0) == "c"
+    assert frames.replaced == 2
+    assert frames.get(timeout=0.01) is None
+
+
+def test_latest_queue_close_wakes_a_waiting_reader():
+    frames = LatestQueue()
+    result = []
+    reader = threading.Thread(target=lambda: result.append(frames.get(timeout=5)))
+    reader.start()
+
+    frames.close()
+    reader.join(1)
+
+    assert not reader.is_alive()
+    assert result == [None]
+
+
+def test_commands_run_in_order_on_the_actuator_thread():
+    capture = replay()
+    ran = []
+    done = threading.Event()
+
+    def detect(frame):
+        if len(ran) == 0 and not done.is_set():
+            return [lambda i=i: ran.append(i) for i in range(3)] + [done.set]
+        return []
+
+    pipeline = Pipeline(lambda: capture.grab(), detect)
+    pipeline.start()
+    try:
+        assert done.wait(5)
+    finally:
+        pipeline.join()
+
+    assert ran == [0, 1, 2]
+    assert pipeline.stats()["stages"]["actuate"]["items"] == 4
+
+
+def test_frames_captured_before_a_command_finished_are_dropped():
+    capture = replay()
+    seen = []
+    calls = 0
+    finished = threading.Event()
+    pipeline = None
+
+    def grab():
+        nonlocal calls
+        calls += 1
+        if calls == 2:
+            # An action runs while this frame is being captured: the screen it shows is outdated
+            pipeline.submit(finished.set)
+            finished.wait(5)
+            while pipeline.actuator_busy():
+                pass
+            return "outdated"
+        if calls > 3:
+            return None
+        return f"frame{calls}"
+
+    pipeline = Pipeline(grab, lambda frame: seen.append(frame) or [])
+    pipeline.start()
+    try:
+        for _ in range(500):
+            if len(seen) == 2:
+                break
+            pipeline.wait(0.01)
+    finally:
+        pipeline.join()
+
+    assert seen == ["frame1", "frame3"]
+    assert pipeline.stale_frames == 1
+
+
+@pytest.mark.parametrize("stage", ["capture", "detect", "actuate"])
+def test_an_error_in_any_stage_stops_the_pipeline_and_is_raised(stage):
+    capture = replay()
+
+    def fail():
+        raise Stop(stage)
+
+    def grab():
+        if stage == "capture":
+            fail()
+        return capture.grab()
+
+    def detect(frame):
+        if stage == "detect":
+            fail()
+        return [fail] if stage == "actuate" else []
+
+    pipeline = Pipeline(grab, detect, join_timeout=2)
+    pipeline.start()
+
+    assert pipeline.wait(5)
+    with pytest.raises(Stop, match=stage):
+        pipeline.join()
+    assert not pipeline.running
+    assert not any(thread.is_alive() for thread in pipeline._threads)
+
+
+def test_full_command_queue_drops_new_commands():
+    pipeline = Pipeline(lambda: None, lambda frame: [], command_queue_size=2)
+
+    assert pipeline.submit(lambda: None)
+    assert pipeline.submit(lambda: None)
+    assert not pipeline.submit(lambda: None)
+    assert pipeline.dropped_commands == 1
+
+
+def test_frame_buffer_record_and_dump_from_two_threads(tmp_path):
+    buffer = FrameRingBuffer(capacity=5, max_bytes=10**9, directory=tmp_path)
+    frame = Frame(np.zeros((4, 4, 3), dtype=np.uint8))
+    stop = threading.Event()
+
+    def capture_thread():
+        while not stop.is_set():
+            buffer.record(frame)
+
+    thread = threading.Thread(target=capture_thread)
+    thread.start()
+    try:
+        for i in range(200):
+            buffer.dump(f"failure{i}")
+    finally:
+        stop.set()
+        thread.join()
+        buffer.close()
+
+    # The byte count always matches what is actually buffered
+    assert len(buffer.frames) <= 5
+    assert buffer.bytes == len(buffer.frames) * frame.rgb.nbytes
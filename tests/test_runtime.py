@@ -0,0 +1,175 @@
+"""
+AsyncRuntime driving a fake downloader: the watchers hand one mod to each
+other through the downloader's DownloadFlow.
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+import config
+from download_flow import FLOW_ORDER, DownloadFlow, State, Step
+from metrics import MetricsRegistry
+from runtime import AsyncRuntime
+from scheduling import PollScheduler, SystemClock
+from tabs import TabJanitor
+
+
+class Stop(Exception):
+    """Stands in for pyautogui.FailSafeException."""
+
+
+class FakeDownloader:
+    """The parts of VortexAutoDownloader the runtime uses; a dialog shows up every few frames."""
+
+    def __init__(self, dialog_every: int = 5, check_seconds: float = 0.001):
+        self.clock = SystemClock()
+        self.metrics = MetricsRegistry()
+        self.scheduler = PollScheduler(base_interval=0.01, max_interval=0.02, fast_interval=0.01, cooldown=0)
+        self.change_gate = None
+        self.metrics_exporter = None
+        self.tab_janitor = None
+        self.dialog_every = dialog_every
+        self.check_seconds = check_seconds
+        self.frames = 0
+        self.log = []
+        self.outcomes = []
+        self.active = 0        # Steps and sweeps running right now
+        self.max_active = 0
+        self._lock = threading.Lock()
+        self.flow = DownloadFlow({state: Step(self.step(state), timeout=1.0) for state in FLOW_ORDER[:-1]},
+                                 clock=self.clock, fatal=(Stop,))
+
+    def busy(self, name: str, seconds: float = 0.005):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        self.log.append(name)
+        time.sleep(seconds)
+        with self._lock:
+            self.active -= 1
+
+    def step(self, state: State):
+        def action(context, timeout):
+            self.busy(state.value)
+            return True
+        return action
+
+    def capture_frame(self, bbox, regions):
+        self.frames += 1
+        return self.frames
+
+    def check_for_dialog(self, frame):
+        self.busy("check", self.check_seconds)
+        return ((10, 10) if frame % self.dialog_every == 0 else None), False, None
+
+    def end_cycle(self):
+        pass
+
+    def schedule_quiet_cycle(self, verdict):
+        self.scheduler.idle()
+
+    def schedule_failed_download(self):
+        self.scheduler.activity()
+
+    def report_download(self, success: bool):
+        self.outcomes.append((success, [visit.state for visit in self.flow.visits]))
+
+    def report_failure(self, reason: str):
+        pass
+
+    def log_cycle_stats(self, cycles: int):
+        pass
+
+
+async def run_for(runtime: AsyncRuntime, seconds: float):
+    task = asyncio.create_task(runtime.main())
+    await asyncio.sleep(seconds)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+
+def test_each_mod_runs_the_whole_flow_in_order(monkeypatch):
+    monkeypatch.setattr(config, "WAIT_POLL_INTERVAL", 0.01)
+    downloader = FakeDownloader()
+    runtime = AsyncRuntime(downloader, workers=4)
+
+    asyncio.run(run_for(runtime, 0.5))
+
+    assert runtime.downloads >= 2
+    assert runtime.failures == 0
+    for success, states in downloader.outcomes:
+        assert success
+        assert states == FLOW_ORDER
+    # The flow recorded every state's latency, as in the plain loop
+    assert downloader.flow.latency_stats()[State.SLOW_CLICKED.value]["count"] >= 2
+    assert downloader.metrics.histogram("download_seconds").snapshot()["count"] == runtime.downloads
+    # Screen and input work never overlapped
+    assert downloader.max_active == 1
+
+
+def test_required_step_failure_ends_the_mod_and_polling_resumes(monkeypatch):
+    monkeypatch.setattr(config, "WAIT_POLL_INTERVAL", 0.01)
+    downloader = FakeDownloader()
+    downloader.flow.steps[State.BROWSER_LOADED].action = lambda context, timeout: False
+    runtime = AsyncRuntime(downloader, workers=4)
+
+    asyncio.run(run_for(runtime, 0.4))
+
+    assert runtime.failures >= 2
+    assert runtime.downloads == 0
+    for success, states in downloader.outcomes:
+        assert not success
+        assert states[-1] == State.BROWSER_LOADED
+    assert State.TAB_CLOSED.value not in downloader.log
+
+
+def test_fatal_error_in_a_step_stops_the_runtime():
+    downloader = FakeDownloader(dialog_every=2)
+
+    def failsafe(context, timeout):
+        raise Stop("mouse in the corner")
+
+    downloader.flow.steps[State.DIALOG_SEEN].action = failsafe
+    runtime = AsyncRuntime(downloader, workers=2, shutdown_timeout=1.0)
+
+    with pytest.raises(Stop):
+        runtime.run()
+
+
+def test_idle_sweeps_never_run_during_a_dialog_check_or_a_mod(monkeypatch):
+    monkeypatch.setattr(config, "WAIT_POLL_INTERVAL", 0.005)
+    downloader = FakeDownloader(dialog_every=3, check_seconds=0.01)
+
+    def close_tabs(count):
+        downloader.busy("sweep", 0.01)
+        return True
+
+    downloader.tab_janitor = TabJanitor(close_tabs, batch_size=10, max_open=20, idle_after=0.0, keep_open=0)
+
+    def confirmed(context, timeout):
+        downloader.busy(State.DOWNLOAD_CONFIRMED.value)
+        downloader.tab_janitor.opened()
+        return True
+
+    downloader.flow.steps[State.DOWNLOAD_CONFIRMED].action = confirmed
+    downloader.sweep_tabs = lambda idle=False: downloader.tab_janitor.sweep(idle)
+    runtime = AsyncRuntime(downloader, workers=4)
+
+    asyncio.run(run_for(runtime, 0.6))
+
+    assert runtime.downloads >= 2
+    assert downloader.tab_janitor.batches >= 1
+    assert downloader.max_active == 1
+    # Between a mod's first and last step nothing else touched the screen
+    in_mod = False
+    for entry in downloader.log:
+        if entry == State.DIALOG_SEEN.value:
+            in_mod = True
+        elif entry == State.TAB_CLOSED.value:
+            in_mod = False
+        elif entry in ("sweep", "check"):
+            assert not in_mod, downloader.log
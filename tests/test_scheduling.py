@@ -0,0 +1,108 @@
+"""
+PollScheduler backoff, cooldown and fast-polling window, and wait_until,
+on a FakeClock.
+"""
+
+import pytest
+
+from scheduling import FakeClock, PollScheduler, wait_until
+
+
+def make_scheduler(clock):
+    return PollScheduler(clock=clock, base_interval=1.0, max_interval=2.5, backoff=1.5,
+                         fast_interval=0.25, fast_window=15, cooldown=10)
+
+
+def test_idle_cycles_back_off_up_to_the_max_interval():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock)
+
+    delays = []
+    for _ in range(5):
+        delays.append(scheduler.wait())
+        scheduler.idle()
+
+    assert delays == pytest.approx([1.0, 1.5, 2.25, 2.5, 2.5])
+    assert clock.sleeps == pytest.approx(delays)
+
+
+def test_activity_resets_the_interval():
+    scheduler = make_scheduler(FakeClock())
+    for _ in range(4):
+        scheduler.idle()
+    assert scheduler.next_delay() == pytest.approx(2.5)
+
+    scheduler.activity()
+    assert scheduler.next_delay() == pytest.approx(1.0)
+
+
+def test_cooldown_is_slept_in_one_wait_then_fast_window_then_base_rate():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock)
+    scheduler.idle()
+    scheduler.download_finished()
+
+    assert scheduler.in_cooldown()
+    assert scheduler.wait() == pytest.approx(10.0)
+    assert not scheduler.in_cooldown()
+
+    # Fast polling for the next 15 seconds
+    fast = 0
+    while clock.now() < 25.0:
+        assert scheduler.wait() == pytest.approx(0.25)
+        fast += 1
+    assert fast == 60
+
+    assert scheduler.wait() == pytest.approx(1.0)
+
+
+def test_cooldown_override_starts_the_fast_window_right_away():
+    clock = FakeClock(start=100.0)
+    scheduler = make_scheduler(clock)
+    scheduler.download_finished(cooldown=0)
+
+    assert not scheduler.in_cooldown()
+    assert scheduler.next_delay() == pytest.approx(0.25)
+    clock.advance(15)
+    assert scheduler.next_delay() == pytest.approx(1.0)
+
+
+def test_next_wait_counts_without_sleeping():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock)
+    scheduler.next_wait()
+    scheduler.idle()
+    scheduler.next_wait()
+
+    assert clock.sleeps == []
+    assert scheduler.stats()["wakeups"] == 2
+    assert scheduler.stats()["slept"] == pytest.approx(2.5)
+
+
+def test_wait_until_returns_as_soon_as_the_condition_holds():
+    clock = FakeClock()
+    ready_at = 1.2
+
+    result = wait_until(lambda: clock.now() >= ready_at and "ready", timeout=5, poll=0.5, clock=clock)
+
+    assert result == "ready"
+    assert clock.now() == pytest.approx(1.5)
+
+
+def test_wait_until_stops_at_the_timeout():
+    clock = FakeClock()
+
+    assert wait_until(lambda: False, timeout=2, poll=0.75, clock=clock) is None
+    assert clock.sleeps == pytest.approx([0.75, 0.75, 0.5])
+
+
+def test_back_off_waits_once_then_polls_at_the_base_rate():
+    clock = FakeClock()
+    scheduler = make_scheduler(clock)
+    scheduler.download_finished(cooldown=0)
+    assert scheduler.next_delay() == pytest.approx(0.25)
+
+    scheduler.back_off(5)
+
+    assert scheduler.wait() == pytest.approx(5.0)
+    assert scheduler.wait() == pytest.approx(1.0)  # No fast polling after a failure
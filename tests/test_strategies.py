@@ -0,0 +1,121 @@
+"""
+DetectionRace early exit, cancellation and weighted voting, and the
+tracker bookkeeping that only the caller does.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from capture import Frame
+from scheduling import FakeClock
+from strategies import Detection, DetectionRace, Strategy
+from tracking import LocationTracker
+
+
+def found(x, y, confidence, name):
+    return lambda frame: Detection(x, y, 100, 30, confidence, name)
+
+
+def nothing(frame):
+    return None
+
+
+@pytest.fixture
+def frame():
+    return Frame(np.zeros((1080, 1920, 3), dtype=np.uint8))
+
+
+def race_of(*strategies, **kwargs):
+    kwargs.setdefault("early_exit", True)
+    kwargs.setdefault("fuse_threshold", 0.35)
+    kwargs.setdefault("fuse_radius", 20)
+    kwargs.setdefault("timeout", 2.0)
+    return DetectionRace("button", list(strategies), **kwargs)
+
+
+def test_confident_strategy_wins_without_waiting_for_slow_ones(frame):
+    release = threading.Event()
+
+    def slow(frame):
+        release.wait(5)
+        return None
+
+    race = race_of(Strategy("color", found(500, 400, 0.9, "color"), 0.7), Strategy("template", slow, 0.8))
+    try:
+        winner = race.run(frame)
+        assert winner.strategy == "color"
+        assert race.last_winner == "color"
+    finally:
+        release.set()
+        race.close()
+
+
+def test_strategies_not_started_when_the_race_is_decided_are_cancelled(frame):
+    started = []
+    release = threading.Event()
+
+    def slow(frame):
+        started.append(True)
+        release.wait(5)
+        return None
+
+    strategies = [Strategy("color", found(500, 400, 0.9, "color"), 0.7)]
+    strategies += [Strategy(f"slow{i}", slow, 0.7) for i in range(4)]
+    race = race_of(*strategies)
+    # One worker: the slow strategies queue behind the winner and never start
+    race.pool.shutdown()
+    race.pool = ThreadPoolExecutor(max_workers=1)
+    try:
+        assert race.run(frame).strategy == "color"
+        race.pool.shutdown(wait=True)
+        assert started == []
+    finally:
+        release.set()
+
+
+def test_lone_weak_detection_does_not_pass_the_vote(frame):
+    # 0.6 of the color strategy's weight is only 0.24 of the three strategies' 2.5
+    race = race_of(Strategy("prior", nothing, 0.7, weight=0.5),
+                   Strategy("color", found(500, 400, 0.6, "color"), 0.95),
+                   Strategy("template", nothing, 0.8))
+    try:
+        assert race.run(frame) is None
+        assert race.last_winner == "none"
+    finally:
+        race.close()
+
+
+def test_agreeing_detections_are_fused(frame):
+    race = race_of(Strategy("color", found(500, 400, 0.6, "color"), 0.95),
+                   Strategy("template", found(510, 405, 0.6, "template"), 0.95),
+                   Strategy("prior", nothing, 0.95, weight=0.5))
+    try:
+        winner = race.run(frame)
+        assert winner.strategy == "fused"
+        assert winner.confidence == pytest.approx(1.2 / 2.5)
+        assert (winner.x, winner.y) == (505, 402)
+    finally:
+        race.close()
+
+
+def test_peek_leaves_the_tracker_alone_and_record_confirms(frame):
+    clock = FakeClock()
+    tracker = LocationTracker(margin=1.0, size_tolerance=0.2, max_misses=2, max_age=300, clock=clock)
+    tracker.confirm("button", frame, Detection(500, 400, 100, 30, 0.9, "color"))
+    bounds = (0, 0, 1920, 1080)
+
+    assert tracker.peek("button", frame, bounds, lambda box: None) is None
+    assert tracker.stats()["tracked_misses"] == 0
+    assert tracker.window("button", frame, bounds) is not None
+
+    tracker.record("button", frame, None)
+    tracker.record("button", frame, None)
+    assert tracker.window("button", frame, bounds) is None  # Dropped after max_misses
+
+    tracker.record("button", frame, Detection(520, 400, 100, 30, 0.9, "color"))
+    assert tracker.window("button", frame, bounds) is not None
+    tracker.record("button", frame, Detection(520, 400, 100, 30, 0.9, "prior"), tracked=True)
+    assert tracker.stats()["tracked_hits"] == 1
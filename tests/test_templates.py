@@ -0,0 +1,70 @@
+"""
+Template matching against button templates cut from synthetic screens.
+"""
+
+import cv2
+import numpy as np
+import pytest
+
+from benchmark import make_synthetic_frame
+from capture import Frame, percent_to_bbox
+from templates import TemplateMatcher, capture_template
+
+
+def dialog(width: int = 1920, height: int = 1080) -> Frame:
+    return Frame(make_synthetic_frame(width, height, "vortex_dialog", labels=True))
+
+
+@pytest.fixture
+def templates(tmp_path):
+    """Directory holding a "Download manually" template cut from the 1080p dialog."""
+    center_x, center_y = int(1920 * 0.167), int(1080 * 0.413)  # The button is 201 x 49 around this
+    bbox = (center_x - 100, center_y - 24, center_x + 101, center_y + 25)
+    assert capture_template(TemplateMatcher(directory=tmp_path), "manual_button", dialog(), bbox=bbox)
+    return tmp_path
+
+
+def test_template_is_found_on_the_screen_it_was_cut_from(templates):
+    match = TemplateMatcher(directory=templates, threshold=0.8).match(dialog(), "manual_button")
+
+    assert match is not None
+    assert abs(match.x - 0.167 * 1920) <= 2 and abs(match.y - 0.413 * 1080) <= 2
+    assert match.confidence > 0.99
+
+
+@pytest.mark.parametrize("width, height", [(2560, 1440), (3840, 2160), (1280, 720)])
+def test_template_pyramid_finds_the_button_at_another_resolution(templates, width, height):
+    # The 1080p screen rescaled, as the same UI looks at another resolution; a newly
+    # drawn synthetic screen would not do, since its label font does not scale linearly
+    pixels = make_synthetic_frame(1920, 1080, "vortex_dialog", labels=True)
+    frame = Frame(cv2.resize(pixels, (width, height), interpolation=cv2.INTER_AREA if width < 1920 else cv2.INTER_LINEAR))
+    match = TemplateMatcher(directory=templates, threshold=0.8).match(frame, "manual_button")
+
+    assert match is not None
+    assert abs(match.x - 0.167 * width) <= 2 and abs(match.y - 0.413 * height) <= 2
+    assert match.scale == pytest.approx(height / 1080, rel=0.05)
+
+
+def test_matches_below_the_threshold_are_ignored(templates):
+    # Noise over the button lowers the score; the threshold decides
+    rng = np.random.default_rng(0)
+    pixels = make_synthetic_frame(1920, 1080, "vortex_dialog", labels=True).astype(np.int16)
+    pixels += rng.integers(-60, 61, pixels.shape, dtype=np.int16)
+    noisy = Frame(np.clip(pixels, 0, 255).astype(np.uint8))
+    score = TemplateMatcher(directory=templates, threshold=0.0).match(noisy, "manual_button").confidence
+    assert score < 0.99
+
+    assert TemplateMatcher(directory=templates, threshold=score - 0.01).match(noisy, "manual_button") is not None
+    assert TemplateMatcher(directory=templates, threshold=score + 0.01).match(noisy, "manual_button") is None
+
+
+def test_no_match_without_the_button_or_outside_the_region(templates):
+    matcher = TemplateMatcher(directory=templates, threshold=0.8)
+
+    assert matcher.match(Frame(make_synthetic_frame(1920, 1080, "idle")), "manual_button") is None
+    elsewhere = percent_to_bbox((0.6, 0.6, 0.9, 0.9), (1920, 1080))
+    assert matcher.match(dialog(), "manual_button", region=elsewhere) is None
+
+
+def test_missing_template_matches_nothing(tmp_path):
+    assert TemplateMatcher(directory=tmp_path).match(dialog(), "slow_download") is None
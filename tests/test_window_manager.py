@@ -0,0 +1,97 @@
+"""
+WindowManager handle caching, stale-handle detection and single-pass
+lookups, on the FakeWindowManager.
+"""
+
+import pytest
+
+from window_manager import FakeWindowManager
+
+ROLES = {"vortex": ["vortex"], "browser": ["nexus mods", "chrome"]}
+
+
+@pytest.fixture
+def desktop():
+    windows = FakeWindowManager(ROLES)
+    windows.add_window("Notepad")
+    windows.vortex = windows.add_window("Vortex")
+    windows.browser = windows.add_window("Skyrim mod - Nexus Mods - Google Chrome")
+    return windows
+
+
+def test_both_roles_resolve_in_one_enumeration(desktop):
+    found = desktop.resolve("vortex", "browser")
+
+    assert found == {"vortex": desktop.vortex, "browser": desktop.browser}
+    assert desktop.stats()["enumerations"] == 1
+    assert desktop.stats()["cache_hits"] == 0
+
+
+def test_cached_handles_are_reused_without_enumerating(desktop):
+    desktop.resolve("vortex", "browser")
+
+    for _ in range(5):
+        assert desktop.resolve("vortex", "browser")["browser"] == desktop.browser
+
+    stats = desktop.stats()
+    assert stats["enumerations"] == 1
+    assert stats["cache_hits"] == 10
+    assert stats["stale_handles"] == 0
+
+
+def test_closed_window_is_stale_and_looked_up_again(desktop):
+    desktop.resolve("vortex", "browser")
+    desktop.close_window(desktop.browser)
+    reopened = desktop.add_window("Another mod - Nexus Mods - Google Chrome")
+
+    found = desktop.resolve("vortex", "browser")
+
+    assert found == {"vortex": desktop.vortex, "browser": reopened}
+    stats = desktop.stats()
+    assert stats["stale_handles"] == 1
+    assert stats["cache_hits"] == 1
+    assert stats["enumerations"] == 2
+
+
+def test_retitled_window_is_stale(desktop):
+    desktop.find("browser")
+    desktop.set_title(desktop.browser, "Downloads")
+
+    assert desktop.find("browser") is None
+    assert desktop.stats()["stale_handles"] == 1
+
+
+def test_missing_window_is_not_cached(desktop):
+    desktop.close_window(desktop.vortex)
+
+    assert desktop.find("vortex") is None
+    assert desktop.find("vortex") is None
+    assert desktop.stats()["enumerations"] == 2
+
+
+def test_invalidate_forces_a_new_lookup(desktop):
+    desktop.resolve("vortex", "browser")
+    desktop.invalidate("vortex")
+
+    desktop.resolve("vortex", "browser")
+
+    assert desktop.stats()["enumerations"] == 2
+    assert desktop.stats()["cache_hits"] == 1
+
+
+def test_take_period_counts_enumerations_since_the_last_call(desktop):
+    desktop.resolve("vortex")
+    desktop.find_title("notepad")
+    assert desktop.take_period()["enumerations"] == 2
+
+    desktop.resolve("vortex")
+    assert desktop.take_period()["enumerations"] == 0
+
+
+def test_focus_brings_a_window_to_the_front_and_reports_failures(desktop):
+    assert desktop.focus(desktop.vortex)
+    assert desktop.focused == desktop.vortex
+
+    desktop.close_window(desktop.browser)
+    assert not desktop.focus(desktop.browser)
+    assert desktop.focus_history == [desktop.vortex]
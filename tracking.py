@@ -0,0 +1,271 @@
+"""
+Location priors for the button detectors.
+
+The buttons appear at almost the same pixels every time, so after a button
+has been confirmed once, LocationTracker first searches a small window
+around its last position. Only when that window comes up empty (or finds
+something of a different size) does the caller scan the full search region.
+"""
+
+import logging
+
+import config
+from capture import Frame
+from scheduling import SystemClock
+
+logger = logging.getLogger(__name__)
+
+
+class Track:
+    """Last confirmed box of one button, in screen coordinates."""
+
+    def __init__(self, bbox: tuple, screen_size: tuple, geometry, confirmed_at: float):
+        self.bbox = bbox  # (left, top, right, bottom)
+        self.screen_size = screen_size
+        self.geometry = geometry  # Window geometry when it was confirmed (None if unknown)
+        self.confirmed_at = confirmed_at
+        self.misses = 0  # Tracked searches missed since the last confirmation
+
+    @property
+    def width(self) -> int:
+        return self.bbox[2] - self.bbox[0]
+
+    @property
+    def height(self) -> int:
+        return self.bbox[3] - self.bbox[1]
+
+
+class LocationTracker:
+    """
+    Remembers where each button was last confirmed and searches there first.
+
+    A track decays: every miss in the tracked window widens the next window,
+    and after max_misses consecutive misses, or max_age seconds without a
+    confirmation, the track is dropped. Tracks are also dropped when the
+    screen resolution changes, or when update_geometry() reports that the
+    window the button lives in moved or was resized.
+    """
+
+    def __init__(self, margin: float = None, size_tolerance: float = None, max_misses: int = None,
+                 max_age: float = None, clock=None):
+        """
+        Args:
+            margin: Window padding on each side, in button widths (horizontally) and heights (vertically)
+            size_tolerance: Largest relative size change for a tracked hit to count as the same button
+            max_misses: Consecutive tracked misses before the track is dropped
+            max_age: Drop a track not confirmed for this long (seconds)
+            clock: Clock with now(); defaults to SystemClock
+        """
+        self.margin = config.TRACKER_MARGIN if margin is None else margin
+        self.size_tolerance = config.TRACKER_SIZE_TOLERANCE if size_tolerance is None else size_tolerance
+        self.max_misses = config.TRACKER_MAX_MISSES if max_misses is None else max_misses
+        self.max_age = config.TRACKER_MAX_AGE if max_age is None else max_age
+        self.clock = clock or SystemClock()
+        self._tracks = {}  # key -> Track
+        self._geometry = {}  # key -> current window geometry (see update_geometry)
+        self.tracked_hits = 0    # Found in the tracked window
+        self.tracked_misses = 0  # Tracked window searched, fell back to the full region
+        self.full_hits = 0       # Found by a full-region scan
+        self.full_misses = 0     # Full-region scan found nothing
+        self.invalidations = 0   # Tracks dropped (decay, resolution or geometry change)
+
+    def _stale(self, track: Track, frame: Frame) -> str | None:
+        """Returns why a track no longer applies to this frame, or None if it does."""
+        if track.screen_size != frame.screen_size:
+            return f"resolution changed to {frame.screen_size[0]}x{frame.screen_size[1]}"
+        if self.clock.now() - track.confirmed_at > self.max_age:
+            return "expired"
+        return None
+
+    def window(self, key: str, frame: Frame, bounds: tuple, drop_stale: bool = True) -> tuple | None:
+        """
+        Returns the box to search first for this button, in frame pixels
+        clipped to bounds, or None when there is no usable track.
+
+        Args:
+            key: Button name
+            frame: Frame about to be searched
+            bounds: (left, top, right, bottom) full search region in frame pixels
+            drop_stale: Drop a track that no longer applies (resolution changed, expired);
+                        False only ignores it
+        """
+        track = self._tracks.get(key)
+        if track is None:
+            return None
+        reason = self._stale(track, frame)
+        if reason:
+            if drop_stale:
+                self.invalidate(key, reason)
+            return None
+
+        # Each miss widens the window, in case the button only moved a little further
+        grow = self.margin * (1 + track.misses)
+        pad_x, pad_y = int(track.width * grow) + 1, int(track.height * grow) + 1
+        ox, oy = frame.origin
+        left, top, right, bottom = bounds
+        box = (max(track.bbox[0] - ox - pad_x, left), max(track.bbox[1] - oy - pad_y, top),
+               min(track.bbox[2] - ox + pad_x, right), min(track.bbox[3] - oy + pad_y, bottom))
+        if box[2] <= box[0] or box[3] <= box[1]:
+            return None
+        return box
+
+    def matches(self, key: str, candidate) -> bool:
+        """
+        Whether a candidate found in the tracked window has the tracked size
+        (a box cut off by the window edge or a different widget does not).
+        """
+        track = self._tracks.get(key)
+        return track is not None and (abs(candidate.width - track.width) <= self.size_tolerance * track.width
+                and abs(candidate.height - track.height) <= self.size_tolerance * track.height)
+
+    def search(self, key: str, frame: Frame, bounds: tuple, detect):
+        """
+        Searches only the tracked window of a button.
+
+        Args:
+            key: Button name
+            frame: Captured screen
+            bounds: (left, top, right, bottom) full search region in frame pixels
+            detect: callable(search_box) -> best button_detector.Candidate in that box, or None
+
+        Returns:
+            The Candidate found there, or None (also when there is no track)
+        """
+        box = self.window(key, frame, bounds)
+        if box is None:
+            return None
+        candidate = detect(box)
+        if candidate is not None and self.matches(key, candidate):
+            self.tracked_hits += 1
+            self.confirm(key, frame, candidate)
+            return candidate
+        self._missed(key)
+        return None
+
+    def peek(self, key: str, frame: Frame, bounds: tuple, detect):
+        """
+        Searches the tracked window like search(), but changes nothing: no
+        counters, no confirmation, no decay. For strategies that run on
+        other threads (see strategies.DetectionRace); the caller reports
+        the outcome it settles on with record().
+
+        Returns:
+            The Candidate found in the tracked window, or None
+        """
+        box = self.window(key, frame, bounds, drop_stale=False)
+        if box is None:
+            return None
+        candidate = detect(box)
+        return candidate if candidate is not None and self.matches(key, candidate) else None
+
+    def record(self, key: str, frame: Frame, found, tracked: bool = False):
+        """
+        Records the outcome of a search that ran elsewhere (e.g. a detection race).
+
+        Args:
+            key: Button name
+            frame: Frame that was searched
+            found: The button found (anything with a screen bbox), or None
+            tracked: It was found in the tracked window (by peek())
+        """
+        track = self._tracks.get(key)
+        if track is not None:
+            reason = self._stale(track, frame)
+            if reason:
+                self.invalidate(key, reason)
+                track = None
+        if found is not None:
+            if tracked:
+                self.tracked_hits += 1
+            else:
+                if track is not None:
+                    self.tracked_misses += 1
+                self.full_hits += 1
+            self.confirm(key, frame, found)
+            return
+        if track is not None:
+            self._missed(key)
+        self.full_misses += 1
+
+    def _missed(self, key: str):
+        """Counts a miss in the tracked window; the track decays and is dropped after max_misses."""
+        track = self._tracks[key]
+        self.tracked_misses += 1
+        track.misses += 1
+        if track.misses >= self.max_misses:
+            self.invalidate(key, f"{track.misses} misses")
+
+    def locate(self, key: str, frame: Frame, bounds: tuple, detect):
+        """
+        Finds a button, trying the tracked window before the full region.
+
+        Args:
+            key: Button name
+            frame: Captured screen
+            bounds: (left, top, right, bottom) full search region in frame pixels
+            detect: callable(search_box) -> best button_detector.Candidate in that box, or None
+
+        Returns:
+            The Candidate found, or None
+        """
+        candidate = self.search(key, frame, bounds, detect)
+        if candidate is not None:
+            return candidate
+
+        candidate = detect(bounds)
+        if candidate is None:
+            self.full_misses += 1
+            return None
+        self.full_hits += 1
+        self.confirm(key, frame, candidate)
+        return candidate
+
+    def confirm(self, key: str, frame: Frame, candidate):
+        """
+        Records a confirmed button position: a Candidate, or anything else
+        with a screen bbox (e.g. a strategies.Detection).
+        """
+        if key not in self._tracks:
+            logger.debug(f"Tracking '{key}' at {candidate.bbox}")
+        self._tracks[key] = Track(candidate.bbox, frame.screen_size, self._geometry.get(key), self.clock.now())
+
+    def update_geometry(self, key: str, geometry):
+        """
+        Reports the current geometry (e.g. the window rectangle) of the
+        window a button lives in. A track confirmed under a different
+        geometry is dropped.
+        """
+        self._geometry[key] = geometry
+        track = self._tracks.get(key)
+        if track is not None and track.geometry is not None and track.geometry != geometry:
+            self.invalidate(key, f"window moved to {geometry}")
+        elif track is not None:
+            track.geometry = geometry
+
+    def invalidate(self, key: str = None, reason: str = "invalidated"):
+        """
+        Drops the track of one button, or of all of them.
+        """
+        keys = list(self._tracks) if key is None else [key]
+        for name in keys:
+            if self._tracks.pop(name, None) is not None:
+                self.invalidations += 1
+                logger.debug(f"Dropped track of '{name}' ({reason})")
+
+    def stats(self) -> dict:
+        """
+        Returns the tracker counters. tracked_hit_rate is the fraction of
+        tracked searches that found the button; full_hit_rate the same for
+        full-region scans.
+        """
+        tracked = self.tracked_hits + self.tracked_misses
+        full = self.full_hits + self.full_misses
+        return {
+            "tracked_hits": self.tracked_hits,
+            "tracked_misses": self.tracked_misses,
+            "full_hits": self.full_hits,
+            "full_misses": self.full_misses,
+            "invalidations": self.invalidations,
+            "tracked_hit_rate": self.tracked_hits / tracked if tracked else 0.0,
+            "full_hit_rate": self.full_hits / full if full else 0.0,
+        }
@@ -0,0 +1,271 @@
+"""
+Window lookups for the Vortex Auto Downloader.
+
+Finding the Vortex and browser windows used to take a full EnumWindows
+pass per window, on every download. WindowManager remembers the handle it
+found for each window role ("vortex", "browser") and, before reusing it,
+only checks that the window still exists and still has a matching title.
+When a check fails, a single enumeration pass resolves every role that
+needs it.
+
+- Win32WindowManager talks to the real desktop through win32gui.
+- FakeWindowManager keeps windows in memory, for headless tests.
+"""
+
+import logging
+import time
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+def window_roles() -> dict:
+    """
+    Returns role -> title keywords (lowercase); a window belongs to a role
+    when its title contains any of them.
+    """
+    return {
+        "vortex": list(config.VORTEX_WINDOW_KEYWORDS),
+        "browser": list(config.BROWSER_WINDOW_KEYWORDS),
+    }
+
+
+class WindowManager:
+    """
+    Interface for finding and focusing top-level windows.
+
+    Backends implement the primitives (_enumerate, _is_window, _title,
+    rect, _focus); handle caching, validation and the lookup counters live here.
+    """
+
+    def __init__(self, roles: dict = None):
+        """
+        Args:
+            roles: Role -> title keywords (default: window_roles())
+        """
+        self.roles = roles or window_roles()
+        self._handles = {}  # role -> cached window handle
+        self.enumerations = 0        # Full EnumWindows passes
+        self.enumeration_seconds = 0.0
+        self.cache_hits = 0          # Cached handles reused after a successful check
+        self.stale_handles = 0       # Cached handles that failed the check
+        self._period = (0, 0.0)      # (enumerations, seconds) at the last take_period()
+
+    # Primitives
+
+    def _enumerate(self) -> list:
+        """Returns (hwnd, title) of every visible window with a title, front to back."""
+        raise NotImplementedError
+
+    def _is_window(self, hwnd) -> bool:
+        raise NotImplementedError
+
+    def _title(self, hwnd) -> str:
+        raise NotImplementedError
+
+    def rect(self, hwnd) -> tuple:
+        """Returns the (left, top, right, bottom) rectangle of a window."""
+        raise NotImplementedError
+
+    def _focus(self, hwnd):
+        raise NotImplementedError
+
+    # Lookups
+
+    def _matches(self, role: str, title: str) -> bool:
+        title = title.lower()
+        return any(keyword in title for keyword in self.roles[role])
+
+    def _valid(self, role: str, hwnd) -> bool:
+        """Cheap check of a cached handle: the window exists and its title still matches."""
+        try:
+            return self._is_window(hwnd) and self._matches(role, self._title(hwnd))
+        except Exception:
+            return False
+
+    def windows(self) -> list:
+        """
+        Enumerates the visible windows once (counted in the stats).
+
+        Returns:
+            (hwnd, title) of every visible window with a title, front to back
+        """
+        start = time.perf_counter()
+        try:
+            return self._enumerate()
+        finally:
+            self.enumerations += 1
+            self.enumeration_seconds += time.perf_counter() - start
+
+    def resolve(self, *roles: str) -> dict:
+        """
+        Returns the window handle of each role (None if there is no such window).
+        Cached handles that pass the check are reused; all the others are
+        found in one enumeration pass.
+        """
+        found, missing = {}, []
+        for role in roles:
+            hwnd = self._handles.get(role)
+            if hwnd is not None and self._valid(role, hwnd):
+                self.cache_hits += 1
+                found[role] = hwnd
+                continue
+            if hwnd is not None:
+                self.stale_handles += 1
+                logger.debug(f"Window handle for '{role}' is stale, looking it up again")
+                del self._handles[role]
+            missing.append(role)
+
+        if missing:
+            windows = self.windows()
+            for role in missing:
+                found[role] = next((hwnd for hwnd, title in windows if self._matches(role, title)), None)
+                if found[role] is not None:
+                    self._handles[role] = found[role]
+        return found
+
+    def find(self, role: str):
+        """Returns the window handle of one role, or None."""
+        return self.resolve(role)[role]
+
+    def find_title(self, substring: str, verbose: bool = False) -> tuple | None:
+        """
+        Finds the first visible window whose title contains substring (not cached).
+
+        Args:
+            substring: Text to look for (case-insensitive)
+            verbose: Log every window title checked
+
+        Returns:
+            (hwnd, title), or None
+        """
+        for hwnd, title in self.windows():
+            if verbose:
+                logger.debug(f"Checking window: '{title}'")
+            if substring.lower() in title.lower():
+                return hwnd, title
+        return None
+
+    def focus(self, hwnd) -> bool:
+        """
+        Restores a window and brings it to the front.
+
+        Returns:
+            True on success, False if the window could not be focused
+        """
+        try:
+            self._focus(hwnd)
+            return True
+        except Exception as e:
+            logger.debug(f"Could not bring window {hwnd} to front: {e}")
+            return False
+
+    def invalidate(self, role: str = None):
+        """Forgets the cached handle of one role, or of all of them."""
+        if role is None:
+            self._handles.clear()
+        else:
+            self._handles.pop(role, None)
+
+    def take_period(self) -> dict:
+        """
+        Returns the enumerations and the time they took since the previous
+        call (e.g. for one download).
+        """
+        count, seconds = self._period
+        period = {"enumerations": self.enumerations - count,
+                  "enumeration_ms": (self.enumeration_seconds - seconds) * 1000}
+        self._period = (self.enumerations, self.enumeration_seconds)
+        return period
+
+    def stats(self) -> dict:
+        """Returns the lookup counters."""
+        return {
+            "enumerations": self.enumerations,
+            "enumeration_ms": self.enumeration_seconds * 1000,
+            "cache_hits": self.cache_hits,
+            "stale_handles": self.stale_handles,
+        }
+
+
+class Win32WindowManager(WindowManager):
+    """
+    Finds and focuses windows on the real desktop with win32gui.
+    """
+
+    def __init__(self, roles: dict = None):
+        super().__init__(roles)
+        import win32con
+        import win32gui
+        self.win32gui = win32gui
+        self.win32con = win32con
+
+    def _enumerate(self) -> list:
+        def callback(hwnd, windows):
+            if self.win32gui.IsWindowVisible(hwnd):
+                title = self.win32gui.GetWindowText(hwnd)
+                if title:  # Only windows with a title
+                    windows.append((hwnd, title))
+
+        windows = []
+        self.win32gui.EnumWindows(callback, windows)
+        return windows
+
+    def _is_window(self, hwnd) -> bool:
+        return bool(self.win32gui.IsWindow(hwnd))
+
+    def _title(self, hwnd) -> str:
+        return self.win32gui.GetWindowText(hwnd)
+
+    def rect(self, hwnd) -> tuple:
+        return self.win32gui.GetWindowRect(hwnd)
+
+    def _focus(self, hwnd):
+        self.win32gui.ShowWindow(hwnd, self.win32con.SW_RESTORE)
+        self.win32gui.SetForegroundWindow(hwnd)
+
+
+class FakeWindowManager(WindowManager):
+    """
+    In-memory desktop for tests: windows are added, retitled and closed by
+    hand, and focus() only records which window came to the front.
+    """
+
+    def __init__(self, roles: dict = None):
+        super().__init__(roles)
+        self._windows = {}  # hwnd -> [title, rect, visible], in creation order (front to back)
+        self._next_hwnd = 1
+        self.focused = None
+        self.focus_history = []
+
+    def add_window(self, title: str, rect: tuple = (0, 0, 800, 600), visible: bool = True) -> int:
+        """Creates a window and returns its handle."""
+        hwnd = self._next_hwnd
+        self._next_hwnd += 1
+        self._windows[hwnd] = [title, rect, visible]
+        return hwnd
+
+    def set_title(self, hwnd: int, title: str):
+        self._windows[hwnd][0] = title
+
+    def close_window(self, hwnd: int):
+        self._windows.pop(hwnd, None)
+
+    def _enumerate(self) -> list:
+        return [(hwnd, title) for hwnd, (title, _, visible) in self._windows.items() if visible and title]
+
+    def _is_window(self, hwnd) -> bool:
+        return hwnd in self._windows
+
+    def _title(self, hwnd) -> str:
+        return self._windows[hwnd][0]
+
+    def rect(self, hwnd) -> tuple:
+        return self._windows[hwnd][1]
+
+    def _focus(self, hwnd):
+        if hwnd not in self._windows:
+            raise ValueError(f"No window {hwnd}")
+        self.focused = hwnd
+        self.focus_history.append(hwnd)